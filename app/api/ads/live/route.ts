@@ -24,15 +24,30 @@ export async function GET() {
       driver: sqlite3.Database,
     })
 
+    // Coloanele epoch (scripts/epoch_columns.py): ferestrele de timp devin range scan pe index
+    const hasEpoch = await db.get(
+      `SELECT 1 as ok FROM pragma_table_info('ads') WHERE name = 'created_epoch'`,
+    )
+
     // Obține statistici reale
-    const stats = await db.get(`
-      SELECT 
-        COUNT(*) as total_ads,
-        COUNT(DISTINCT channel) as unique_channels,
-        AVG(confidence_score) as avg_confidence,
-        COUNT(CASE WHEN datetime(created_at) > datetime('now', '-1 day') THEN 1 END) as ads_last_24h
-      FROM ads
-    `)
+    const stats = hasEpoch
+      ? await db.get(`
+          SELECT 
+            COUNT(*) as total_ads,
+            COUNT(DISTINCT channel) as unique_channels,
+            AVG(confidence_score) as avg_confidence,
+            (SELECT COUNT(*) FROM ads
+             WHERE created_epoch > CAST(strftime('%s', 'now', '-1 day') AS INTEGER)) as ads_last_24h
+          FROM ads
+        `)
+      : await db.get(`
+          SELECT 
+            COUNT(*) as total_ads,
+            COUNT(DISTINCT channel) as unique_channels,
+            AVG(confidence_score) as avg_confidence,
+            COUNT(CASE WHEN datetime(created_at) > datetime('now', '-1 day') THEN 1 END) as ads_last_24h
+          FROM ads
+        `)
 
     // Obține reclamele recente (ultimele 20)
     const recent_ads = await db.all(`
@@ -41,7 +56,7 @@ export async function GET() {
         engagement_rate, confidence_score, ad_type, 
         duration, created_at, thumbnail_url
       FROM ads 
-      ORDER BY created_at DESC 
+      ORDER BY ${hasEpoch ? "created_epoch" : "created_at"} DESC 
       LIMIT 20
     `)
 
@@ -59,15 +74,25 @@ export async function GET() {
     `)
 
     // Obține statistici pe ultimele 24 ore
-    const hourly_stats = await db.all(`
-      SELECT 
-        strftime('%H:00', created_at) as hour,
-        COUNT(*) as ads_count
-      FROM ads 
-      WHERE datetime(created_at) > datetime('now', '-1 day')
-      GROUP BY strftime('%H', created_at)
-      ORDER BY hour
-    `)
+    const hourly_stats = hasEpoch
+      ? await db.all(`
+          SELECT 
+            strftime('%H:00', created_epoch, 'unixepoch') as hour,
+            COUNT(*) as ads_count
+          FROM ads 
+          WHERE created_epoch > CAST(strftime('%s', 'now', '-1 day') AS INTEGER)
+          GROUP BY hour
+          ORDER BY hour
+        `)
+      : await db.all(`
+          SELECT 
+            strftime('%H:00', created_at) as hour,
+            COUNT(*) as ads_count
+          FROM ads 
+          WHERE datetime(created_at) > datetime('now', '-1 day')
+          GROUP BY strftime('%H', created_at)
+          ORDER BY hour
+        `)
 
     // Obține top canale
     const top_channels = await db.all(`
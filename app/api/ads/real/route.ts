@@ -2,9 +2,16 @@ import { NextResponse } from "next/server"
 import sqlite3 from "sqlite3"
 import { open } from "sqlite"
 import fs from "fs"
+import { snapshotResponse } from "@/lib/snapshot"
 
-export async function GET() {
+export async function GET(request: Request) {
   try {
+    // Payload precalculat de crawler (scripts/dashboard_snapshot.py); interogările directe rămân fallback
+    const snapshot = await snapshotResponse(request, "real_ads", 60)
+    if (snapshot) {
+      return snapshot
+    }
+
     const dbPath = "/data/ads/real_ads.db"
 
     // Verifică dacă baza de date există
@@ -24,15 +31,45 @@ export async function GET() {
       driver: sqlite3.Database,
     })
 
+    // Tabelele agregate (scripts/aggregates.py) sunt menținute incremental de crawler
+    const hasAggregates = await db.get(
+      `SELECT 1 as ok FROM sqlite_master WHERE type = 'table' AND name = 'agg_real_ads_total'`,
+    )
+
+    // Coloanele epoch (scripts/epoch_columns.py): ferestrele de timp devin range scan pe index
+    const hasEpoch = await db.get(
+      `SELECT 1 as ok FROM pragma_table_info('real_ads') WHERE name = 'created_epoch'`,
+    )
+
     // Statistici reale din baza de date
-    const stats = await db.get(`
-      SELECT 
-        COUNT(*) as total_ads,
-        COUNT(DISTINCT channel_title) as unique_channels,
-        AVG(ad_confidence) as avg_confidence,
-        COUNT(CASE WHEN datetime(created_at) > datetime('now', '-1 day') THEN 1 END) as ads_last_24h
-      FROM real_ads
-    `)
+    const stats = hasAggregates
+      ? await db.get(`
+          SELECT 
+            COALESCE(t.n, 0) as total_ads,
+            (SELECT COUNT(*) FROM agg_real_ads_channel WHERE n > 0) as unique_channels,
+            CASE WHEN t.n > 0 THEN t.sum_confidence / t.n ELSE 0 END as avg_confidence,
+            (SELECT COALESCE(SUM(n), 0) FROM agg_real_ads_hour
+             WHERE group_key > strftime('%Y-%m-%d %H:00:00', 'now', '-1 day')) as ads_last_24h
+          FROM (SELECT 1) LEFT JOIN agg_real_ads_total t ON t.group_key = 'all'
+        `)
+      : hasEpoch
+      ? await db.get(`
+          SELECT 
+            COUNT(*) as total_ads,
+            COUNT(DISTINCT channel_title) as unique_channels,
+            AVG(ad_confidence) as avg_confidence,
+            (SELECT COUNT(*) FROM real_ads
+             WHERE created_epoch > CAST(strftime('%s', 'now', '-1 day') AS INTEGER)) as ads_last_24h
+          FROM real_ads
+        `)
+      : await db.get(`
+          SELECT 
+            COUNT(*) as total_ads,
+            COUNT(DISTINCT channel_title) as unique_channels,
+            AVG(ad_confidence) as avg_confidence,
+            COUNT(CASE WHEN datetime(created_at) > datetime('now', '-1 day') THEN 1 END) as ads_last_24h
+          FROM real_ads
+        `)
 
     // Reclamele reale recente
     const recent_ads = await db.all(`
@@ -41,46 +78,88 @@ export async function GET() {
         like_count as likes, comment_count, duration_seconds as duration,
         ad_confidence as confidence_score, ad_type, created_at, thumbnail_url
       FROM real_ads 
-      ORDER BY created_at DESC 
+      ORDER BY ${hasEpoch ? "created_epoch" : "created_at"} DESC 
       LIMIT 20
     `)
 
     // Tipurile reale de reclame
-    const ad_types = await db.all(`
-      SELECT 
-        ad_type, 
-        COUNT(*) as count,
-        AVG(ad_confidence) as avg_confidence,
-        AVG(view_count) as avg_views
-      FROM real_ads 
-      WHERE ad_type IS NOT NULL AND ad_type != ''
-      GROUP BY ad_type 
-      ORDER BY count DESC
-    `)
+    const ad_types = hasAggregates
+      ? await db.all(`
+          SELECT 
+            group_key as ad_type,
+            n as count,
+            sum_confidence / n as avg_confidence,
+            sum_views * 1.0 / n as avg_views
+          FROM agg_real_ads_ad_type
+          WHERE n > 0
+          ORDER BY count DESC
+        `)
+      : await db.all(`
+          SELECT 
+            ad_type, 
+            COUNT(*) as count,
+            AVG(ad_confidence) as avg_confidence,
+            AVG(view_count) as avg_views
+          FROM real_ads 
+          WHERE ad_type IS NOT NULL AND ad_type != ''
+          GROUP BY ad_type 
+          ORDER BY count DESC
+        `)
 
     // Statistici pe ore (ultimele 24h)
-    const hourly_stats = await db.all(`
-      SELECT 
-        strftime('%H:00', created_at) as hour,
-        COUNT(*) as ads_count
-      FROM real_ads 
-      WHERE datetime(created_at) > datetime('now', '-1 day')
-      GROUP BY strftime('%H', created_at)
-      ORDER BY hour
-    `)
+    const hourly_stats = hasAggregates
+      ? await db.all(`
+          SELECT 
+            strftime('%H:00', group_key) as hour,
+            n as ads_count
+          FROM agg_real_ads_hour
+          WHERE group_key > strftime('%Y-%m-%d %H:00:00', 'now', '-1 day') AND n > 0
+          ORDER BY hour
+        `)
+      : hasEpoch
+      ? await db.all(`
+          SELECT 
+            strftime('%H:00', created_epoch, 'unixepoch') as hour,
+            COUNT(*) as ads_count
+          FROM real_ads 
+          WHERE created_epoch > CAST(strftime('%s', 'now', '-1 day') AS INTEGER)
+          GROUP BY hour
+          ORDER BY hour
+        `)
+      : await db.all(`
+          SELECT 
+            strftime('%H:00', created_at) as hour,
+            COUNT(*) as ads_count
+          FROM real_ads 
+          WHERE datetime(created_at) > datetime('now', '-1 day')
+          GROUP BY strftime('%H', created_at)
+          ORDER BY hour
+        `)
 
     // Top canale reale
-    const top_channels = await db.all(`
-      SELECT 
-        channel_title as channel,
-        COUNT(*) as ads_count,
-        AVG(view_count) as avg_views,
-        AVG(ad_confidence) as avg_confidence
-      FROM real_ads 
-      GROUP BY channel_title 
-      ORDER BY ads_count DESC 
-      LIMIT 10
-    `)
+    const top_channels = hasAggregates
+      ? await db.all(`
+          SELECT 
+            group_key as channel,
+            n as ads_count,
+            sum_views * 1.0 / n as avg_views,
+            sum_confidence / n as avg_confidence
+          FROM agg_real_ads_channel
+          WHERE n > 0
+          ORDER BY ads_count DESC 
+          LIMIT 10
+        `)
+      : await db.all(`
+          SELECT 
+            channel_title as channel,
+            COUNT(*) as ads_count,
+            AVG(view_count) as avg_views,
+            AVG(ad_confidence) as avg_confidence
+          FROM real_ads 
+          GROUP BY channel_title 
+          ORDER BY ads_count DESC 
+          LIMIT 10
+        `)
 
     // Verifică dacă crawler-ul rulează
     const crawlerRunning = fs.existsSync("/tmp/real_crawler.pid")
@@ -1,6 +1,7 @@
 import { NextResponse } from "next/server"
 import { exec } from "child_process"
 import { promisify } from "util"
+import { snapshotResponse } from "@/lib/snapshot"
 
 const execAsync = promisify(exec)
 
@@ -15,8 +16,14 @@ interface SystemMetrics {
   timestamp: string
 }
 
-export async function GET() {
+export async function GET(request: Request) {
   try {
+    // Metrici publicate de scripts/real_time_monitor.py; comenzile de sistem rămân fallback
+    const snapshot = await snapshotResponse(request, "system", 120)
+    if (snapshot) {
+      return snapshot
+    }
+
     const metrics: SystemMetrics = {
       cpu_usage: 0,
       memory_usage: 0,
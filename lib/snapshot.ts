@@ -0,0 +1,39 @@
+import { NextResponse } from "next/server"
+import fs from "fs"
+import path from "path"
+
+// Snapshot-urile publicate de scripts/dashboard_snapshot.py (un fișier JSON per endpoint)
+const SNAPSHOT_DIR = process.env.DASHBOARD_SNAPSHOT_DIR || "/data/ads/snapshots"
+
+/**
+ * Răspunsul din snapshot-ul precalculat, sau null dacă lipsește ori e mai vechi de maxAgeSeconds
+ * (publisher-ul oprit) - atunci ruta calculează datele direct din baza de date.
+ */
+export async function snapshotResponse(
+  request: Request,
+  name: string,
+  maxAgeSeconds: number,
+): Promise<NextResponse | null> {
+  const file = path.join(SNAPSHOT_DIR, `${name}.json`)
+  try {
+    const stat = await fs.promises.stat(file)
+    if (Date.now() - stat.mtimeMs > maxAgeSeconds * 1000) {
+      return null
+    }
+
+    const body = await fs.promises.readFile(file, "utf8")
+    const etag: string | undefined = JSON.parse(body).snapshot?.etag
+    const headers: Record<string, string> = { "Cache-Control": "no-cache" }
+    if (etag) {
+      headers.ETag = etag
+      if (request.headers.get("if-none-match") === etag) {
+        return new NextResponse(null, { status: 304, headers })
+      }
+    }
+
+    // Conținutul fișierului e deja răspunsul final: fără re-serializare
+    return new NextResponse(body, { headers: { ...headers, "Content-Type": "application/json" } })
+  } catch {
+    return null
+  }
+}
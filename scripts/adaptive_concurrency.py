@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Controler adaptiv de concurență (AIMD) pentru etapele crawler-ului
+Fiecare etapă (descărcare, analiză) are o limită redimensionabilă la runtime. La fiecare
+interval limitele cresc cu 1 cât timp există cerere și resurse libere și scad multiplicativ
+la presiune de memorie, CPU saturat (etape CPU-bound), rată mare de erori/timeout-uri sau
+latență mult peste valoarea de bază. Limitele curente și motivul fiecăreia: snapshot().
+"""
+
+import time
+import asyncio
+import logging
+import statistics
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+ADJUST_INTERVAL = 5.0       # secunde între ajustări
+MIN_SAMPLES = 4             # sub atâtea rezultate în fereastră nu se judecă erorile/latența
+
+MEMORY_CRITICAL = 90.0      # % RAM: toate etapele se înjumătățesc (evită OOM)
+MEMORY_HIGH = 80.0          # % RAM: nu se mai crește
+CPU_HIGH = 90.0             # % CPU: etapele CPU-bound scad
+CPU_TARGET = 75.0           # % CPU: etapele CPU-bound nu mai cresc
+ERROR_RATE_MAX = 0.25       # fracțiune erori + timeout-uri în fereastră
+LATENCY_TOLERANCE = 2.0     # latența mediană > 2x valoarea de bază = congestie
+BASELINE_DRIFT = 1.05       # valoarea de bază urcă lent, ca să urmeze schimbările reale
+
+DECREASE_FACTOR = 0.5       # scădere multiplicativă la memorie / erori
+SOFT_DECREASE_FACTOR = 0.75  # scădere la CPU / latență
+
+
+class AdaptiveLimiter:
+    """Semafor asyncio cu limită modificabilă; reține dacă au existat așteptări (cerere peste limită)"""
+
+    def __init__(self, name: str, initial: int, minimum: int, maximum: int, cpu_bound: bool = False):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.cpu_bound = cpu_bound
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+        self.reason = 'initial'
+        self.in_flight = 0
+        self.waiting = 0
+        self.saturated = False  # a așteptat cineva de la ultima ajustare
+        self._cond: Optional[asyncio.Condition] = None
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _condition(self) -> asyncio.Condition:
+        # Creată la prima folosire, în event loop-ul care o folosește
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def acquire(self):
+        cond = self._condition()
+        async with cond:
+            if self.in_flight >= self.limit:
+                self.saturated = True
+                self.waiting += 1
+                try:
+                    await cond.wait_for(lambda: self.in_flight < self.limit)
+                finally:
+                    self.waiting -= 1
+            self.in_flight += 1
+
+    async def release(self):
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify()
+
+    async def resize(self, limit: float, reason: str):
+        limit = min(max(limit, self.minimum), self.maximum)
+        old = self.limit
+        self._limit = limit
+        self.reason = reason
+        if self.limit != old:
+            logger.info(f"Concurrency {self.name}: {old} -> {self.limit} ({reason})")
+            cond = self._condition()
+            async with cond:
+                cond.notify_all()
+
+
+class StageWindow:
+    """Rezultatele unei etape de la ultima ajustare și latența de bază (minimul observat)"""
+
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=256)
+        self.errors = 0
+        self.timeouts = 0
+        self.completed = 0
+        self.baseline: Optional[float] = None
+
+    def record(self, latency: float, outcome: str):
+        self.completed += 1
+        if outcome == 'ok':
+            self.latencies.append(latency)
+        elif outcome == 'timeout':
+            self.timeouts += 1
+        else:
+            self.errors += 1
+
+    def summary(self) -> Tuple[int, float, Optional[float]]:
+        """(rezultate, rată erori+timeout, latența mediană) și actualizarea valorii de bază"""
+        failure_rate = (self.errors + self.timeouts) / self.completed if self.completed else 0.0
+        median = statistics.median(self.latencies) if self.latencies else None
+        if median is not None and len(self.latencies) >= MIN_SAMPLES:
+            self.baseline = median if self.baseline is None else min(self.baseline * BASELINE_DRIFT, median)
+        return self.completed, failure_rate, median
+
+    def reset(self):
+        self.latencies.clear()
+        self.errors = self.timeouts = self.completed = 0
+
+
+class ConcurrencyController:
+    def __init__(self, interval: float = ADJUST_INTERVAL, adaptive: bool = True):
+        self.interval = interval
+        self.adaptive = adaptive
+        self.limiters: Dict[str, AdaptiveLimiter] = {}
+        self.windows: Dict[str, StageWindow] = {}
+        self.last_stats: Dict[str, Dict[str, Any]] = {}
+        self.system: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        psutil.cpu_percent(interval=None)  # prima citire inițializează contorul
+
+    def add_stage(self, name: str, initial: int, maximum: int, minimum: int = 1,
+                  cpu_bound: bool = False) -> AdaptiveLimiter:
+        self.limiters[name] = AdaptiveLimiter(name, initial, minimum, maximum, cpu_bound)
+        self.windows[name] = StageWindow()
+        return self.limiters[name]
+
+    def capacity(self) -> int:
+        """Numărul maxim de unități care pot fi simultan în toate etapele"""
+        return sum(limiter.maximum for limiter in self.limiters.values())
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """Ocupă un loc în etapă și înregistrează latența și rezultatul (ok / error / timeout)"""
+        if self.adaptive and self._task is None:
+            self.start()
+        limiter = self.limiters[name]
+        await limiter.acquire()
+        start = time.monotonic()
+        outcome = 'ok'
+        try:
+            yield
+        except asyncio.TimeoutError:
+            outcome = 'timeout'
+            raise
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            self.windows[name].record(time.monotonic() - start, outcome)
+            await limiter.release()
+
+    def start(self):
+        self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.adjust()
+            except Exception as e:
+                logger.warning(f"Concurrency adjustment failed: {e}")
+
+    async def adjust(self):
+        """O rundă AIMD: decizia și motivul pentru fiecare etapă"""
+        cpu = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory().percent
+        self.system = {'cpu_percent': cpu, 'memory_percent': memory}
+
+        for name, limiter in self.limiters.items():
+            window = self.windows[name]
+            completed, failure_rate, median = window.summary()
+            self.last_stats[name] = {
+                'completed': completed,
+                'failure_rate': round(failure_rate, 3),
+                'latency_ms': round(median * 1000, 1) if median is not None else None,
+                'baseline_ms': round(window.baseline * 1000, 1) if window.baseline is not None else None,
+            }
+            current = limiter._limit
+
+            if memory >= MEMORY_CRITICAL:
+                await limiter.resize(current * DECREASE_FACTOR, f"memory {memory:.0f}% >= {MEMORY_CRITICAL:.0f}%")
+            elif completed >= MIN_SAMPLES and failure_rate >= ERROR_RATE_MAX:
+                await limiter.resize(current * DECREASE_FACTOR,
+                                     f"errors/timeouts {failure_rate:.0%} of {completed}")
+            elif limiter.cpu_bound and cpu >= CPU_HIGH:
+                await limiter.resize(current * SOFT_DECREASE_FACTOR, f"cpu {cpu:.0f}% >= {CPU_HIGH:.0f}%")
+            elif (median is not None and window.baseline and len(window.latencies) >= MIN_SAMPLES
+                  and median > window.baseline * LATENCY_TOLERANCE):
+                await limiter.resize(current * SOFT_DECREASE_FACTOR,
+                                     f"latency {median:.2f}s > {LATENCY_TOLERANCE:g}x baseline {window.baseline:.2f}s")
+            elif memory >= MEMORY_HIGH:
+                await limiter.resize(current, f"hold: memory {memory:.0f}%")
+            elif limiter.cpu_bound and cpu >= CPU_TARGET:
+                await limiter.resize(current, f"hold: cpu {cpu:.0f}%")
+            elif limiter.saturated:
+                reason = 'at maximum' if limiter.limit >= limiter.maximum else 'additive increase'
+                await limiter.resize(current + 1, reason)
+            else:
+                await limiter.resize(current, 'hold: no queued work')
+
+            limiter.saturated = limiter.waiting > 0
+            window.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Limitele curente, ocuparea și motivul ultimei decizii, per etapă"""
+        return {
+            'system': dict(self.system),
+            'stages': {
+                name: {
+                    'limit': limiter.limit,
+                    'min': limiter.minimum,
+                    'max': limiter.maximum,
+                    'in_flight': limiter.in_flight,
+                    'waiting': limiter.waiting,
+                    'reason': limiter.reason,
+                    **self.last_stats.get(name, {}),
+                }
+                for name, limiter in self.limiters.items()
+            },
+        }
+
+    def describe(self) -> str:
+        return ', '.join(f"{name}={limiter.limit} ({limiter.reason})" for name, limiter in self.limiters.items())
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Tabele agregate menținute incremental (per canal, zi, oră, tip de reclamă)
+Triggerele actualizează sumele la fiecare INSERT/UPDATE/DELETE, deci dashboard-ul
+citește O(grupuri) rânduri în loc să re-agrege toată tabela la fiecare request.
+
+Utilizare: python3 scripts/aggregates.py rebuild [cale_baza_de_date] [tabela_sursă]
+"""
+
+import re
+import sys
+import sqlite3
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Maparea coloanelor logice pe coloanele fiecărei tabele sursă.
+# Listele sunt candidați în ordinea preferinței (schemele crawler-elor diferă).
+SOURCES = {
+    'ads': {
+        'channel': ['channel'],
+        'ad_type': ['ad_type'],
+        'published': ['published_at'],
+        'created': ['created_at', 'processed_at', 'timestamp'],
+        'views': ['views'],
+        'likes': ['likes'],
+        'engagement': ['engagement_rate'],
+        'confidence': ['confidence_score'],
+    },
+    'real_ads': {
+        'channel': ['channel_title'],
+        'ad_type': ['ad_type'],
+        'published': ['published_at'],
+        'created': ['created_at'],
+        'views': ['view_count'],
+        'likes': ['like_count'],
+        'engagement': [],
+        'confidence': ['ad_confidence'],
+    },
+}
+
+# Dimensiunile de grupare: expresia cheii în funcție de coloanele logice
+DIMENSIONS = {
+    'total': lambda cols: "'all'",
+    'channel': lambda cols: cols['channel'],
+    'ad_type': lambda cols: f"NULLIF({cols['ad_type']}, '')" if cols['ad_type'] != 'NULL' else 'NULL',
+    'day': lambda cols: f"DATE({cols['published']})",
+    'hour': lambda cols: f"strftime('%Y-%m-%d %H:00:00', {cols['created']})",
+}
+
+SUM_METRICS = ['views', 'likes', 'engagement', 'confidence']
+
+
+def aggregate_table(source: str, dimension: str) -> str:
+    return f"agg_{source}_{dimension}"
+
+
+def _watched_columns(conn: sqlite3.Connection, source: str) -> List[str]:
+    """Coloanele din care derivă agregatele; UPDATE-urile pe alte coloane nu ating tabelele agregate"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({source})")}
+    return [c for candidates in SOURCES[source].values() for c in candidates if c in existing]
+
+
+def _resolve_columns(conn: sqlite3.Connection, source: str) -> Dict[str, str]:
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({source})")}
+    resolved = {}
+    for logical, candidates in SOURCES[source].items():
+        present = [c for c in candidates if c in existing]
+        if len(present) > 1:
+            resolved[logical] = f"COALESCE({', '.join(present)})"
+        elif present:
+            resolved[logical] = present[0]
+        else:
+            resolved[logical] = 'NULL'
+    return resolved
+
+
+def _prefix(expr: str, ref: str) -> str:
+    """Prefixează numele de coloane simple dintr-o expresie cu NEW./OLD."""
+    if expr in ('NULL', "'all'"):
+        return expr
+    keywords = {'COALESCE', 'NULLIF', 'DATE', 'strftime', 'NULL'}
+
+    def sub(match):
+        word = match.group(0)
+        if word in keywords:
+            return word
+        return f"{ref}.{word}"
+
+    # Nu atinge literalii între apostrofuri
+    parts = expr.split("'")
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r'\b[A-Za-z_][A-Za-z0-9_]*\b', sub, parts[i])
+    return "'".join(parts)
+
+
+def _create_table_sql(table: str, with_audio: bool) -> str:
+    audio_columns = """,
+            n_audio INTEGER NOT NULL DEFAULT 0,
+            sum_tempo REAL NOT NULL DEFAULT 0,
+            sum_energy REAL NOT NULL DEFAULT 0""" if with_audio else ""
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            group_key TEXT PRIMARY KEY,
+            n INTEGER NOT NULL DEFAULT 0,
+            sum_views REAL NOT NULL DEFAULT 0,
+            sum_likes REAL NOT NULL DEFAULT 0,
+            sum_engagement REAL NOT NULL DEFAULT 0,
+            sum_confidence REAL NOT NULL DEFAULT 0,
+            first_published TEXT,
+            latest_published TEXT{audio_columns}
+        )
+    """
+
+
+def _add_sql(table: str, v: Dict[str, str]) -> str:
+    return f"""
+        INSERT INTO {table} (group_key, n, sum_views, sum_likes, sum_engagement, sum_confidence,
+                             first_published, latest_published)
+        SELECT {v['key']}, 1, {v['views']}, {v['likes']}, {v['engagement']}, {v['confidence']},
+               {v['published']}, {v['published']}
+        WHERE {v['key']} IS NOT NULL
+        ON CONFLICT(group_key) DO UPDATE SET
+            n = n + 1,
+            sum_views = sum_views + excluded.sum_views,
+            sum_likes = sum_likes + excluded.sum_likes,
+            sum_engagement = sum_engagement + excluded.sum_engagement,
+            sum_confidence = sum_confidence + excluded.sum_confidence,
+            first_published = COALESCE(MIN(first_published, excluded.first_published), excluded.first_published),
+            latest_published = COALESCE(MAX(latest_published, excluded.latest_published), excluded.latest_published);
+    """
+
+
+def _remove_sql(table: str, v: Dict[str, str], prune: bool, with_audio: bool = False) -> str:
+    # first/latest_published nu se pot corecta incremental la ștergere; rebuild le recalculează
+    prune_sql = ""
+    if prune:
+        audio_condition = " AND n_audio <= 0" if with_audio else ""
+        prune_sql = f"DELETE FROM {table} WHERE group_key = {v['key']} AND n <= 0{audio_condition};"
+    return f"""
+        UPDATE {table} SET
+            n = n - 1,
+            sum_views = sum_views - {v['views']},
+            sum_likes = sum_likes - {v['likes']},
+            sum_engagement = sum_engagement - {v['engagement']},
+            sum_confidence = sum_confidence - {v['confidence']}
+        WHERE group_key = {v['key']};
+        {prune_sql}
+    """
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def _add_audio_columns(conn: sqlite3.Connection, table: str) -> bool:
+    """Adaugă coloanele audio dacă tabela zilnică a fost creată înainte de audio_features"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    added = False
+    for column, definition in (('n_audio', 'INTEGER NOT NULL DEFAULT 0'),
+                               ('sum_tempo', 'REAL NOT NULL DEFAULT 0'),
+                               ('sum_energy', 'REAL NOT NULL DEFAULT 0')):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            added = True
+    return added
+
+
+def install_aggregates(conn: sqlite3.Connection, source: str):
+    """Creează tabelele agregate și triggerele pentru tabela sursă; face backfill la prima instalare"""
+    if source not in SOURCES or not _table_exists(conn, source):
+        return
+
+    cols = _resolve_columns(conn, source)
+    watched = ', '.join(_watched_columns(conn, source))
+    with_audio = source == 'ads' and _table_exists(conn, 'audio_features')
+    needs_rebuild = False
+
+    for dimension, key_fn in DIMENSIONS.items():
+        table = aggregate_table(source, dimension)
+        if not _table_exists(conn, table):
+            needs_rebuild = True
+        table_audio = with_audio and dimension == 'day'
+        conn.execute(_create_table_sql(table, table_audio))
+        if table_audio and _add_audio_columns(conn, table):
+            needs_rebuild = True
+
+        key_expr = key_fn(cols)
+        new = {'key': _prefix(key_expr, 'NEW'), 'published': _prefix(cols['published'], 'NEW')}
+        old = {'key': _prefix(key_expr, 'OLD'), 'published': _prefix(cols['published'], 'OLD')}
+        for metric in SUM_METRICS:
+            new[metric] = f"COALESCE({_prefix(cols[metric], 'NEW')}, 0)"
+            old[metric] = f"COALESCE({_prefix(cols[metric], 'OLD')}, 0)"
+
+        trigger = f"trg_{table}"
+        conn.executescript(f"""
+            DROP TRIGGER IF EXISTS {trigger}_ins;
+            DROP TRIGGER IF EXISTS {trigger}_del;
+            DROP TRIGGER IF EXISTS {trigger}_upd;
+            CREATE TRIGGER {trigger}_ins AFTER INSERT ON {source} BEGIN
+                {_add_sql(table, new)}
+            END;
+            CREATE TRIGGER {trigger}_del AFTER DELETE ON {source} BEGIN
+                {_remove_sql(table, old, prune=True, with_audio=table_audio)}
+            END;
+            CREATE TRIGGER {trigger}_upd AFTER UPDATE OF {watched} ON {source} BEGIN
+                {_remove_sql(table, old, prune=False)}
+                {_add_sql(table, new)}
+            END;
+        """)
+
+    if with_audio:
+        _install_audio_triggers(conn, cols)
+        _install_view_overrides(conn)
+
+    if needs_rebuild:
+        rebuild_aggregates(conn, source)
+
+
+def _install_audio_triggers(conn: sqlite3.Connection, cols: Dict[str, str]):
+    """tempo/energy medii pe zi (temporal_trends) - din audio_features, cheia zilei din ads"""
+    table = aggregate_table('ads', 'day')
+    day_of = f"(SELECT DATE({cols['published']}) FROM ads WHERE id = {{ref}}.ad_id)"
+    conn.executescript(f"""
+        DROP TRIGGER IF EXISTS trg_{table}_audio_ins;
+        DROP TRIGGER IF EXISTS trg_{table}_audio_del;
+        DROP TRIGGER IF EXISTS trg_{table}_audio_upd;
+        CREATE TRIGGER trg_{table}_audio_ins AFTER INSERT ON audio_features BEGIN
+            UPDATE {table} SET
+                n_audio = n_audio + 1,
+                sum_tempo = sum_tempo + COALESCE(NEW.tempo, 0),
+                sum_energy = sum_energy + COALESCE(NEW.energy, 0)
+            WHERE group_key = {day_of.format(ref='NEW')};
+        END;
+        CREATE TRIGGER trg_{table}_audio_del AFTER DELETE ON audio_features BEGIN
+            UPDATE {table} SET
+                n_audio = n_audio - 1,
+                sum_tempo = sum_tempo - COALESCE(OLD.tempo, 0),
+                sum_energy = sum_energy - COALESCE(OLD.energy, 0)
+            WHERE group_key = {day_of.format(ref='OLD')};
+        END;
+        CREATE TRIGGER trg_{table}_audio_upd AFTER UPDATE OF tempo, energy ON audio_features BEGIN
+            UPDATE {table} SET
+                sum_tempo = sum_tempo - COALESCE(OLD.tempo, 0) + COALESCE(NEW.tempo, 0),
+                sum_energy = sum_energy - COALESCE(OLD.energy, 0) + COALESCE(NEW.energy, 0)
+            WHERE group_key = {day_of.format(ref='NEW')};
+        END;
+    """)
+
+
+def _install_view_overrides(conn: sqlite3.Connection):
+    """Redefinește view-urile channel_stats / temporal_trends peste tabelele agregate"""
+    conn.executescript("""
+        DROP VIEW IF EXISTS channel_stats;
+        CREATE VIEW channel_stats AS
+        SELECT
+            group_key as channel,
+            n as total_ads,
+            sum_views * 1.0 / n as avg_views,
+            sum_likes * 1.0 / n as avg_likes,
+            sum_engagement / n as avg_engagement,
+            first_published as first_ad,
+            latest_published as latest_ad
+        FROM agg_ads_channel
+        WHERE n > 0;
+
+        DROP VIEW IF EXISTS temporal_trends;
+        CREATE VIEW temporal_trends AS
+        SELECT
+            group_key as date,
+            n as ads_count,
+            sum_views * 1.0 / n as avg_views,
+            sum_engagement / n as avg_engagement,
+            CASE WHEN n_audio > 0 THEN sum_tempo / n_audio END as avg_tempo,
+            CASE WHEN n_audio > 0 THEN sum_energy / n_audio END as avg_energy
+        FROM agg_ads_day
+        WHERE n > 0
+        ORDER BY date;
+    """)
+
+
+def rebuild_aggregates(conn: sqlite3.Connection, source: str):
+    """Recalculează complet tabelele agregate din tabela sursă (backfill)"""
+    cols = _resolve_columns(conn, source)
+    for dimension, key_fn in DIMENSIONS.items():
+        table = aggregate_table(source, dimension)
+        key_expr = key_fn(cols)
+        metrics = ', '.join(f"SUM(COALESCE({cols[m]}, 0))" for m in SUM_METRICS)
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"""
+            INSERT INTO {table} (group_key, n, sum_views, sum_likes, sum_engagement, sum_confidence,
+                                 first_published, latest_published)
+            SELECT {key_expr} AS k, COUNT(*), {metrics},
+                   MIN({cols['published']}), MAX({cols['published']})
+            FROM {source}
+            WHERE k IS NOT NULL
+            GROUP BY k
+        """)
+
+    if source == 'ads' and _table_exists(conn, 'audio_features'):
+        table = aggregate_table('ads', 'day')
+        conn.execute(f"""
+            UPDATE {table} SET (n_audio, sum_tempo, sum_energy) = (
+                SELECT COUNT(af.ad_id), COALESCE(SUM(af.tempo), 0), COALESCE(SUM(af.energy), 0)
+                FROM audio_features af
+                JOIN ads a ON a.id = af.ad_id
+                WHERE DATE({_prefix(cols['published'], 'a')}) = {table}.group_key
+            )
+        """)
+
+    logger.info(f"Rebuilt aggregate tables for {source}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild':
+        print("Usage: aggregates.py rebuild [database_path] [source_table]")
+        sys.exit(1)
+
+    db_path = sys.argv[2] if len(sys.argv) > 2 else '/data/ads/ads_database.db'
+    sources: List[str] = [sys.argv[3]] if len(sys.argv) > 3 else list(SOURCES)
+    with sqlite3.connect(db_path) as conn:
+        for source in sources:
+            if _table_exists(conn, source):
+                install_aggregates(conn, source)
+                rebuild_aggregates(conn, source)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark: k-means la rezoluție completă vs. extractorul rapid de paletă
+Rulare: python3 scripts/benchmark_color_palette.py [--images N] [--width W --height H]
+"""
+
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+from color_palette import extract_palette
+
+
+def legacy_palette(img, k=5):
+    """Algoritmul vechi: cv2.kmeans pe toți pixelii, 10 încercări"""
+    data = np.float32(img.reshape((-1, 3)))
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
+    _, labels, centers = cv2.kmeans(data, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
+    share = np.bincount(labels.ravel(), minlength=k) / len(labels)
+    order = np.argsort(-share)
+    return [(tuple(centers[i]), float(share[i])) for i in order]
+
+
+def synthetic_thumbnail(rng, width, height):
+    """Thumbnail sintetic: blocuri de culoare cu zgomot și un gradient"""
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    base_colors = rng.integers(0, 256, size=(5, 3))
+    shares = rng.dirichlet(np.ones(5))
+    edges = np.concatenate([[0], np.cumsum(shares) * width]).astype(int)
+    for color, x0, x1 in zip(base_colors, edges[:-1], edges[1:]):
+        img[:, x0:x1] = color
+    noise = rng.normal(0, 8, size=img.shape)
+    gradient = np.linspace(-10, 10, height)[:, None, None]
+    return np.clip(img + noise + gradient, 0, 255).astype(np.uint8)
+
+
+def palette_distance(reference, candidate):
+    """Distanța medie (ponderată cu procentul) între fiecare culoare de referință și cea mai apropiată candidată"""
+    cand = np.array([c for c, _ in candidate], dtype=np.float64)
+    total = 0.0
+    for color, share in reference:
+        total += share * np.min(np.linalg.norm(cand - np.array(color, dtype=np.float64), axis=1))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark extragere culori dominante')
+    parser.add_argument('--images', type=int, default=10)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    images = [synthetic_thumbnail(rng, args.width, args.height) for _ in range(args.images)]
+
+    extract_palette(images[0])  # warm-up
+
+    start = time.perf_counter()
+    legacy = [legacy_palette(img) for img in images]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = [extract_palette(img) for img in images]
+    fast_time = time.perf_counter() - start
+
+    distances = [palette_distance(ref, cand) for ref, cand in zip(legacy, fast)]
+
+    print(f"Images: {args.images} x {args.width}x{args.height}")
+    print(f"Legacy k-means:  {legacy_time / args.images * 1000:8.2f} ms/image")
+    print(f"Fast palette:    {fast_time / args.images * 1000:8.2f} ms/image")
+    print(f"Speedup:         {legacy_time / fast_time:8.1f}x")
+    print(f"Palette distance (BGR, share-weighted): mean {np.mean(distances):.2f}, max {np.max(distances):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark: interogările dashboard-ului pe timestamp-uri TEXT vs. coloane epoch indexate
+Construiește o bază de date sintetică (formate de timp mixte), rulează fiecare interogare
+în ambele variante, verifică rezultatele identice și afișează timpul median și planul de execuție.
+Rulare: python3 scripts/benchmark_dashboard_queries.py [--rows N] [--days D] [--repeat R]
+"""
+
+import os
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta, timezone
+
+from epoch_columns import install_epoch_columns
+
+# (nume, interogarea veche, interogarea pe coloane epoch)
+QUERIES = [
+    ('last_24h_count',
+     "SELECT COUNT(CASE WHEN datetime(created_at) > datetime('now', '-1 day') THEN 1 END) FROM ads",
+     "SELECT COUNT(*) FROM ads WHERE created_epoch > CAST(strftime('%s', 'now', '-1 day') AS INTEGER)"),
+    ('hourly_buckets',
+     """SELECT strftime('%H:00', created_at) as hour, COUNT(*) FROM ads
+        WHERE datetime(created_at) > datetime('now', '-1 day')
+        GROUP BY strftime('%H', created_at) ORDER BY hour""",
+     """SELECT strftime('%H:00', created_epoch, 'unixepoch') as hour, COUNT(*) FROM ads
+        WHERE created_epoch > CAST(strftime('%s', 'now', '-1 day') AS INTEGER)
+        GROUP BY hour ORDER BY hour"""),
+    ('recent_ads',
+     "SELECT id, video_id, title FROM ads ORDER BY datetime(created_at) DESC, id DESC LIMIT 20",
+     "SELECT id, video_id, title FROM ads ORDER BY created_epoch DESC, id DESC LIMIT 20"),
+    ('ad_type_groups',
+     """SELECT ad_type, COUNT(*), AVG(confidence_score), AVG(views) FROM ads NOT INDEXED
+        WHERE ad_type IS NOT NULL GROUP BY ad_type ORDER BY ad_type""",
+     """SELECT ad_type, COUNT(*), AVG(confidence_score), AVG(views) FROM ads
+        WHERE ad_type IS NOT NULL GROUP BY ad_type ORDER BY ad_type"""),
+    ('top_channels',
+     """SELECT channel, COUNT(*) as n, AVG(views), AVG(engagement_rate) FROM ads NOT INDEXED
+        GROUP BY channel ORDER BY n DESC, channel LIMIT 10""",
+     """SELECT channel, COUNT(*) as n, AVG(views), AVG(engagement_rate) FROM ads
+        GROUP BY channel ORDER BY n DESC, channel LIMIT 10"""),
+]
+
+AD_TYPES = ['automotive', 'food', 'technology', 'retail', 'finance', 'telecom', None]
+
+
+def format_timestamp(rng: random.Random, moment: datetime) -> str:
+    """Formatele întâlnite în tabelă: CURRENT_TIMESTAMP, ISO cu 'Z', isoformat() cu microsecunde"""
+    style = rng.randrange(3)
+    if style == 0:
+        return moment.strftime('%Y-%m-%d %H:%M:%S')
+    if style == 1:
+        return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+    return moment.replace(tzinfo=None).isoformat()
+
+
+def build_database(path: str, rows: int, days: int):
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc).replace(microsecond=123456)
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE ads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                video_id TEXT UNIQUE NOT NULL,
+                title TEXT,
+                published_at TEXT,
+                channel TEXT,
+                views INTEGER DEFAULT 0,
+                engagement_rate REAL DEFAULT 0.0,
+                confidence_score REAL DEFAULT 0.0,
+                ad_type TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Indexurile existente pe coloanele TEXT (youtube_real_crawler.py)
+        conn.execute("CREATE INDEX idx_created_at ON ads(created_at)")
+        conn.execute("CREATE INDEX idx_ad_type ON ads(ad_type)")
+
+        data = []
+        for i in range(rows):
+            created = now - timedelta(seconds=int(days * 86400 * (i / rows) ** 0.5))
+            published = created - timedelta(days=rng.randrange(30))
+            data.append((f"vid{i:09d}", f"Ad {i}", format_timestamp(rng, published),
+                         f"channel{rng.randrange(2000)}", rng.randrange(1_000_000), rng.random() * 0.1,
+                         rng.random(), rng.choice(AD_TYPES), format_timestamp(rng, created)))
+        # Cele mai noi rânduri au id-ul cel mai mare, ca la inserarea de către crawler
+        data.reverse()
+        conn.executemany("""
+            INSERT INTO ads (video_id, title, published_at, channel, views, engagement_rate,
+                             confidence_score, ad_type, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, data)
+        install_epoch_columns(conn, 'ads')
+        conn.execute("ANALYZE")
+
+
+def time_query(conn: sqlite3.Connection, sql: str, repeat: int):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = conn.execute(sql).fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def normalized(rows):
+    """AVG-urile diferă în ultimele zecimale după ordinea de însumare (scan vs. index)"""
+    return [tuple(round(v, 9) if isinstance(v, float) else v for v in row) for row in rows]
+
+
+def query_plan(conn: sqlite3.Connection, sql: str) -> str:
+    return '; '.join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark interogări dashboard (TEXT vs. epoch)')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        start = time.perf_counter()
+        build_database(path, args.rows, args.days)
+        print(f"Rows: {args.rows} over {args.days} days (built in {time.perf_counter() - start:.1f}s)")
+
+        with sqlite3.connect(path) as conn:
+            for name, legacy_sql, epoch_sql in QUERIES:
+                legacy_time, legacy_rows = time_query(conn, legacy_sql, args.repeat)
+                epoch_time, epoch_rows = time_query(conn, epoch_sql, args.repeat)
+                same = 'ok' if normalized(legacy_rows) == normalized(epoch_rows) else 'MISMATCH'
+                print(f"\n{name}: legacy {legacy_time * 1000:8.2f} ms   epoch {epoch_time * 1000:8.2f} ms   "
+                      f"speedup {legacy_time / max(epoch_time, 1e-9):6.1f}x   results {same}")
+                print(f"  legacy plan: {query_plan(conn, legacy_sql)}")
+                print(f"  epoch plan:  {query_plan(conn, epoch_sql)}")
+
+
+if __name__ == "__main__":
+    main()
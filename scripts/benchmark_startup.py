@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: timpul de pornire și memoria la importul modulelor crawler-ului
+Fiecare modul e importat într-un interpretor nou (director de lucru temporar); se raportează
+timpul de import, RSS maxim și bibliotecile grele încărcate. Cu --preload se măsoară și
+încărcarea modulelor etapelor (lazy_imports.STAGE_MODULES), ca la pornirea unui worker.
+Rulare: python3 scripts/benchmark_startup.py [--preload youtube_api,thumbnail,audio,download] [modul ...]
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MODULES = [
+    'job_queue', 'crawl_scheduler', 'stats_refresher', 'dashboard_snapshot',
+    'youtube_real_crawler', 'real_youtube_crawler', 'youtube_ads_analyzer_2025',
+    'improved_crawler', 'multi_gpu_crawler',
+]
+HEAVY_MODULES = ['torch', 'torchaudio', 'scipy', 'PIL', 'cv2', 'numba', 'librosa.feature',
+                 'googleapiclient.discovery', 'yt_dlp', 'numpy']
+
+PROBE = """
+import sys, time, json, resource, importlib
+start = time.perf_counter()
+error = None
+try:
+    importlib.import_module(sys.argv[1])
+except BaseException as e:
+    error = f"{type(e).__name__}: {e}"
+import_seconds = time.perf_counter() - start
+preloaded = {}
+if sys.argv[2] and error is None:
+    from lazy_imports import preload
+    preloaded = preload(sys.argv[2].split(','))
+print(json.dumps({
+    'seconds': import_seconds,
+    'preload_seconds': sum(preloaded.values()),
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': [m for m in HEAVY if m in sys.modules],
+    'error': error,
+}))
+"""
+
+
+def measure(module: str, preload: str, cwd: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SCRIPTS_DIR, os.environ.get('PYTHONPATH')])))
+    code = f"HEAVY = {HEAVY_MODULES!r}\n{PROBE}"
+    result = subprocess.run([sys.executable, '-c', code, module, preload],
+                            capture_output=True, text=True, cwd=cwd, env=env, timeout=300)
+    lines = result.stdout.strip().splitlines()
+    if not lines:
+        return {'seconds': 0.0, 'preload_seconds': 0.0, 'rss_mb': 0.0, 'heavy': [],
+                'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'no output'}
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark timp de pornire și memorie per modul')
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--preload', default='', help='etapele de preîncărcat după import, separate prin virgulă')
+    parser.add_argument('--repeat', type=int, default=3, help='rulări per modul (se raportează mediana)')
+    args = parser.parse_args()
+
+    print(f"{'module':<28} {'import':>8} {'preload':>8} {'rss':>8}  heavy modules loaded")
+    # Modulele care configurează logging la import scriu fișiere în directorul curent
+    with tempfile.TemporaryDirectory() as cwd:
+        for module in args.modules:
+            runs = sorted((measure(module, args.preload, cwd) for _ in range(args.repeat)),
+                          key=lambda r: r['seconds'])
+            run = runs[len(runs) // 2]
+            if run['error']:
+                print(f"{module:<28} {'-':>8} {'-':>8} {'-':>8}  {run['error'][:70]}")
+                continue
+            print(f"{module:<28} {run['seconds']:>7.2f}s {run['preload_seconds']:>7.2f}s "
+                  f"{run['rss_mb']:>6.0f}MB  {', '.join(run['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Extragere rapidă a paletei de culori dominante
+Downsampling + histogramă 3D cuantizată + câteva iterații k-means ponderate pe centrele histogramei
+"""
+
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import('cv2')
+
+logger = logging.getLogger(__name__)
+
+MAX_SIDE = 96          # latura maximă după downsampling
+BITS_PER_CHANNEL = 4   # 16 niveluri per canal -> 4096 celule în histogramă
+REFINE_ITERATIONS = 5
+
+
+def _downsample(img: np.ndarray, max_side: int) -> np.ndarray:
+    h, w = img.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1.0:
+        return img
+    return cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+def _histogram_centers(pixels: np.ndarray, bits: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Cuantizează pixelii și returnează culoarea medie și numărul de pixeli din fiecare celulă ocupată"""
+    shift = 8 - bits
+    q = (pixels >> shift).astype(np.int32)
+    index = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+
+    n_bins = 1 << (3 * bits)
+    counts = np.bincount(index, minlength=n_bins)
+    occupied = np.nonzero(counts)[0]
+
+    sums = np.stack([
+        np.bincount(index, weights=pixels[:, c], minlength=n_bins)[occupied]
+        for c in range(3)
+    ], axis=1)
+    weights = counts[occupied].astype(np.float64)
+    return sums / weights[:, None], weights
+
+
+def _initial_centers(centers: np.ndarray, weights: np.ndarray, k: int) -> np.ndarray:
+    """Alege centrele inițiale: celulele cele mai populate, ponderate cu distanța față de cele deja alese"""
+    chosen = [int(np.argmax(weights))]
+    min_dist = np.sum((centers - centers[chosen[0]]) ** 2, axis=1)
+    for _ in range(1, min(k, len(centers))):
+        score = weights * min_dist
+        nxt = int(np.argmax(score))
+        if score[nxt] <= 0:
+            break
+        chosen.append(nxt)
+        min_dist = np.minimum(min_dist, np.sum((centers - centers[nxt]) ** 2, axis=1))
+    return centers[chosen].copy()
+
+
+def extract_palette(img: np.ndarray, k: int = 5, max_side: int = MAX_SIDE,
+                    bits: int = BITS_PER_CHANNEL,
+                    refine_iterations: int = REFINE_ITERATIONS) -> List[Tuple[Tuple[int, int, int], float]]:
+    """Returnează [(culoare BGR, procent pixeli)] sortat descrescător după procent"""
+    small = _downsample(img, max_side)
+    pixels = small.reshape(-1, 3)
+    centers, weights = _histogram_centers(pixels, bits)
+
+    palette = _initial_centers(centers, weights, k)
+
+    # K-means ponderat pe centrele histogramei (sute de puncte în loc de sute de mii)
+    for _ in range(refine_iterations):
+        dist = np.sum((centers[:, None, :] - palette[None, :, :]) ** 2, axis=2)
+        labels = np.argmin(dist, axis=1)
+        mass = np.bincount(labels, weights=weights, minlength=len(palette))
+        updated = palette.copy()
+        for c in range(3):
+            col_sum = np.bincount(labels, weights=weights * centers[:, c], minlength=len(palette))
+            nonzero = mass > 0
+            updated[nonzero, c] = col_sum[nonzero] / mass[nonzero]
+        if np.allclose(updated, palette, atol=0.5):
+            palette = updated
+            break
+        palette = updated
+
+    dist = np.sum((centers[:, None, :] - palette[None, :, :]) ** 2, axis=2)
+    labels = np.argmin(dist, axis=1)
+    mass = np.bincount(labels, weights=weights, minlength=len(palette))
+    share = mass / mass.sum()
+
+    order = np.argsort(-share)
+    return [
+        (tuple(int(round(v)) for v in palette[i]), float(share[i]))
+        for i in order if share[i] > 0
+    ]
+
+
+def to_hex(bgr: Tuple[int, int, int]) -> str:
+    """Convertește o culoare BGR în hex RGB"""
+    b, g, r = (min(255, max(0, v)) for v in bgr)
+    return "#{:02x}{:02x}{:02x}".format(r, g, b)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Planificarea adaptivă a căutărilor pentru crawler-ele continue
+Fiecare query are rata observată de videoclipuri noi (EWMA, pe oră) și costul mediu în unități
+de quota. Următoarea rulare e programată când sunt așteptate ~TARGET_NEW_PER_POLL rezultate noi:
+query-urile active sunt interogate des, cele moarte rar. Dacă planul depășește quota zilnică,
+toate intervalele se lungesc proporțional, iar token bucket-ul (QuotaBudget) împarte bugetul
+uniform pe parcursul zilei. Starea se păstrează în tabela crawl_schedule.
+
+Utilizare: python3 scripts/crawl_scheduler.py [cale_baza_de_date]
+"""
+
+import sys
+import time
+import sqlite3
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+from stats_refresher import QuotaBudget
+
+logger = logging.getLogger(__name__)
+
+SEARCH_UNITS = 100   # search.list
+DETAILS_UNITS = 1    # videos.list
+
+QUOTA_UNITS_PER_DAY = 10000
+MIN_INTERVAL = 300
+MAX_INTERVAL = 6 * 3600
+TARGET_NEW_PER_POLL = 5
+RATE_SMOOTHING = 0.3
+SEEN_PER_QUERY = 1000  # ID-urile reținute per query pentru a recunoaște rezultatele noi
+
+
+@dataclass
+class QueryState:
+    query: str
+    rate: Optional[float] = None   # videoclipuri noi pe oră (EWMA); None = încă nemăsurat
+    units: float = SEARCH_UNITS    # cost mediu al unei rulări (căutare + detalii)
+    last_run: float = 0.0
+    next_due: float = 0.0
+    seen: 'OrderedDict[str, None]' = field(default_factory=OrderedDict)
+
+
+class CrawlScheduler:
+    def __init__(self, queries: Iterable[str], db_path: Optional[str] = None,
+                 units_per_day: int = QUOTA_UNITS_PER_DAY, min_interval: float = MIN_INTERVAL,
+                 max_interval: float = MAX_INTERVAL, target_new: float = TARGET_NEW_PER_POLL):
+        self.db_path = db_path
+        self.units_per_day = units_per_day
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new = target_new
+        self.budget = QuotaBudget(units_per_day)
+        self.states = {query: QueryState(query) for query in queries}
+        if db_path:
+            self._load_state()
+
+    # --- Stare persistentă ---
+
+    def _load_state(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS crawl_schedule (
+                    query TEXT PRIMARY KEY,
+                    rate REAL,                  -- videoclipuri noi pe oră
+                    units REAL NOT NULL,        -- unități de quota per rulare
+                    last_run REAL NOT NULL,     -- epoch
+                    next_due REAL NOT NULL      -- epoch
+                )
+            """)
+            for query, rate, units, last_run, next_due in conn.execute(
+                    "SELECT query, rate, units, last_run, next_due FROM crawl_schedule"):
+                state = self.states.get(query)
+                if state:
+                    state.rate, state.units, state.last_run, state.next_due = rate, units, last_run, next_due
+
+    def _save_state(self, state: QueryState):
+        if not self.db_path:
+            return
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute("""
+                INSERT INTO crawl_schedule (query, rate, units, last_run, next_due) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(query) DO UPDATE SET rate = excluded.rate, units = excluded.units,
+                    last_run = excluded.last_run, next_due = excluded.next_due
+            """, (state.query, state.rate, state.units, state.last_run, state.next_due))
+
+    # --- Planificare ---
+
+    def _base_interval(self, state: QueryState) -> float:
+        if state.rate is None:
+            return self.min_interval  # query nou: măsurăm repede
+        if state.rate <= 0:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, self.target_new / state.rate * 3600))
+
+    def quota_stretch(self) -> float:
+        """Factorul (>= 1) cu care se lungesc intervalele ca planul să încapă în quota zilnică"""
+        planned = sum(86400 / self._base_interval(s) * s.units for s in self.states.values())
+        return max(1.0, planned / self.units_per_day)
+
+    def interval(self, state: QueryState) -> float:
+        return min(self.max_interval, self._base_interval(state) * self.quota_stretch())
+
+    def next_run(self) -> Tuple[str, float]:
+        """(query, secunde de așteptat): cel mai curând scadent, dacă bugetul de quota permite"""
+        state = min(self.states.values(), key=lambda s: s.next_due)
+        wait = max(0.0, state.next_due - time.time(), self.budget.wait_time(state.units))
+        return state.query, wait
+
+    def record(self, query: str, video_ids: List[str], units: float):
+        """Rezultatele unei rulări: actualizează rata, costul și următoarea scadență"""
+        state = self.states[query]
+        now = time.time()
+        self.budget.consume(units)
+
+        had_history = bool(state.seen)
+        new = [v for v in video_ids if v not in state.seen]
+        for video_id in video_ids:
+            state.seen[video_id] = None
+            state.seen.move_to_end(video_id)
+        while len(state.seen) > SEEN_PER_QUERY:
+            state.seen.popitem(last=False)
+
+        # Prima rulare după pornire nu are termen de comparație: doar umple lista de ID-uri văzute
+        if state.last_run and (had_history or not video_ids):
+            hours = max((now - state.last_run) / 3600, 1e-3)
+            sample = len(new) / hours
+            state.rate = sample if state.rate is None else (
+                RATE_SMOOTHING * sample + (1 - RATE_SMOOTHING) * state.rate)
+        state.units = RATE_SMOOTHING * units + (1 - RATE_SMOOTHING) * state.units
+        state.last_run = now
+        state.next_due = now + self.interval(state)
+        self._save_state(state)
+
+        rate = f"{state.rate:.1f}/h" if state.rate is not None else "unmeasured"
+        logger.info(f"Query '{query}': {len(new)} new, rate {rate}, next run in {state.next_due - now:.0f}s")
+        return len(new)
+
+    def describe(self) -> List[dict]:
+        now = time.time()
+        return [{
+            'query': s.query,
+            'rate_per_hour': round(s.rate, 2) if s.rate is not None else None,
+            'units_per_run': round(s.units, 1),
+            'interval': round(self.interval(s)),
+            'due_in': round(max(0.0, s.next_due - now)),
+        } for s in sorted(self.states.values(), key=lambda s: s.next_due)]
+
+
+def main():
+    """Afișează planul salvat: rata, costul și scadența fiecărui query"""
+    db_path = sys.argv[1] if len(sys.argv) > 1 else '/data/ads/ads_database.db'
+    with sqlite3.connect(db_path) as conn:
+        try:
+            queries = [row[0] for row in conn.execute("SELECT query FROM crawl_schedule")]
+        except sqlite3.OperationalError:
+            print("No crawl schedule stored yet")
+            return
+    scheduler = CrawlScheduler(queries, db_path)
+    print(f"Quota stretch: {scheduler.quota_stretch():.2f}x")
+    for row in scheduler.describe():
+        print(f"{row['due_in']:>7}s  every {row['interval']:>6}s  {str(row['rate_per_hour']):>7}/h  "
+              f"{row['units_per_run']:>6} units  {row['query']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Snapshot-uri JSON precalculate pentru dashboard (reclame reale + metrici de sistem)
+Payload-ul fiecărui endpoint e calculat o singură dată după fiecare batch de scrieri
+(sau la fiecare N secunde) și publicat atomic (fișier temporar + os.replace) cu versiune
+și ETag; rutele API citesc un singur fișier, indiferent de numărul de vizitatori.
+
+Utilizare: python3 scripts/dashboard_snapshot.py run [cale_baza_de_date] [--interval N]
+           python3 scripts/dashboard_snapshot.py once [cale_baza_de_date]
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from persistence import PersistenceService, apply_pragmas
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = os.getenv('DASHBOARD_SNAPSHOT_DIR', '/data/ads/snapshots')
+REAL_ADS_SNAPSHOT = 'real_ads'
+SYSTEM_SNAPSHOT = 'system'
+
+CRAWLER_PID_FILE = '/tmp/real_crawler.pid'
+
+
+def snapshot_path(out_dir: str, name: str) -> str:
+    return os.path.join(out_dir, f"{name}.json")
+
+
+class SnapshotWriter:
+    """Publică payload-uri ca <nume>.json cu metadatele snapshot: {version, etag, generated_at}"""
+
+    def __init__(self, out_dir: str = DEFAULT_SNAPSHOT_DIR):
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self._versions: Dict[str, int] = {}
+        self._etags: Dict[str, str] = {}
+
+    def _load_previous(self, name: str):
+        """Versiunea continuă după repornire (cititorii compară ETag-uri, nu timpi)"""
+        try:
+            with open(snapshot_path(self.out_dir, name)) as f:
+                meta = json.load(f).get('snapshot', {})
+            self._versions[name] = int(meta.get('version', 0))
+            # Pe disc ETag-ul e '"<versiune>-<hash>"'; publish() compară doar hash-ul conținutului
+            self._etags[name] = meta.get('etag', '').strip('"').partition('-')[2]
+        except (OSError, ValueError):
+            self._versions[name] = 0
+            self._etags[name] = ''
+
+    def publish(self, name: str, payload: Dict[str, Any]) -> bool:
+        """
+        Scrie snapshot-ul dacă s-a schimbat conținutul; altfel doar reîmprospătează mtime,
+        ca rutele să știe că publisher-ul e activ. Returnează True dacă s-a scris o versiune nouă.
+        """
+        if name not in self._versions:
+            self._load_previous(name)
+
+        # ETag-ul depinde doar de conținut (timestamp-urile de generare sunt excluse)
+        content = json.dumps({key: value for key, value in payload.items() if key != 'timestamp'},
+                             sort_keys=True, default=str, separators=(',', ':'))
+        etag = hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+        path = snapshot_path(self.out_dir, name)
+        if etag == self._etags[name] and os.path.exists(path):
+            os.utime(path)
+            return False
+
+        version = self._versions[name] + 1
+        document = dict(payload)
+        document['snapshot'] = {
+            'version': version,
+            'etag': f'"{version}-{etag}"',
+            'generated_at': datetime.now().isoformat(),
+        }
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(document, f, default=str, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        self._versions[name] = version
+        self._etags[name] = etag
+        return True
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def _rows(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def build_real_ads_payload(conn: sqlite3.Connection, db_path: str) -> Dict[str, Any]:
+    """Același conținut ca app/api/ads/real/route.ts, calculat o dată pentru toți cititorii"""
+    has_aggregates = _table_exists(conn, 'agg_real_ads_total')
+    has_epoch = conn.execute(
+        "SELECT 1 FROM pragma_table_info('real_ads') WHERE name = 'created_epoch'"
+    ).fetchone() is not None
+    since_epoch = "CAST(strftime('%s', 'now', '-1 day') AS INTEGER)"
+
+    if has_aggregates:
+        stats = _rows(conn.execute("""
+            SELECT
+                COALESCE(t.n, 0) as total_ads,
+                (SELECT COUNT(*) FROM agg_real_ads_channel WHERE n > 0) as unique_channels,
+                CASE WHEN t.n > 0 THEN t.sum_confidence / t.n ELSE 0 END as avg_confidence,
+                (SELECT COALESCE(SUM(n), 0) FROM agg_real_ads_hour
+                 WHERE group_key > strftime('%Y-%m-%d %H:00:00', 'now', '-1 day')) as ads_last_24h
+            FROM (SELECT 1) LEFT JOIN agg_real_ads_total t ON t.group_key = 'all'
+        """))[0]
+        ad_types = _rows(conn.execute("""
+            SELECT group_key as ad_type, n as count,
+                   sum_confidence / n as avg_confidence, sum_views * 1.0 / n as avg_views
+            FROM agg_real_ads_ad_type WHERE n > 0 ORDER BY count DESC
+        """))
+        hourly_stats = _rows(conn.execute("""
+            SELECT strftime('%H:00', group_key) as hour, n as ads_count
+            FROM agg_real_ads_hour
+            WHERE group_key > strftime('%Y-%m-%d %H:00:00', 'now', '-1 day') AND n > 0
+            ORDER BY hour
+        """))
+        top_channels = _rows(conn.execute("""
+            SELECT group_key as channel, n as ads_count,
+                   sum_views * 1.0 / n as avg_views, sum_confidence / n as avg_confidence
+            FROM agg_real_ads_channel WHERE n > 0 ORDER BY ads_count DESC LIMIT 10
+        """))
+    else:
+        last_24h = (f"(SELECT COUNT(*) FROM real_ads WHERE created_epoch > {since_epoch})" if has_epoch else
+                    "COUNT(CASE WHEN datetime(created_at) > datetime('now', '-1 day') THEN 1 END)")
+        stats = _rows(conn.execute(f"""
+            SELECT COUNT(*) as total_ads, COUNT(DISTINCT channel_title) as unique_channels,
+                   AVG(ad_confidence) as avg_confidence, {last_24h} as ads_last_24h
+            FROM real_ads
+        """))[0]
+        ad_types = _rows(conn.execute("""
+            SELECT ad_type, COUNT(*) as count, AVG(ad_confidence) as avg_confidence, AVG(view_count) as avg_views
+            FROM real_ads WHERE ad_type IS NOT NULL AND ad_type != ''
+            GROUP BY ad_type ORDER BY count DESC
+        """))
+        if has_epoch:
+            hourly_sql = f"""
+                SELECT strftime('%H:00', created_epoch, 'unixepoch') as hour, COUNT(*) as ads_count
+                FROM real_ads WHERE created_epoch > {since_epoch}
+                GROUP BY hour ORDER BY hour
+            """
+        else:
+            hourly_sql = """
+                SELECT strftime('%H:00', created_at) as hour, COUNT(*) as ads_count
+                FROM real_ads WHERE datetime(created_at) > datetime('now', '-1 day')
+                GROUP BY strftime('%H', created_at) ORDER BY hour
+            """
+        hourly_stats = _rows(conn.execute(hourly_sql))
+        top_channels = _rows(conn.execute("""
+            SELECT channel_title as channel, COUNT(*) as ads_count,
+                   AVG(view_count) as avg_views, AVG(ad_confidence) as avg_confidence
+            FROM real_ads GROUP BY channel_title ORDER BY ads_count DESC LIMIT 10
+        """))
+
+    recent_ads = _rows(conn.execute(f"""
+        SELECT id, video_id, title, channel_title as channel, view_count as views,
+               like_count as likes, comment_count, duration_seconds as duration,
+               ad_confidence as confidence_score, ad_type, created_at, thumbnail_url
+        FROM real_ads
+        ORDER BY {'created_epoch' if has_epoch else 'created_at'} DESC
+        LIMIT 20
+    """))
+
+    crawler_stats = None
+    if _table_exists(conn, 'crawler_stats'):
+        latest = _rows(conn.execute("SELECT * FROM crawler_stats ORDER BY id DESC LIMIT 1"))
+        crawler_stats = latest[0] if latest else None
+
+    return {
+        'stats': {
+            'total_ads': stats.get('total_ads') or 0,
+            'unique_channels': stats.get('unique_channels') or 0,
+            'avg_confidence': stats.get('avg_confidence') or 0,
+            'ads_last_24h': stats.get('ads_last_24h') or 0,
+        },
+        'recent_ads': recent_ads,
+        'ad_types': ad_types,
+        'hourly_stats': hourly_stats,
+        'top_channels': top_channels,
+        'crawler_status': {
+            'running': os.path.exists(CRAWLER_PID_FILE),
+            'stats': crawler_stats,
+        },
+        'source': 'real_database',
+        'timestamp': datetime.now().isoformat(),
+        'database_path': db_path,
+    }
+
+
+def build_system_payload(metrics: Dict[str, Any], metrics_store=None) -> Dict[str, Any]:
+    """
+    Același conținut ca app/api/system/real/route.ts, din metricile colectate de real_time_monitor.py
+    (fără top/free/df/nvidia-smi per request); istoricul GPU vine din arhivele round-robin
+    """
+    gpus = [{
+        'index': gpu['index'],
+        'name': gpu['name'],
+        'memory_used': f"{gpu['memory_used']} MB",
+        'memory_total': f"{round(gpu['memory_total'] / 1024)} GB",
+        'utilization': gpu['utilization'],
+        'temperature': gpu['temperature'],
+    } for gpu in metrics.get('gpus', [])]
+
+    processes = [{
+        'name': proc['name'],
+        'pid': proc['pid'],
+        'cpu': proc['cpu'],
+        'memory': proc['memory'],
+        'runtime': 'Unknown',
+        'status': 'running',
+    } for proc in metrics.get('processes', [])[:5]]
+
+    gpu_usage = []
+    if metrics_store is not None and gpus:
+        _, points = metrics_store.query('gpu0.utilization', time.time() - 6 * 3600, max_points=6)
+        for bucket, _samples, _low, avg, _high, _p95 in points:
+            gpu_usage.append({
+                'time': time.strftime('%H:%M', time.localtime(bucket)),
+                'usage': max(0.0, min(100.0, avg)),
+            })
+
+    return {
+        'cpu_usage': metrics.get('cpu_usage', 0),
+        'memory_usage': metrics.get('memory_usage', 0),
+        'storage_usage': metrics.get('storage_usage', 0),
+        'active_processes': metrics.get('active_processes', 0),
+        'gpus': gpus,
+        'processes': processes,
+        'gpu_usage': gpu_usage,
+        'timestamp': metrics.get('timestamp'),
+    }
+
+
+class SnapshotPublisher:
+    """
+    Thread care republică snapshot-ul reclamelor reale: imediat după commit-urile writer-ului
+    (cu debounce de MIN_INTERVAL secunde) și cel puțin o dată la `interval` secunde
+    """
+
+    MIN_INTERVAL = 1.0
+
+    def __init__(self, db_path: str, out_dir: str = DEFAULT_SNAPSHOT_DIR, interval: float = 10.0):
+        self.db_path = db_path
+        self.interval = interval
+        self.writer = SnapshotWriter(out_dir)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def attach(self, persistence: PersistenceService):
+        """Republică după fiecare batch commit-at de writer-ul comun"""
+        persistence.add_commit_listener(lambda _units: self._wake.set())
+
+    def notify(self):
+        self._wake.set()
+
+    def publish_once(self) -> bool:
+        if not os.path.exists(self.db_path):
+            return False
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            apply_pragmas(self._conn)
+        if not _table_exists(self._conn, 'real_ads'):
+            return False
+        payload = build_real_ads_payload(self._conn, self.db_path)
+        return self.writer.publish(REAL_ADS_SNAPSHOT, payload)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='dashboard-snapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _loop(self):
+        last = 0.0
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            # Batch-urile dese (la fiecare 0.5 s) sunt comasate într-o singură publicare
+            delay = last + self.MIN_INTERVAL - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            try:
+                self.publish_once()
+            except Exception as e:
+                logger.error(f"Snapshot publish failed: {e}")
+            last = time.monotonic()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Publică snapshot-urile JSON ale dashboard-ului')
+    parser.add_argument('command', choices=['run', 'once'])
+    parser.add_argument('database', nargs='?', default='/data/ads/real_ads.db')
+    parser.add_argument('--out-dir', default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument('--interval', type=float, default=10.0)
+    args = parser.parse_args()
+
+    publisher = SnapshotPublisher(args.database, args.out_dir, args.interval)
+    if args.command == 'once':
+        changed = publisher.publish_once()
+        print(f"{snapshot_path(args.out_dir, REAL_ADS_SNAPSHOT)}: {'published' if changed else 'unchanged'}")
+        return
+
+    publisher.start()
+    publisher.notify()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        publisher.stop()
+
+
+if __name__ == "__main__":
+    main()
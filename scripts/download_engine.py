@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Motor de descărcare yt-dlp în proces, fără un subproces nou per video
+Fiecare thread worker păstrează propria instanță YoutubeDL pe toată durata rulării:
+sesiunile HTTP (keep-alive, TLS), extractoarele și cache-ul player-ului YouTube sunt
+refolosite, deci costul per video rămâne transferul propriu-zis. Suportă timeout,
+anulare (verificată în hook-ul de progres) și raportarea progresului. Transferurile trec
+prin download_scheduler.py: plafon de bandă, limite per host, cel mai scurt transfer primul.
+
+Utilizare: python3 scripts/download_engine.py <video_id> [video_id ...] [--out DIR]
+"""
+
+import os
+import time
+import glob
+import asyncio
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from download_scheduler import ByteBucket, TransferCancelled, TransferGate, expected_bytes, media_host
+from lazy_imports import lazy_import, module_available
+
+# Importat la crearea primei sesiuni; fără biblioteca yt-dlp crawler-ul revine la subprocesul `yt-dlp`
+yt_dlp = lazy_import('yt_dlp') if module_available('yt_dlp') else None
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 5.0  # secunde între două rapoarte de progres pentru același video
+SOCKET_TIMEOUT = 30
+
+
+@dataclass
+class _Download:
+    video_id: str
+    out_dir: str
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    on_start: Optional[Callable[[], None]] = None
+    cancelled: threading.Event = field(default_factory=threading.Event)
+    last_report: float = 0.0
+    downloaded_bytes: int = 0
+    file_bytes: int = 0
+
+
+class DownloadEngine:
+    def __init__(self, workers: int = 4, retries: int = 3, audio_format: str = 'mp3',
+                 socket_timeout: int = SOCKET_TIMEOUT, progress_interval: float = PROGRESS_INTERVAL,
+                 max_transfers: Optional[int] = None, per_host: Optional[int] = None,
+                 bandwidth: Optional[float] = None):
+        """bandwidth în octeți/s pentru toate transferurile (None = nelimitat)"""
+        if yt_dlp is None:
+            raise RuntimeError("yt_dlp is not installed")
+        self.retries = retries
+        self.audio_format = audio_format
+        self.socket_timeout = socket_timeout
+        self.progress_interval = progress_interval
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ytdlp')
+        # Extragerea metadatelor rulează liber; doar transferurile trec prin poartă și bucket
+        self.gate = TransferGate(max_transfers, per_host)
+        self.bucket = ByteBucket(bandwidth)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {'sessions': 0, 'completed': 0, 'failed': 0, 'cancelled': 0, 'bytes': 0}
+
+    @staticmethod
+    def available() -> bool:
+        return yt_dlp is not None
+
+    # --- Thread worker ---
+
+    def _ydl(self):
+        """Instanța YoutubeDL a thread-ului curent (creată o singură dată)"""
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL({
+                'format': 'bestaudio/best',
+                'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': self.audio_format}],
+                'updatetime': False,
+                'retries': self.retries,
+                'fragment_retries': self.retries,
+                'socket_timeout': self.socket_timeout,
+                'quiet': True,
+                'no_warnings': True,
+                'noprogress': True,
+                'progress_hooks': [self._progress_hook],
+            })
+            self._local.ydl = ydl
+            with self._lock:
+                self.stats['sessions'] += 1
+        return ydl
+
+    def _progress_hook(self, status: Dict[str, Any]):
+        download = self._local.current
+        if download.cancelled.is_set():
+            # Singurul punct în care yt-dlp poate fi oprit din afară fără a omorî thread-ul
+            raise yt_dlp.utils.DownloadCancelled(f"Download of {download.video_id} cancelled")
+        current = status.get('downloaded_bytes') or 0
+        # Contorul yt-dlp e cumulativ per fișier și repornește de la 0 la fișierul următor
+        delta = current - download.file_bytes if current >= download.file_bytes else current
+        download.file_bytes = current
+        if delta > 0:
+            download.downloaded_bytes += delta
+            self.gate.add_bytes(delta)
+            self.bucket.consume(delta, download.cancelled)
+        now = time.monotonic()
+        if download.on_progress and (status.get('status') == 'finished'
+                                     or now - download.last_report >= self.progress_interval):
+            download.last_report = now
+            download.on_progress({
+                'video_id': download.video_id,
+                'status': status.get('status'),
+                'downloaded_bytes': status.get('downloaded_bytes'),
+                'total_bytes': status.get('total_bytes') or status.get('total_bytes_estimate'),
+                'speed': status.get('speed'),
+                'eta': status.get('eta'),
+            })
+
+    def _run(self, download: _Download) -> str:
+        if download.cancelled.is_set():
+            raise yt_dlp.utils.DownloadCancelled(f"Download of {download.video_id} cancelled")
+        ydl = self._ydl()
+        self._local.current = download
+        ydl.params['outtmpl'] = {'default': os.path.join(download.out_dir, '%(id)s.%(ext)s')}
+        try:
+            # Metadatele întâi: dimensiunea și host-ul formatului selectat decid ordinea transferurilor
+            info = ydl.extract_info(f"https://www.youtube.com/watch?v={download.video_id}", download=False)
+            try:
+                with self.gate.transfer(expected_bytes(info), media_host(info), download.cancelled):
+                    if download.on_start:
+                        download.on_start()
+                    info = ydl.process_ie_result(info, download=True)
+            except TransferCancelled:
+                raise yt_dlp.utils.DownloadCancelled(f"Download of {download.video_id} cancelled")
+            downloads = (info or {}).get('requested_downloads') or [{}]
+            path = downloads[0].get('filepath')
+            if not path or not os.path.exists(path):
+                path = os.path.join(download.out_dir, f"{download.video_id}.{self.audio_format}")
+            if not os.path.exists(path):
+                raise RuntimeError(f"No audio file produced for {download.video_id}")
+            with self._lock:
+                self.stats['completed'] += 1
+                self.stats['bytes'] += download.downloaded_bytes
+            return path
+        except BaseException:
+            # Fragmentele .part / fișierele intermediare nu sunt curățate de yt-dlp la anulare
+            for leftover in glob.glob(os.path.join(glob.escape(download.out_dir), f"{glob.escape(download.video_id)}.*")):
+                try:
+                    os.remove(leftover)
+                except OSError:
+                    pass
+            raise
+        finally:
+            self._local.current = None
+
+    # --- API asyncio ---
+
+    async def download_audio(self, video_id: str, out_dir: str, timeout: Optional[float] = None,
+                             on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+        """
+        Descarcă audio-ul unui video în out_dir și întoarce calea fișierului.
+        Timeout (de la începutul transferului) -> asyncio.TimeoutError, eroare yt-dlp -> RuntimeError;
+        la timeout sau anularea task-ului descărcarea e oprită la următorul hook de progres.
+        """
+        loop = asyncio.get_running_loop()
+        if on_progress is not None:
+            callback = on_progress
+            on_progress = lambda progress: loop.call_soon_threadsafe(callback, progress)
+        # Timeout-ul curge de la admiterea transferului, nu din coada executorului sau a porții
+        started = loop.create_future()
+        on_start = lambda: loop.call_soon_threadsafe(lambda: started.done() or started.set_result(True))
+        download = _Download(video_id, out_dir, on_progress, on_start)
+        future = loop.run_in_executor(self._executor, self._run, download)
+        try:
+            await asyncio.wait([started, future], return_when=asyncio.FIRST_COMPLETED)
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            download.cancelled.set()
+            with self._lock:
+                self.stats['cancelled'] += 1
+            raise asyncio.TimeoutError(f"Download timeout for {video_id}")
+        except asyncio.CancelledError:
+            download.cancelled.set()
+            with self._lock:
+                self.stats['cancelled'] += 1
+            raise
+        except yt_dlp.utils.DownloadError as e:
+            with self._lock:
+                self.stats['failed'] += 1
+            raise RuntimeError(f"yt-dlp failed for {video_id}: {e}") from None
+
+    def transfer_stats(self) -> Dict[str, Any]:
+        """Contoarele motorului plus debitul realizat și ocuparea porții de transfer"""
+        return {**self.stats, **self.gate.stats()}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Descărcare audio cu motorul yt-dlp în proces')
+    parser.add_argument('video_ids', nargs='+')
+    parser.add_argument('--out', default='/tmp')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--transfers', type=int, default=None, help='transferuri simultane')
+    parser.add_argument('--bandwidth-mbps', type=float, default=0, help='plafon global (0 = nelimitat)')
+    args = parser.parse_args()
+
+    async def run():
+        engine = DownloadEngine(workers=args.workers, max_transfers=args.transfers,
+                                bandwidth=args.bandwidth_mbps * 1e6 / 8 or None)
+        report = lambda p: logger.info(f"{p['video_id']}: {p['status']} {p['downloaded_bytes']}/{p['total_bytes']}")
+        for video_id in args.video_ids:
+            start = time.perf_counter()
+            try:
+                path = await engine.download_audio(video_id, args.out, args.timeout, on_progress=report)
+                print(f"{video_id}: {path} ({time.perf_counter() - start:.2f}s)")
+            except Exception as e:
+                print(f"{video_id}: failed - {e}")
+        print(engine.transfer_stats())
+        engine.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
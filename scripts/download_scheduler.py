@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Planificarea transferurilor pentru motorul de descărcare (download_engine.py)
+- plafon global de lățime de bandă: token bucket pe octeți, consumat din hook-ul de progres;
+- limită de transferuri simultane, globală și per host (serverul media, ex. *.googlevideo.com);
+- ordinea de admitere: cel mai scurt transfer așteptat primul (dimensiunea formatului sau
+  durata x bitrate din metadate), cu aging ca transferurile mari să nu aștepte la nesfârșit;
+- debitul realizat: octeți / timpul în care a existat cel puțin un transfer activ.
+Toate primitivele sunt blocante și se folosesc din thread-urile worker ale motorului.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+DEFAULT_AUDIO_KBPS = 128
+SEJF_AGING_SECONDS = 30.0  # după 30 s de așteptare dimensiunea efectivă a unui transfer se înjumătățește
+WAIT_POLL_SECONDS = 0.5
+
+
+def expected_bytes(info: Dict[str, Any]) -> int:
+    """Dimensiunea estimată a formatelor selectate de yt-dlp (fără descărcare)"""
+    formats = info.get('requested_formats') or [info]
+    total = 0
+    for fmt in formats:
+        size = fmt.get('filesize') or fmt.get('filesize_approx')
+        if not size:
+            kbps = fmt.get('abr') or fmt.get('tbr') or DEFAULT_AUDIO_KBPS
+            size = (info.get('duration') or 0) * kbps * 1000 / 8
+        total += int(size)
+    return total
+
+
+def media_host(info: Dict[str, Any]) -> str:
+    formats = info.get('requested_formats') or [info]
+    return urlparse(formats[0].get('url') or '').hostname or 'unknown'
+
+
+class ByteBucket:
+    """Token bucket pe octeți, partajat de toate thread-urile; rate None = nelimitat"""
+
+    def __init__(self, rate: Optional[float], burst_seconds: float = 1.0):
+        self.rate = rate
+        self.capacity = rate * burst_seconds if rate else 0.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int, cancelled: Optional[threading.Event] = None) -> float:
+        """Consumă `amount` octeți, dormind cât e nevoie; întoarce timpul dormit"""
+        if not self.rate or amount <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount  # datoria se plătește prin așteptare, ordinea rămâne FIFO
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        slept = 0.0
+        while slept < delay and not (cancelled and cancelled.is_set()):
+            step = min(WAIT_POLL_SECONDS, delay - slept)
+            time.sleep(step)
+            slept += step
+        return slept
+
+
+class TransferCancelled(Exception):
+    pass
+
+
+class TransferGate:
+    """Admiterea transferurilor: sloturi globale și per host, cel mai scurt transfer așteptat primul"""
+
+    def __init__(self, max_transfers: Optional[int] = None, per_host: Optional[int] = None):
+        self.max_transfers = max_transfers
+        self.per_host = per_host
+        self._cond = threading.Condition()
+        self._waiting: List[Dict[str, Any]] = []
+        self._active: Dict[str, int] = {}
+        self._active_total = 0
+        # Debitul realizat
+        self._busy_since: Optional[float] = None
+        self.busy_seconds = 0.0
+        self.bytes = 0
+        self.transfers = 0
+
+    def _admissible(self, entry: Dict[str, Any]) -> bool:
+        if self.max_transfers and self._active_total >= self.max_transfers:
+            return False
+        return not (self.per_host and self._active.get(entry['host'], 0) >= self.per_host)
+
+    def _next(self, now: float) -> Optional[Dict[str, Any]]:
+        candidates = [e for e in self._waiting if self._admissible(e)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda e: e['size'] / (1 + (now - e['since']) / SEJF_AGING_SECONDS))
+
+    @contextmanager
+    def transfer(self, size: int, host: str, cancelled: Optional[threading.Event] = None):
+        """Blochează până când transferul e admis; la ieșire eliberează slotul"""
+        entry = {'size': size, 'host': host, 'since': time.monotonic()}
+        with self._cond:
+            self._waiting.append(entry)
+            try:
+                while self._next(time.monotonic()) is not entry:
+                    if cancelled and cancelled.is_set():
+                        raise TransferCancelled()
+                    self._cond.wait(WAIT_POLL_SECONDS)
+            finally:
+                self._waiting.remove(entry)
+            self._active[host] = self._active.get(host, 0) + 1
+            self._active_total += 1
+            if self._active_total == 1:
+                self._busy_since = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active[host] -= 1
+                if not self._active[host]:
+                    del self._active[host]
+                self._active_total -= 1
+                self.transfers += 1
+                if self._active_total == 0 and self._busy_since is not None:
+                    self.busy_seconds += time.monotonic() - self._busy_since
+                    self._busy_since = None
+                self._cond.notify_all()
+
+    def add_bytes(self, amount: int):
+        with self._cond:
+            self.bytes += amount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            busy = self.busy_seconds + (time.monotonic() - self._busy_since if self._busy_since else 0.0)
+            return {
+                'transfers': self.transfers,
+                'active': self._active_total,
+                'waiting': len(self._waiting),
+                'transferred_bytes': self.bytes,
+                'throughput_mbps': round(self.bytes * 8 / busy / 1e6, 2) if busy else 0.0,
+            }
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Coloane epoch (secunde UTC, INTEGER) lângă timestamp-urile TEXT în format mixt
+created_at / processed_at / timestamp / published_at sunt scrise în formate diferite
+('2025-01-15 10:00:00', '2025-01-15T10:00:00Z', isoformat() cu microsecunde), iar filtrele
+de tipul datetime(created_at) > ... nu pot folosi indexuri. created_epoch / published_epoch
+sunt completate de scriitorii Python și indexate pentru interogările dashboard-ului.
+
+Utilizare: python3 scripts/epoch_columns.py migrate [cale_baza_de_date] [tabela_sursă]
+"""
+
+import sys
+import time
+import sqlite3
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Coloana epoch -> coloanele TEXT din care se derivă (candidați în ordinea preferinței)
+SOURCES = {
+    'ads': {
+        'created_epoch': ['created_at', 'processed_at', 'timestamp'],
+        'published_epoch': ['published_at'],
+    },
+    'real_ads': {
+        'created_epoch': ['created_at'],
+        'published_epoch': ['published_at'],
+    },
+}
+
+# Indexuri acoperitoare pentru grupările dashboard-ului: (sufix, coloane candidate);
+# coloanele lipsă din schemă sunt omise, indexul e creat doar dacă prima coloană există
+COVERING_INDEXES = {
+    'ads': [
+        ('ad_type_cover', ['ad_type', 'confidence_score', 'views']),
+        ('channel_cover', ['channel', 'views', 'engagement_rate', 'confidence_score']),
+    ],
+    'real_ads': [
+        ('ad_type_cover', ['ad_type', 'ad_confidence', 'view_count']),
+        ('channel_cover', ['channel_title', 'view_count', 'ad_confidence']),
+    ],
+}
+
+BACKFILL_BATCH = 10000
+
+
+def now_epoch() -> int:
+    return int(time.time())
+
+
+def to_epoch(value) -> Optional[int]:
+    """
+    Timestamp TEXT (orice variantă ISO 8601 / SQLite) -> secunde UTC.
+    Valorile fără fus orar sunt considerate UTC, ca CURRENT_TIMESTAMP și datetime() din SQLite.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip()
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        logger.debug(f"Unparseable timestamp: {value!r}")
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def _resolve_sources(existing: set, source: str) -> Dict[str, Optional[str]]:
+    """Coloana epoch -> expresia TEXT din care se derivă (COALESCE dacă sunt mai mulți candidați)"""
+    resolved = {}
+    for column, candidates in SOURCES[source].items():
+        present = [c for c in candidates if c in existing]
+        if len(present) > 1:
+            resolved[column] = f"COALESCE({', '.join(present)})"
+        else:
+            resolved[column] = present[0] if present else None
+    return resolved
+
+
+def install_epoch_columns(conn: sqlite3.Connection, source: str):
+    """Adaugă coloanele epoch, indexurile și triggerul de rezervă; completează rândurile vechi"""
+    if source not in SOURCES or not _table_exists(conn, source):
+        return
+
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({source})")}
+    for column in SOURCES[source]:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {source} ADD COLUMN {column} INTEGER")
+            logger.info(f"Added column {source}.{column}")
+
+    # Fereastra de 24h, bucket-urile pe oră și cele mai noi reclame: range scan pe created_epoch
+    # (indexul conține valoarea, deci COUNT/GROUP BY nu mai citesc rândurile)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{source}_created_epoch ON {source}(created_epoch)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{source}_published_epoch ON {source}(published_epoch)")
+    for suffix, candidates in COVERING_INDEXES[source]:
+        columns = [c for c in candidates if c in existing]
+        if columns and columns[0] == candidates[0]:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{source}_{suffix} ON {source}({', '.join(columns)})")
+
+    _install_fallback_trigger(conn, source, _resolve_sources(existing, source))
+    backfill_epoch_columns(conn, source)
+
+
+def _install_fallback_trigger(conn: sqlite3.Connection, source: str, derived: Dict[str, Optional[str]]):
+    """
+    Scriitorii Python completează coloanele epoch; triggerul acoperă doar inserările din alte
+    surse (setup-ul dashboard-ului, scripturi vechi) și se declanșează numai când lipsesc valorile
+    """
+    trigger = f"trg_{source}_epoch_ins"
+    created = derived['created_epoch']
+    published = derived['published_epoch']
+    created_expr = "CAST(strftime('%s', 'now') AS INTEGER)"
+    if created:
+        created_expr = f"COALESCE(CAST(strftime('%s', {_prefix_new(created)}) AS INTEGER), {created_expr})"
+    published_expr = f"CAST(strftime('%s', {_prefix_new(published)}) AS INTEGER)" if published else "NULL"
+    conn.executescript(f"""
+        DROP TRIGGER IF EXISTS {trigger};
+        CREATE TRIGGER {trigger} AFTER INSERT ON {source}
+        WHEN NEW.created_epoch IS NULL OR (NEW.published_epoch IS NULL AND {published_expr} IS NOT NULL)
+        BEGIN
+            UPDATE {source} SET
+                created_epoch = COALESCE(NEW.created_epoch, {created_expr}),
+                published_epoch = COALESCE(NEW.published_epoch, {published_expr})
+            WHERE id = NEW.id;
+        END;
+    """)
+
+
+def _prefix_new(expr: str) -> str:
+    """'created_at' -> 'NEW.created_at'; 'COALESCE(a, b)' -> 'COALESCE(NEW.a, NEW.b)'"""
+    if expr.startswith('COALESCE('):
+        inner = expr[len('COALESCE('):-1]
+        return f"COALESCE({', '.join('NEW.' + c.strip() for c in inner.split(','))})"
+    return f"NEW.{expr}"
+
+
+def backfill_epoch_columns(conn: sqlite3.Connection, source: str) -> int:
+    """Completează coloanele epoch NULL din coloanele TEXT, în batch-uri (NULL-urile sunt la începutul indexului)"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({source})")}
+    derived = _resolve_sources(existing, source)
+    conn.create_function('to_epoch', 1, to_epoch, deterministic=True)
+
+    created = f"to_epoch({derived['created_epoch']})" if derived['created_epoch'] else 'NULL'
+    published = f"to_epoch({derived['published_epoch']})" if derived['published_epoch'] else 'NULL'
+    # Rândurile fără niciun timestamp primesc -1 la created_epoch, ca să nu fie reprocesate
+    updated = 0
+    while True:
+        ids = [row[0] for row in conn.execute(f"""
+            SELECT id FROM {source} WHERE created_epoch IS NULL LIMIT ?
+        """, (BACKFILL_BATCH,))]
+        if not ids:
+            break
+        placeholders = ', '.join('?' * len(ids))
+        conn.execute(f"""
+            UPDATE {source} SET
+                created_epoch = COALESCE({created}, -1),
+                published_epoch = COALESCE(published_epoch, {published})
+            WHERE id IN ({placeholders})
+        """, ids)
+        updated += len(ids)
+
+    if updated:
+        logger.info(f"Backfilled epoch columns for {updated} rows of {source}")
+    return updated
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print("Usage: epoch_columns.py migrate [database_path] [source_table]")
+        sys.exit(1)
+
+    db_path = sys.argv[2] if len(sys.argv) > 2 else '/data/ads/ads_database.db'
+    sources: List[str] = [sys.argv[3]] if len(sys.argv) > 3 else list(SOURCES)
+    with sqlite3.connect(db_path) as conn:
+        for source in sources:
+            install_epoch_columns(conn, source)
+        conn.execute("ANALYZE")
+
+
+if __name__ == "__main__":
+    main()
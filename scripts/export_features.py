@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Export columnar (Parquet / Arrow IPC) al reclamelor cu caracteristicile audio/vizuale
+Citește în bucăți keyset (processed_at, id) pe o conexiune read-only - fără blocaje pentru crawler,
+memorie limitată la o bucată - și scrie câte un row group per bucată.
+Exporturile sunt incrementale: doar rândurile procesate după watermark-ul ultimului export.
+Numele fișierului conține intervalul de id-uri exportat; un export existent nu e suprascris niciodată.
+
+Utilizare: python3 scripts/export_features.py [cale_baza_de_date] [--out DIR] [--format parquet|arrow]
+                                              [--chunk-rows N] [--full]
+"""
+
+import os
+import json
+import itertools
+import sqlite3
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from persistence import apply_pragmas
+from vector_codec import VECTOR_COLUMNS, decode_vector
+from partitions import CATALOG_FILE, PartitionCatalog, default_partition_dir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPORT_DIR = '/data/exports'
+WATERMARK_FILE = '_watermark.json'
+CHUNK_ROWS = 50000
+
+# Coloanele exportate: (nume, expresie SQL, tip Arrow). Cele care lipsesc din schemă sunt omise.
+COLUMNS: List[Tuple[str, str, pa.DataType]] = [
+    ('id', 'a.id', pa.int64()),
+    ('video_id', 'a.video_id', pa.string()),
+    ('url', 'a.url', pa.string()),
+    ('title', 'a.title', pa.string()),
+    ('channel', 'a.channel', pa.string()),
+    ('description', 'a.description', pa.string()),
+    ('ad_type', 'a.ad_type', pa.string()),
+    ('published_at', 'a.published_at', pa.timestamp('s', tz='UTC')),
+    ('processed_at', 'a.processed_at', pa.timestamp('s', tz='UTC')),
+    ('created_at', 'a.created_at', pa.timestamp('s', tz='UTC')),
+    ('views', 'a.views', pa.int64()),
+    ('likes', 'a.likes', pa.int64()),
+    ('comments_count', 'a.comments_count', pa.int64()),
+    ('engagement_rate', 'a.engagement_rate', pa.float64()),
+    ('duration', 'a.duration', pa.int32()),
+    ('dominant_colors', 'a.dominant_colors', pa.list_(pa.string())),
+    ('tempo', 'af.tempo', pa.float32()),
+    ('energy', 'af.energy', pa.float32()),
+    ('spectral_centroid', 'af.spectral_centroid', pa.float32()),
+    ('spectral_rolloff', 'af.spectral_rolloff', pa.float32()),
+    ('spectral_bandwidth', 'af.spectral_bandwidth', pa.float32()),
+    ('zero_crossing_rate', 'af.zero_crossing_rate', pa.float32()),
+    ('speech_ratio', 'af.speech_ratio', pa.float32()),
+    ('mfcc', 'af.mfcc_features', pa.list_(pa.float32(), VECTOR_COLUMNS['mfcc_features'])),
+    ('chroma', 'af.chroma_features', pa.list_(pa.float32(), VECTOR_COLUMNS['chroma_features'])),
+    ('text_density', 'vf.text_density', pa.float32()),
+    ('brightness', 'vf.brightness', pa.float32()),
+    ('color_palette', 'vf.color_palette', pa.list_(pa.string())),
+    ('has_faces', 'vf.has_faces', pa.bool_()),
+    ('has_text', 'vf.has_text', pa.bool_()),
+    ('phash', 'vf.phash', pa.int64()),
+    ('dhash', 'vf.dhash', pa.int64()),
+    ('category', 'ac.category', pa.string()),
+    ('target_audience', 'ac.target_audience', pa.string()),
+    ('emotional_tone', 'ac.emotional_tone', pa.string()),
+]
+
+TABLE_ALIASES = {'a': 'ads', 'af': 'audio_features', 'vf': 'visual_features', 'ac': 'ad_classifications'}
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _parse_list(value) -> Optional[List[str]]:
+    if not value:
+        return None
+    try:
+        items = json.loads(value)
+    except (ValueError, TypeError):
+        return None
+    return [str(item) for item in items] if isinstance(items, list) else None
+
+
+def _vector_array(values: List[Any], dim: int) -> pa.Array:
+    """BLOB-uri (sau JSON vechi) -> FixedSizeList<float32>[dim]; vectorii lipsă/invalizi devin null"""
+    flat = np.zeros((len(values), dim), dtype=np.float32)
+    mask = np.ones(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            vector = decode_vector(value)
+        except (ValueError, TypeError):
+            continue
+        if vector is not None and vector.size == dim:
+            flat[i] = vector
+            mask[i] = False
+    return pa.FixedSizeListArray.from_arrays(pa.array(flat.ravel()), dim, mask=pa.array(mask))
+
+
+def _to_array(values: List[Any], arrow_type: pa.DataType) -> pa.Array:
+    if pa.types.is_fixed_size_list(arrow_type):
+        return _vector_array(values, arrow_type.list_size)
+    if pa.types.is_list(arrow_type):
+        return pa.array([_parse_list(v) for v in values], type=arrow_type)
+    if pa.types.is_timestamp(arrow_type):
+        return pa.array([_parse_timestamp(v) for v in values], type=arrow_type)
+    if pa.types.is_boolean(arrow_type):
+        return pa.array([None if v is None else bool(v) for v in values], type=arrow_type)
+    return pa.array(values, type=arrow_type, from_pandas=False)
+
+
+class FeatureExporter:
+    def __init__(self, db_path: str, out_dir: str = DEFAULT_EXPORT_DIR, fmt: str = 'parquet',
+                 chunk_rows: int = CHUNK_ROWS, include_partitions: bool = True):
+        if fmt not in ('parquet', 'arrow'):
+            raise ValueError(f"Unknown export format: {fmt}")
+        self.db_path = db_path
+        self.out_dir = out_dir
+        self.format = fmt
+        self.chunk_rows = chunk_rows
+        self.include_partitions = include_partitions
+        self.watermark_path = os.path.join(out_dir, WATERMARK_FILE)
+        os.makedirs(out_dir, exist_ok=True)
+
+    # --- Watermark ---
+
+    def load_watermark(self) -> Tuple[str, int]:
+        try:
+            with open(self.watermark_path) as f:
+                state = json.load(f)
+            return state['processed_at'], state['id']
+        except (FileNotFoundError, KeyError, ValueError):
+            return '', 0
+
+    def save_watermark(self, processed_at: str, last_id: int, exported_file: str, rows: int):
+        state = {
+            'processed_at': processed_at,
+            'id': last_id,
+            'file': exported_file,
+            'rows': rows,
+            'exported_at': datetime.now().isoformat()
+        }
+        tmp_path = self.watermark_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.watermark_path)
+
+    # --- Citire ---
+
+    def _sources(self) -> List[str]:
+        """Partițiile arhivate (cele mai vechi întâi), apoi fișierul hot"""
+        paths = []
+        catalog_path = os.path.join(default_partition_dir(self.db_path), CATALOG_FILE)
+        if self.include_partitions and os.path.exists(catalog_path):
+            catalog = PartitionCatalog(self.db_path)
+            paths = [p['path'] for p in catalog.partitions('ads')]
+        return paths + [self.db_path]
+
+    @staticmethod
+    def _select(conn: sqlite3.Connection) -> Tuple[str, List[str]]:
+        existing = {}
+        for alias, table in TABLE_ALIASES.items():
+            existing[alias] = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+        selected = [(name, expr) for name, expr, _ in COLUMNS
+                    if expr.split('.', 1)[1] in existing[expr.split('.', 1)[0]]]
+        joins = "".join(
+            f" LEFT JOIN {TABLE_ALIASES[alias]} {alias} ON {alias}.ad_id = a.id"
+            for alias in ('af', 'vf', 'ac') if existing[alias]
+        )
+        select_list = ', '.join(expr for _, expr in selected)
+        # Unele scheme de crawler nu au processed_at; created_at are același rol
+        wm = 'a.processed_at' if 'processed_at' in existing['a'] else 'a.created_at'
+        sql = f"""
+            SELECT {wm} AS _wm, {select_list}
+            FROM ads a{joins}
+            WHERE {wm} IS NOT NULL
+              AND ({wm} > ? OR ({wm} = ? AND a.id > ?))
+            ORDER BY {wm}, a.id
+            LIMIT ?
+        """
+        return sql, [name for name, _ in selected]
+
+    def iter_chunks(self, since: Tuple[str, int]) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """Bucăți de cel mult chunk_rows rânduri, în ordinea (processed_at, id), din toate sursele"""
+        for path in self._sources():
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            apply_pragmas(conn)
+            try:
+                sql, columns = self._select(conn)
+                processed_at, last_id = since
+                while True:
+                    # Fiecare bucată e o tranzacție de citire scurtă - nu ține snapshot-ul WAL deschis
+                    rows = conn.execute(sql, (processed_at, processed_at, last_id, self.chunk_rows)).fetchall()
+                    if not rows:
+                        break
+                    yield columns, rows
+                    processed_at, last_id = rows[-1][0], rows[-1][1]
+                    if len(rows) < self.chunk_rows:
+                        break
+            finally:
+                conn.close()
+
+    # --- Scriere ---
+
+    def export(self, full: bool = False) -> Tuple[Optional[str], int]:
+        """Exportă rândurile noi într-un fișier; returnează (cale, număr de rânduri)"""
+        since = ('', 0) if full else self.load_watermark()
+        suffix = 'parquet' if self.format == 'parquet' else 'arrow'
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # Fișier temporar per proces: două exporturi simultane nu scriu în același fișier
+        tmp_path = os.path.join(self.out_dir, f".ads_features_{stamp}_{os.getpid()}.{suffix}.tmp")
+
+        # Schema fixă pentru toate exporturile; coloanele lipsă dintr-o sursă rămân null
+        schema = pa.schema([pa.field(name, arrow_type) for name, _, arrow_type in COLUMNS])
+        writer = None
+        total = 0
+        first_id = None
+        last = since
+        try:
+            for columns, rows in self.iter_chunks(since):
+                if writer is None:
+                    writer = self._open_writer(tmp_path, schema)
+
+                position = {name: i + 1 for i, name in enumerate(columns)}  # 0 = _wm
+                arrays = []
+                for field in schema:
+                    i = position.get(field.name)
+                    if i is None:
+                        arrays.append(pa.nulls(len(rows), type=field.type))
+                    else:
+                        arrays.append(_to_array([row[i] for row in rows], field.type))
+                writer.write_batch(pa.record_batch(arrays, schema=schema))
+                total += len(rows)
+                if first_id is None:
+                    first_id = rows[0][1]
+                last = (rows[-1][0], rows[-1][1])
+                logger.info(f"Exported {total} rows (up to {last[0]})")
+        except BaseException:
+            if writer is not None:
+                writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if writer is None:
+            logger.info("No new rows to export")
+            return None, 0
+
+        writer.close()
+        kind = 'full_' if full else ''
+        final_path = self._publish(tmp_path, f"ads_features_{stamp}_{kind}{first_id}-{last[1]}", suffix)
+        self.save_watermark(last[0], last[1], os.path.basename(final_path), total)
+        logger.info(f"Export written to {final_path} ({total} rows)")
+        return final_path, total
+
+    def _publish(self, tmp_path: str, name: str, suffix: str) -> str:
+        """
+        Publică fișierul temporar sub un nume liber. os.link eșuează dacă destinația există
+        (spre deosebire de os.replace), deci un export nu înlocuiește niciodată unul anterior
+        ale cărui rânduri sunt deja în spatele watermark-ului.
+        """
+        for attempt in itertools.count():
+            final_path = os.path.join(self.out_dir, f"{name}.{suffix}" if attempt == 0 else f"{name}_{attempt}.{suffix}")
+            try:
+                os.link(tmp_path, final_path)
+            except FileExistsError:
+                continue
+            os.remove(tmp_path)
+            return final_path
+
+    def _open_writer(self, path: str, schema: pa.Schema):
+        if self.format == 'parquet':
+            return pq.ParquetWriter(path, schema, compression='zstd')
+        return pa.ipc.new_file(path, schema)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Export Parquet/Arrow pentru reclame și caracteristici')
+    parser.add_argument('database', nargs='?', default='/data/ads/ads_database.db')
+    parser.add_argument('--out', default=DEFAULT_EXPORT_DIR)
+    parser.add_argument('--format', choices=['parquet', 'arrow'], default='parquet')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='rânduri per row group')
+    parser.add_argument('--full', action='store_true', help='ignoră watermark-ul și exportă tot')
+    parser.add_argument('--no-partitions', action='store_true', help='doar fișierul hot, fără lunile arhivate')
+    args = parser.parse_args()
+
+    exporter = FeatureExporter(args.database, args.out, args.format, args.chunk_rows,
+                               include_partitions=not args.no_partitions)
+    path, rows = exporter.export(full=args.full)
+    print(f"{rows} rows exported" + (f" to {path}" if path else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Cache persistent de caracteristici audio/vizuale, adresat după conținut
+Cheia = hash(octeți decodați + versiunea caracteristicilor), evacuare LRU după dimensiune totală
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureCache:
+    def __init__(self, db_path: str, max_bytes: int = 512 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._init_schema()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM feature_cache"
+        ).fetchone()[0]
+
+    def _init_schema(self):
+        """Creează tabela cache-ului"""
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS feature_cache (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_feature_cache_access ON feature_cache(last_access)"
+            )
+
+    @staticmethod
+    def make_key(data: bytes, version: str) -> str:
+        """Calculează cheia din octeții decodați și versiunea caracteristicilor"""
+        return FeatureCache.make_key_from_chunks([data], version)
+
+    @staticmethod
+    def make_key_from_chunks(chunks: Iterable[bytes], version: str) -> str:
+        """Calculează cheia incremental, pentru conținut citit în blocuri"""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(version.encode('utf-8'))
+        digest.update(b'\0')
+        for chunk in chunks:
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key_from_file(path: str, version: str, chunk_size: int = 1 << 20) -> str:
+        """Cheia din octeții fișierului (fără decodare), citiți în blocuri"""
+        def chunks():
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+        return FeatureCache.make_key_from_chunks(chunks(), version)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returnează caracteristicile din cache sau None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM feature_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE feature_cache SET last_access = ? WHERE key = ?",
+                    (time.time(), key)
+                )
+            return json.loads(row[0])
+
+    def put(self, key: str, kind: str, features: Dict[str, Any]):
+        """Salvează caracteristicile și evacuează intrările vechi peste limită"""
+        payload = json.dumps(features)
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM feature_cache WHERE key = ?", (key,)
+            ).fetchone()
+            with self._conn:
+                self._conn.execute("""
+                    INSERT OR REPLACE INTO feature_cache (key, kind, payload, size, last_access)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (key, kind, payload, size, time.time()))
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+
+    def _evict(self):
+        """Elimină intrările cel mai puțin folosite până sub limita de dimensiune"""
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        cursor = self._conn.execute(
+            "SELECT key, size FROM feature_cache ORDER BY last_access ASC"
+        )
+        victims = []
+        excess = self._total_bytes - self.max_bytes
+        for key, size in cursor:
+            if excess <= 0:
+                break
+            victims.append((key,))
+            excess -= size
+            self._total_bytes -= size
+
+        with self._conn:
+            self._conn.executemany("DELETE FROM feature_cache WHERE key = ?", victims)
+        self.evictions += len(victims)
+        logger.debug(f"Feature cache evicted {len(victims)} entries")
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistici de utilizare a cache-ului"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups > 0 else 0.0,
+            'evictions': self.evictions,
+            'total_bytes': self._total_bytes,
+            'max_bytes': self.max_bytes
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -5,21 +5,39 @@ import logging
 import json
 import librosa
 import numpy as np
-import torch
-import torchaudio
-from scipy.signal import correlate
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 import time
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from contextlib import contextmanager
 import psutil
 from datetime import datetime
-import cv2
-from PIL import Image
-import requests
+from lazy_imports import lazy_import, preload
+from jit_warmup import configure_jit_cache, warm_kernels
+from feature_cache import FeatureCache
+from streaming_audio import SAMPLE_RATE as STREAM_SAMPLE_RATE, analyze_audio_streaming
+from thumbnail_fetcher import ThumbnailFetcher
+from color_palette import extract_palette, to_hex
+from perceptual_hash import ThumbnailHashIndex, phash, dhash, to_signed
+from persistence import get_persistence
+from vector_codec import encode_vector
+from aggregates import install_aggregates
+from text_search import install_text_search
+from epoch_columns import install_epoch_columns, now_epoch, to_epoch
+from partitions import PartitionCatalog
+from job_queue import INGEST_QUEUE, JobQueue
+from adaptive_concurrency import ConcurrencyController
+from priority_scheduler import CycleBudget, PriorityScheduler, load_channel_history
+from download_engine import DownloadEngine
+from scratch import ScratchSpace, choose_root
+
+# Bibliotecile grele se încarcă la prima folosire (scripts/lazy_imports.py)
+cv2 = lazy_import('cv2')
+discovery = lazy_import('googleapiclient.discovery')
+errors = lazy_import('googleapiclient.errors')
+
+# Versiunile caracteristicilor - se incrementează la orice schimbare a algoritmilor
+AUDIO_FEATURE_VERSION = 'audio-v1'
+VISUAL_FEATURE_VERSION = 'visual-v3'
 
 # Configurare logging îmbunătățită
 logging.basicConfig(
@@ -40,14 +58,43 @@ class Config:
     MAX_RETRIES: int = 3
     DATABASE_PATH: str = '/data/ads/ads_database.db'
     TEMP_DIR: str = '/tmp'
-    MAX_WORKERS: int = 4
+    MAX_WORKERS: int = 4  # limita inițială a etapelor de descărcare și analiză
     RATE_LIMIT_CALLS_PER_MINUTE: int = 100
+    FEATURE_CACHE_PATH: str = '/data/ads/feature_cache.db'
+    FEATURE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    AUDIO_STREAMING: bool = False  # analiză în blocuri, memorie constantă indiferent de durată
+    AUDIO_STREAM_BLOCK_FRAMES: int = 1024
+    THUMBNAIL_CONCURRENCY: int = 8
+    DUPLICATE_DETECTION: bool = True  # sare peste re-upload-uri cu thumbnail aproape identic
+    DUPLICATE_MAX_DISTANCE: int = 6  # distanța Hamming maximă între hash-uri (din 64 biți)
+    PARTITION_DIR: str = '/data/ads/partitions'  # lunile arhivate (scripts/partitions.py archive)
+    JOBS_DATABASE_PATH: str = '/data/ads/jobs.db'  # coada comună tuturor instanțelor (scripts/job_queue.py)
+    JOB_LEASE_SECONDS: int = 300
+    ADAPTIVE_CONCURRENCY: bool = True  # limitele se ajustează după CPU, memorie, latență și erori
+    MAX_DOWNLOAD_CONCURRENCY: int = 16
+    MAX_ANALYSIS_CONCURRENCY: int = 0  # 0 = numărul de nuclee
+    # Bugetele unei rulări (0 = nelimitat); ce nu încape trece în rularea următoare, după prioritate
+    CYCLE_DOWNLOAD_BUDGET_MB: float = 0
+    CYCLE_CPU_BUDGET_SECONDS: float = 0
+    DOWNLOAD_ENGINE: str = 'library'  # 'library': yt-dlp în proces, sesiuni refolosite; 'subprocess': `yt-dlp` per video
+    # Transferurile motorului 'library' (0 = nelimitat); ordinea: cel mai scurt transfer așteptat primul
+    MAX_CONCURRENT_TRANSFERS: int = 8
+    TRANSFERS_PER_HOST: int = 4
+    BANDWIDTH_LIMIT_MBPS: float = 0  # plafon global, megabiți/s
+    # Director de lucru per worker (scripts/scratch.py); '' = /dev/shm dacă încape cota, altfel TEMP_DIR
+    SCRATCH_DIR: str = ''
+    SCRATCH_QUOTA_MB: float = 2048
+    SCRATCH_JOB_RESERVE_MB: float = 64  # rezervarea unui video (audio + fișiere intermediare)
+    # Cache-ul numba persistent și încălzirea kernel-urilor de analiză înainte de primul video
+    JIT_CACHE_DIR: str = '/data/ads/numba_cache'
+    JIT_WARMUP: bool = True
 
 class CrawlerMetrics:
     def __init__(self):
         self.start_time = datetime.now()
         self.videos_processed = 0
         self.videos_failed = 0
+        self.duplicates_skipped = 0
         self.total_download_time = 0
         self.errors = []
     
@@ -55,7 +102,8 @@ class CrawlerMetrics:
         elapsed = datetime.now() - self.start_time
         success_rate = (self.videos_processed / (self.videos_processed + self.videos_failed)) * 100 if (self.videos_processed + self.videos_failed) > 0 else 0
         
-        logger.info(f"Progress: {self.videos_processed} processed, {self.videos_failed} failed")
+        logger.info(f"Progress: {self.videos_processed} processed, {self.videos_failed} failed, "
+                    f"{self.duplicates_skipped} duplicates skipped")
         logger.info(f"Success rate: {success_rate:.2f}%")
         logger.info(f"Elapsed time: {elapsed}")
         
@@ -64,45 +112,141 @@ class CrawlerMetrics:
         memory = psutil.virtual_memory()
         logger.info(f"System - CPU: {cpu_percent}%, Memory: {memory.percent}%")
 
-@contextmanager
-def temp_file_cleanup(*files):
+def build_concurrency_controller(config):
+    """Etapele crawler-ului: descărcarea (rețea) și analiza audio (CPU)"""
+    controller = ConcurrencyController(adaptive=config.ADAPTIVE_CONCURRENCY)
+    controller.add_stage('download', config.MAX_WORKERS, config.MAX_DOWNLOAD_CONCURRENCY)
+    controller.add_stage('analysis', config.MAX_WORKERS,
+                         config.MAX_ANALYSIS_CONCURRENCY or os.cpu_count() or 1, cpu_bound=True)
+    return controller
+
+def load_api_keys(path='api_keys.json'):
     try:
-        yield
-    finally:
-        for file in files:
-            if os.path.exists(file):
-                try:
-                    os.remove(file)
-                    logger.debug(f"Cleaned up {file}")
-                except Exception as e:
-                    logger.warning(f"Failed to cleanup {file}: {e}")
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.error("api_keys.json not found")
+        return []
+
+def pipeline_stages(config):
+    """Etapele YouTubeCrawler pentru această configurație (modulele lor: lazy_imports.STAGE_MODULES)"""
+    stages = ['youtube_api', 'thumbnail', 'audio']
+    if config.DOWNLOAD_ENGINE == 'library':
+        stages.append('download')
+    return stages
+
+def build_youtube_service(api_keys):
+    for key in api_keys:
+        try:
+            return discovery.build('youtube', 'v3', developerKey=key)
+        except errors.HttpError as e:
+            logger.warning(f"API key failed: {key[:10]}..., error: {e}")
+            continue
+    raise Exception("No valid API keys available")
+
+async def search_videos(youtube, query, max_results, calls_per_minute):
+    """Generator asincron de (video_id, snippet), pagină cu pagină (procesarea poate începe după prima pagină)"""
+    request = youtube.search().list(
+        part="snippet",
+        q=query,
+        maxResults=min(50, max_results),  # YouTube API limit
+        type="video",
+        publishedAfter="2025-01-01T00:00:00Z",
+        order="date"
+    )
+    
+    videos_collected = 0
+    while request and videos_collected < max_results:
+        response = request.execute()
+        
+        for item in response['items']:
+            if videos_collected >= max_results:
+                break
+            yield (item['id']['videoId'], item['snippet'])
+            videos_collected += 1
+        
+        # Următoarea pagină
+        request = youtube.search().list_next(request, response)
+        
+        # Rate limiting
+        await asyncio.sleep(60 / calls_per_minute)
 
 class YouTubeCrawler:
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, persistence=None):
         self.config = config
+        # Înainte de orice import numba (librosa.feature se încarcă la prima folosire)
+        configure_jit_cache(config.JIT_CACHE_DIR)
+        self.warmup_timings = None
         self.metrics = CrawlerMetrics()
         self.api_keys = self._load_api_keys()
         self.youtube = self._get_youtube_service()
+        # persistence injectat: workerii multi-proces trimit scrierile către writer-ul părintelui
+        self.persistence = persistence or get_persistence(config.DATABASE_PATH)
+        self.feature_cache = FeatureCache(config.FEATURE_CACHE_PATH, config.FEATURE_CACHE_MAX_BYTES)
+        self.thumbnail_fetcher = ThumbnailFetcher(max_concurrency=config.THUMBNAIL_CONCURRENCY)
+        self.partitions = PartitionCatalog(config.DATABASE_PATH, config.PARTITION_DIR)
+        self.jobs = JobQueue(config.JOBS_DATABASE_PATH, lease_seconds=config.JOB_LEASE_SECONDS)
+        self.concurrency = build_concurrency_controller(config)
+        self.downloader = None
+        if config.DOWNLOAD_ENGINE == 'library' and DownloadEngine.available():
+            self.downloader = DownloadEngine(
+                workers=config.MAX_DOWNLOAD_CONCURRENCY, retries=config.MAX_RETRIES,
+                max_transfers=config.MAX_CONCURRENT_TRANSFERS or None,
+                per_host=config.TRANSFERS_PER_HOST or None,
+                bandwidth=config.BANDWIDTH_LIMIT_MBPS * 1e6 / 8 or None,
+            )
+        quota = int(config.SCRATCH_QUOTA_MB * 2**20)
+        self.scratch = ScratchSpace(
+            choose_root(config.SCRATCH_DIR, config.TEMP_DIR, quota), quota,
+            job_reserve_bytes=int(config.SCRATCH_JOB_RESERVE_MB * 2**20)
+        )
+        self.scheduler = PriorityScheduler(CycleBudget.from_config(
+            cpu_seconds=config.CYCLE_CPU_BUDGET_SECONDS, download_mb=config.CYCLE_DOWNLOAD_BUDGET_MB
+        ))
+        self.thumbnail_index = ThumbnailHashIndex()
+        if config.DUPLICATE_DETECTION:
+            self.thumbnail_index.load_from_database(config.DATABASE_PATH)
+            for partition in self.partitions.partitions('ads'):
+                self.thumbnail_index.load_from_database(partition['path'])
         
     def _load_api_keys(self):
-        try:
-            with open('api_keys.json', 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            logger.error("api_keys.json not found")
-            return []
+        return load_api_keys()
     
     def _get_youtube_service(self):
-        for key in self.api_keys:
+        return build_youtube_service(self.api_keys)
+    
+    def warm_up(self):
+        """
+        Încarcă bibliotecile etapelor și (cu JIT_WARMUP) rulează kernel-urile de analiză pe date
+        sintetice, o singură dată per proces; întoarce secundele per etapă
+        """
+        if self.warmup_timings is not None:
+            return self.warmup_timings
+        start = time.perf_counter()
+        timings = {'preload': sum(preload(pipeline_stages(self.config)).values())}
+        if self.config.JIT_WARMUP:
+            kernels = {'visual_kernel': self.compute_visual_features}
+            if self.config.AUDIO_STREAMING:
+                kernels['streaming_kernel'] = lambda path: analyze_audio_streaming(
+                    path, duration=self.config.AUDIO_DURATION, block_length=self.config.AUDIO_STREAM_BLOCK_FRAMES
+                )
+            else:
+                kernels['audio_kernel'] = self.compute_audio_features
             try:
-                return build('youtube', 'v3', developerKey=key)
-            except HttpError as e:
-                logger.warning(f"API key failed: {key[:10]}..., error: {e}")
-                continue
-        raise Exception("No valid API keys available")
+                timings.update(warm_kernels(**kernels, work_dir=self.scratch.dir, duration=self.config.AUDIO_DURATION))
+            except Exception as e:
+                logger.warning(f"JIT warm-up failed: {e}")
+        timings['total'] = time.perf_counter() - start
+        self.warmup_timings = timings
+        logger.info(f"Warm-up completed in {timings['total']:.2f}s: "
+                    + ', '.join(f"{name}={seconds:.2f}s" for name, seconds in timings.items() if name != 'total'))
+        return timings
     
     def analyze_audio_advanced(self, audio_file):
         """Analiză audio avansată cu mai multe caracteristici"""
+        if self.config.AUDIO_STREAMING:
+            return self._analyze_audio_streaming(audio_file)
+        
         try:
             # Încărcare audio cu librosa
             y, sr = librosa.load(audio_file, duration=self.config.AUDIO_DURATION)
@@ -110,50 +254,113 @@ class YouTubeCrawler:
             if len(y) == 0:
                 return None
             
-            # Caracteristici de bază
-            tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
+            # Verifică cache-ul după conținutul audio decodat
+            cache_key = self.feature_cache.make_key(
+                y.tobytes(), f"{AUDIO_FEATURE_VERSION}:{sr}"
+            )
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                logger.info(f"Audio features served from cache: tempo={cached['tempo']:.2f}")
+                return cached
             
-            # Caracteristici spectrale
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)
+            features = self.compute_audio_features(y, sr)
+            self._cache_put(cache_key, 'audio', features)
             
-            # MFCC pentru recunoașterea vocii
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            
-            # Chroma pentru analiza armonică
-            chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+            logger.info(f"Audio analysis completed: tempo={features['tempo']:.2f}, energy={features['energy']:.4f}")
+            return features
             
-            # Zero crossing rate pentru detectarea vocii
-            zcr = librosa.feature.zero_crossing_rate(y)
+        except Exception as e:
+            logger.error(f"Audio analysis failed: {e}")
+            return None
+    
+    def _cache_get(self, cache_key):
+        """Citire din cache; o eroare a cache-ului (ex. "database is locked") înseamnă doar un miss"""
+        try:
+            return self.feature_cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Feature cache read failed: {e}")
+            return None
+    
+    def _cache_put(self, cache_key, kind, features):
+        """Scriere în cache; o eroare nu aruncă caracteristicile deja calculate"""
+        try:
+            self.feature_cache.put(cache_key, kind, features)
+        except Exception as e:
+            logger.warning(f"Feature cache write failed: {e}")
+    
+    @staticmethod
+    def compute_audio_features(y, sr):
+        """Kernel-urile analizei audio (fără cache); folosite și la încălzirea JIT (jit_warmup.py)"""
+        # Caracteristici de bază
+        tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
+        
+        # Caracteristici spectrale
+        spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)
+        spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)
+        spectral_bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)
+        
+        # MFCC pentru recunoașterea vocii
+        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+        
+        # Chroma pentru analiza armonică
+        chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+        
+        # Zero crossing rate pentru detectarea vocii
+        zcr = librosa.feature.zero_crossing_rate(y)
+        
+        # Energie RMS
+        rms = librosa.feature.rms(y=y)
+        
+        # Detectare vorbire vs muzică
+        speech_ratio = YouTubeCrawler._detect_speech_ratio(y, sr)
+        
+        return {
+            'tempo': float(np.atleast_1d(tempo)[0]),
+            'energy': float(np.mean(rms)),
+            'spectral_centroid': float(np.mean(spectral_centroids)),
+            'spectral_rolloff': float(np.mean(spectral_rolloff)),
+            'spectral_bandwidth': float(np.mean(spectral_bandwidth)),
+            'mfcc_mean': np.mean(mfccs, axis=1).tolist(),
+            'chroma_mean': np.mean(chroma, axis=1).tolist(),
+            'zero_crossing_rate': float(np.mean(zcr)),
+            'speech_ratio': speech_ratio,
+            'duration': len(y) / sr
+        }
+    
+    def _analyze_audio_streaming(self, audio_file):
+        """Analiză audio în blocuri, fără a încărca tot clipul în memorie"""
+        try:
+            block_length = self.config.AUDIO_STREAM_BLOCK_FRAMES
             
-            # Energie RMS
-            rms = librosa.feature.rms(y=y)
+            # Cheia de cache din octeții fișierului (citiți în blocuri, fără o a doua decodare);
+            # durata analizată face parte din versiune
+            cache_key = self.feature_cache.make_key_from_file(
+                audio_file,
+                f"{AUDIO_FEATURE_VERSION}:stream:{block_length}:{STREAM_SAMPLE_RATE}:{self.config.AUDIO_DURATION}"
+            )
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                logger.info(f"Audio features served from cache: tempo={cached['tempo']:.2f}")
+                return cached
             
-            # Detectare vorbire vs muzică
-            speech_ratio = self._detect_speech_ratio(y, sr)
+            features = analyze_audio_streaming(
+                audio_file, duration=self.config.AUDIO_DURATION, block_length=block_length
+            )
+            if features is None:
+                return None
             
-            features = {
-                'tempo': float(tempo),
-                'energy': float(np.mean(rms)),
-                'spectral_centroid': float(np.mean(spectral_centroids)),
-                'spectral_rolloff': float(np.mean(spectral_rolloff)),
-                'spectral_bandwidth': float(np.mean(spectral_bandwidth)),
-                'mfcc_mean': np.mean(mfccs, axis=1).tolist(),
-                'chroma_mean': np.mean(chroma, axis=1).tolist(),
-                'zero_crossing_rate': float(np.mean(zcr)),
-                'speech_ratio': speech_ratio,
-                'duration': len(y) / sr
-            }
+            self._cache_put(cache_key, 'audio', features)
             
-            logger.info(f"Audio analysis completed: tempo={tempo:.2f}, energy={features['energy']:.4f}")
+            logger.info(f"Streaming audio analysis completed: tempo={features['tempo']:.2f}, "
+                        f"energy={features['energy']:.4f}, duration={features['duration']:.1f}s")
             return features
             
         except Exception as e:
-            logger.error(f"Audio analysis failed: {e}")
+            logger.error(f"Streaming audio analysis failed: {e}")
             return None
     
-    def _detect_speech_ratio(self, y, sr):
+    @staticmethod
+    def _detect_speech_ratio(y, sr):
         """Detectează raportul vorbire/muzică în audio"""
         try:
             # Folosim spectral features pentru a diferenția vorbirea de muzică
@@ -174,68 +381,60 @@ class YouTubeCrawler:
         except:
             return 0.5  # Fallback
     
-    def extract_thumbnail_features(self, video_id):
+    def extract_thumbnail_features(self, video_id, img=None):
         """Extrage caracteristici din thumbnail-ul video"""
         try:
-            # Descarcă thumbnail-ul
-            thumbnail_url = f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
-            response = requests.get(thumbnail_url, timeout=10)
-            
-            if response.status_code == 200:
-                # Salvează temporar imaginea
-                thumbnail_path = f"{self.config.TEMP_DIR}/{video_id}_thumb.jpg"
-                with open(thumbnail_path, 'wb') as f:
-                    f.write(response.content)
+            # Descarcă thumbnail-ul dacă nu a fost deja descărcat în paralel
+            if img is None:
+                img = self.thumbnail_fetcher.fetch(video_id)
+            
+            if img is not None:
+                # Verifică cache-ul după pixelii decodați
+                cache_key = self.feature_cache.make_key(img.tobytes(), VISUAL_FEATURE_VERSION)
+                cached = self._cache_get(cache_key)
+                if cached is not None:
+                    return cached
                 
-                # Analizează imaginea
-                img = cv2.imread(thumbnail_path)
-                if img is not None:
-                    # Culori dominante
-                    dominant_colors = self._extract_dominant_colors(img)
-                    
-                    # Detectare text (OCR simplu)
-                    text_density = self._estimate_text_density(img)
-                    
-                    # Brightness și contrast
-                    brightness = np.mean(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
-                    
-                    os.remove(thumbnail_path)
-                    
-                    return {
-                        'dominant_colors': dominant_colors,
-                        'text_density': text_density,
-                        'brightness': float(brightness)
-                    }
-                
-                os.remove(thumbnail_path)
+                features = self.compute_visual_features(img)
+                self._cache_put(cache_key, 'visual', features)
+                return features
             
         except Exception as e:
             logger.warning(f"Thumbnail analysis failed for {video_id}: {e}")
         
         return None
     
-    def _extract_dominant_colors(self, img, k=5):
-        """Extrage culorile dominante din imagine"""
+    @staticmethod
+    def compute_visual_features(img):
+        """Kernel-urile analizei thumbnail-ului (fără cache)"""
+        # Culori dominante
+        dominant_colors = YouTubeCrawler._extract_dominant_colors(img)
+        
+        # Detectare text (OCR simplu)
+        text_density = YouTubeCrawler._estimate_text_density(img)
+        
+        # Brightness și contrast
+        brightness = np.mean(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+        
+        return {
+            'dominant_colors': dominant_colors,
+            'text_density': text_density,
+            'brightness': float(brightness),
+            'phash': phash(img),
+            'dhash': dhash(img)
+        }
+    
+    @staticmethod
+    def _extract_dominant_colors(img, k=5):
+        """Extrage culorile dominante din imagine, sortate după procentul de pixeli"""
         try:
-            # Reshape imaginea pentru k-means
-            data = img.reshape((-1, 3))
-            data = np.float32(data)
-            
-            # K-means clustering
-            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
-            _, labels, centers = cv2.kmeans(data, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
-            
-            # Convertește la hex
-            colors = []
-            for center in centers:
-                color_hex = "#{:02x}{:02x}{:02x}".format(int(center[2]), int(center[1]), int(center[0]))
-                colors.append(color_hex)
-            
-            return colors[:3]  # Returnează primele 3 culori
+            palette = extract_palette(img, k=k)
+            return [to_hex(color) for color, _ in palette[:3]]  # Returnează primele 3 culori
         except:
             return ["#000000", "#FFFFFF", "#808080"]  # Fallback
     
-    def _estimate_text_density(self, img):
+    @staticmethod
+    def _estimate_text_density(img):
         """Estimează densitatea textului în imagine"""
         try:
             # Convertește la grayscale
@@ -257,15 +456,27 @@ class YouTubeCrawler:
         
         try:
             # Verifică dacă există deja în baza de date
-            with sqlite3.connect(self.config.DATABASE_PATH) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id FROM ads WHERE video_id = ?", (video_id,))
-                if cursor.fetchone():
-                    logger.info(f"Video {video_id} already processed, skipping.")
-                    return
-            
-            # Descarcă și procesează
-            await self._download_and_process(video_id, snippet)
+            if (self.persistence.fetchone("SELECT id FROM ads WHERE video_id = ?", (video_id,))
+                    or self.partitions.find_video(video_id)):
+                logger.info(f"Video {video_id} already processed, skipping.")
+                return
+            
+            # Revendicare atomică: alte procese sau noduri nu vor descărca același video
+            job = await self.jobs.claim_key_async(INGEST_QUEUE, video_id)
+            if job is None:
+                logger.info(f"Video {video_id} claimed by another worker, skipping.")
+                return
+            
+            # Descarcă și procesează; ack doar după commit-ul scrierilor (în worker-ii multi-proces,
+            # după confirmarea procesului părinte), altfel nack și jobul se reia
+            async with self.jobs.processing(job):
+                write = await self._download_and_process(video_id, snippet)
+                committed = await asyncio.get_running_loop().run_in_executor(
+                    None, self.persistence.flush, self.jobs.lease_seconds)
+                if not committed:
+                    raise RuntimeError(f"Writes for {video_id} not committed within the job lease")
+                if write is not None:
+                    write.result(timeout=0)  # excepția unei scrieri eșuate ajunge la nack
             self.metrics.videos_processed += 1
             
         except Exception as e:
@@ -274,65 +485,122 @@ class YouTubeCrawler:
             self.metrics.errors.append(f"{video_id}: {str(e)}")
     
     async def _download_and_process(self, video_id, snippet):
-        """Descarcă și procesează un video"""
-        output_file = f"{self.config.TEMP_DIR}/{video_id}.mp4"
-        audio_file = f"{self.config.TEMP_DIR}/{video_id}.mp3"
-        
-        with temp_file_cleanup(output_file, audio_file):
-            # Comandă yt-dlp pentru descărcare audio
-            cmd = [
-                "yt-dlp", 
-                "-o", output_file,
-                "-x", "--audio-format", "mp3",
-                "--no-mtime", 
-                "--retries", str(self.config.MAX_RETRIES),
-                "--fragment-retries", str(self.config.MAX_RETRIES),
-                f"https://www.youtube.com/watch?v={video_id}"
-            ]
-            
-            # Execută descărcarea
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(), 
-                    timeout=self.config.DOWNLOAD_TIMEOUT
-                )
-                
-                if process.returncode != 0:
-                    logger.error(f"yt-dlp failed for {video_id}: {stderr.decode()}")
-                    return
-                
-            except asyncio.TimeoutError:
-                process.kill()
-                logger.error(f"Download timeout for {video_id}")
-                return
-            
-            # Găsește fișierul audio descărcat
-            audio_files = [f for f in os.listdir(self.config.TEMP_DIR) 
-                          if f.startswith(video_id) and f.endswith('.mp3')]
-            
-            if not audio_files:
-                logger.error(f"No audio file found for {video_id}")
-                return
-            
-            actual_audio_file = os.path.join(self.config.TEMP_DIR, audio_files[0])
-            
-            # Analizează audio
-            audio_features = self.analyze_audio_advanced(actual_audio_file)
+        """Descarcă și procesează un video; întoarce Future-ul scrierii (None dacă nu s-a salvat nimic)"""
+        # Thumbnail-ul și audio-ul pornesc imediat, în paralel. Detectarea duplicatelor nu mai
+        # amână descărcarea: un duplicat găsit după thumbnail anulează descărcarea deja pornită
+        # (cost: începutul transferului pentru duplicate, rare, în schimbul suprapunerii pentru restul)
+        thumbnail_task = asyncio.ensure_future(self.thumbnail_fetcher.fetch_async(video_id))
+        audio_task = asyncio.ensure_future(self._download_and_analyze(video_id))
+        
+        try:
+            thumbnail_features = await self._thumbnail_features_from_task(video_id, thumbnail_task)
+            if self.config.DUPLICATE_DETECTION:
+                duplicate_of = self._find_duplicate_thumbnail(video_id, thumbnail_features)
+                if duplicate_of:
+                    audio_task.cancel()
+                    logger.info(f"Video {video_id} is a near-duplicate of {duplicate_of}, download cancelled.")
+                    self.metrics.duplicates_skipped += 1
+                    return None
             
-            # Analizează thumbnail
-            thumbnail_features = self.extract_thumbnail_features(video_id)
+            audio_features = await audio_task
             
             # Obține statistici YouTube
             stats = await self._get_video_stats(video_id)
             
             # Salvează în baza de date
-            await self._save_to_database(video_id, snippet, audio_features, thumbnail_features, stats)
+            return await self._save_to_database(video_id, snippet, audio_features, thumbnail_features, stats)
+        finally:
+            for task in (audio_task, thumbnail_task):
+                if not task.done():
+                    task.cancel()
+            # Descărcarea anulată își eliberează scratch-ul înainte de ack/nack
+            await asyncio.gather(audio_task, thumbnail_task, return_exceptions=True)
+    
+    async def _download_with_subprocess(self, video_id, job_dir):
+        """Descărcare printr-un proces `yt-dlp` nou (când biblioteca nu e disponibilă)"""
+        cmd = [
+            "yt-dlp", 
+            "-o", os.path.join(job_dir, "%(id)s.%(ext)s"),
+            "-x", "--audio-format", "mp3",
+            "--no-mtime", 
+            "--retries", str(self.config.MAX_RETRIES),
+            "--fragment-retries", str(self.config.MAX_RETRIES),
+            f"https://www.youtube.com/watch?v={video_id}"
+        ]
+        
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(), 
+                timeout=self.config.DOWNLOAD_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            raise asyncio.TimeoutError(f"Download timeout for {video_id}")
+        except asyncio.CancelledError:
+            # ex. duplicat găsit după thumbnail: procesul nu trebuie să continue în fundal
+            process.kill()
+            raise
+        
+        if process.returncode != 0:
+            raise RuntimeError(f"yt-dlp failed for {video_id}: {stderr.decode()[-500:]}")
+    
+    def _log_download_progress(self, progress):
+        total = progress['total_bytes']
+        percent = f"{progress['downloaded_bytes'] * 100 / total:.0f}%" if total and progress['downloaded_bytes'] else '?'
+        speed = f"{progress['speed'] / 1024:.0f} KiB/s" if progress['speed'] else '-'
+        logger.debug(f"Download {progress['video_id']}: {progress['status']} {percent} at {speed}")
+    
+    async def _thumbnail_features_from_task(self, video_id, thumbnail_task):
+        """Așteaptă descărcarea thumbnail-ului și extrage caracteristicile"""
+        thumbnail_img = await thumbnail_task
+        if thumbnail_img is None:
+            return None
+        return self.extract_thumbnail_features(video_id, thumbnail_img)
+    
+    def _find_duplicate_thumbnail(self, video_id, thumbnail_features):
+        """Caută un video deja procesat cu thumbnail aproape identic"""
+        if not thumbnail_features or thumbnail_features.get('phash') is None:
+            return None
+        return self.thumbnail_index.find_duplicate(
+            video_id,
+            thumbnail_features['phash'],
+            thumbnail_features.get('dhash'),
+            self.config.DUPLICATE_MAX_DISTANCE
+        )
+    
+    async def _download_and_analyze(self, video_id):
+        """Descarcă audio-ul și întoarce caracteristicile audio"""
+        # Subdirectorul video-ului (cu rezervare din cota de scratch) e șters la ieșire, inclusiv fragmentele
+        async with self.scratch.job(video_id) as job_dir:
+            # Execută descărcarea (latența și timeout-urile ajustează limita etapei);
+            # excepțiile ajung la coada de joburi: nack și reîncercare cu backoff
+            async with self.concurrency.stage('download'):
+                if self.downloader:
+                    await self.downloader.download_audio(
+                        video_id, job_dir, timeout=self.config.DOWNLOAD_TIMEOUT,
+                        on_progress=self._log_download_progress
+                    )
+                else:
+                    await self._download_with_subprocess(video_id, job_dir)
+            
+            # Numele fișierului audio e determinist: fără listarea directorului
+            actual_audio_file = self.scratch.audio_path(video_id)
+            if not os.path.exists(actual_audio_file):
+                raise RuntimeError(f"No audio file found for {video_id}")
+            
+            self.scheduler.charge(download_bytes=os.path.getsize(actual_audio_file))
+            
+            # Analizează audio în thread pool, cu limita etapei CPU-bound
+            async with self.concurrency.stage('analysis'):
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, self.analyze_audio_advanced, actual_audio_file
+                )
     
     async def _get_video_stats(self, video_id):
         """Obține statisticile video de la YouTube"""
@@ -349,87 +617,90 @@ class YouTubeCrawler:
                         'comments': int(stats.get('commentCount', 0))
                     }
                 
-            except HttpError as e:
+            except errors.HttpError as e:
                 logger.warning(f"Stats fetch failed (attempt {attempt + 1}): {e}")
                 await asyncio.sleep(2 ** attempt)
         
         return {'views': 0, 'likes': 0, 'comments': 0}
     
     async def _save_to_database(self, video_id, snippet, audio_features, thumbnail_features, stats):
-        """Salvează datele în baza de date"""
+        """Pune în coada writer-ului datele reclamei (ads + caracteristici, aplicate împreună)"""
         try:
-            with sqlite3.connect(self.config.DATABASE_PATH) as conn:
-                cursor = conn.cursor()
-                
-                # Calculează engagement rate
-                engagement_rate = 0.0
-                if stats['views'] > 0:
-                    engagement_rate = (stats['likes'] + stats['comments']) / stats['views']
-                
-                # Inserează în tabela ads
-                cursor.execute("""
-                    INSERT INTO ads (
-                        video_id, url, source, type, title, published_at, channel, 
-                        description, views, likes, comments_count, engagement_rate, 
-                        dominant_colors, duration, timestamp
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            # Calculează engagement rate
+            engagement_rate = 0.0
+            if stats['views'] > 0:
+                engagement_rate = (stats['likes'] + stats['comments']) / stats['views']
+            
+            # Inserează în tabela ads
+            statements = [("""
+                INSERT INTO ads (
+                    video_id, url, source, type, title, published_at, channel, 
+                    description, views, likes, comments_count, engagement_rate, 
+                    dominant_colors, duration, timestamp, created_epoch, published_epoch
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?)
+            """, (
+                video_id,
+                f"https://youtube.com/watch?v={video_id}",
+                "YouTube",
+                "video",
+                snippet['title'],
+                snippet.get('publishedAt', ''),
+                snippet['channelTitle'],
+                snippet.get('description', ''),
+                stats['views'],
+                stats['likes'],
+                stats['comments'],
+                engagement_rate,
+                json.dumps(thumbnail_features['dominant_colors'] if thumbnail_features else []),
+                int(audio_features['duration'] if audio_features else 0),
+                now_epoch(),
+                to_epoch(snippet.get('publishedAt'))
+            ))]
+            
+            # Inserează caracteristici audio (ad_id rezolvat prin video_id, în aceeași tranzacție)
+            if audio_features:
+                statements.append(("""
+                    INSERT INTO audio_features (
+                        ad_id, tempo, energy, spectral_centroid, spectral_rolloff,
+                        spectral_bandwidth, zero_crossing_rate, speech_ratio,
+                        mfcc_features, chroma_features
+                    ) VALUES ((SELECT id FROM ads WHERE video_id = ?), ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """, (
                     video_id,
-                    f"https://youtube.com/watch?v={video_id}",
-                    "YouTube",
-                    "video",
-                    snippet['title'],
-                    snippet.get('publishedAt', ''),
-                    snippet['channelTitle'],
-                    snippet.get('description', ''),
-                    stats['views'],
-                    stats['likes'],
-                    stats['comments'],
-                    engagement_rate,
-                    json.dumps(thumbnail_features['dominant_colors'] if thumbnail_features else []),
-                    int(audio_features['duration'] if audio_features else 0)
-                ))
-                
-                ad_id = cursor.lastrowid
-                
-                # Inserează caracteristici audio
-                if audio_features:
-                    cursor.execute("""
-                        INSERT INTO audio_features (
-                            ad_id, tempo, energy, spectral_centroid, spectral_rolloff,
-                            spectral_bandwidth, zero_crossing_rate, speech_ratio,
-                            mfcc_features, chroma_features
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        ad_id,
-                        audio_features['tempo'],
-                        audio_features['energy'],
-                        audio_features['spectral_centroid'],
-                        audio_features['spectral_rolloff'],
-                        audio_features['spectral_bandwidth'],
-                        audio_features['zero_crossing_rate'],
-                        audio_features['speech_ratio'],
-                        json.dumps(audio_features['mfcc_mean']),
-                        json.dumps(audio_features['chroma_mean'])
-                    ))
-                
-                # Inserează caracteristici vizuale
-                if thumbnail_features:
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO visual_features (
-                            ad_id, text_density, brightness, color_palette
-                        ) VALUES (?, ?, ?, ?)
-                    """, (
-                        ad_id,
-                        thumbnail_features['text_density'],
-                        thumbnail_features['brightness'],
-                        json.dumps(thumbnail_features['dominant_colors'])
-                    ))
-                
-                logger.info(f"Saved ad {ad_id} for video {video_id}")
-                
+                    audio_features['tempo'],
+                    audio_features['energy'],
+                    audio_features['spectral_centroid'],
+                    audio_features['spectral_rolloff'],
+                    audio_features['spectral_bandwidth'],
+                    audio_features['zero_crossing_rate'],
+                    audio_features['speech_ratio'],
+                    encode_vector(audio_features['mfcc_mean']),
+                    encode_vector(audio_features['chroma_mean'])
+                )))
+            
+            # Inserează caracteristici vizuale
+            if thumbnail_features:
+                statements.append(("""
+                    INSERT OR IGNORE INTO visual_features (
+                        ad_id, text_density, brightness, color_palette, phash, dhash
+                    ) VALUES ((SELECT id FROM ads WHERE video_id = ?), ?, ?, ?, ?, ?)
+                """, (
+                    video_id,
+                    thumbnail_features['text_density'],
+                    thumbnail_features['brightness'],
+                    json.dumps(thumbnail_features['dominant_colors']),
+                    to_signed(thumbnail_features['phash']),
+                    to_signed(thumbnail_features['dhash'])
+                )))
+                self.thumbnail_index.add(video_id, thumbnail_features['phash'], thumbnail_features['dhash'])
+            
+            write = self.persistence.submit(statements)
+            logger.info(f"Queued ad for video {video_id}")
+            return write
+            
         except Exception as e:
             logger.error(f"Database save failed for {video_id}: {e}")
+            return None
     
     async def crawl_youtube_ads(self, query, max_results=None):
         """Funcția principală de crawling"""
@@ -438,62 +709,67 @@ class YouTubeCrawler:
         
         logger.info(f"Starting crawl with query: {query}")
         
+        # Încălzirea rulează în paralel cu căutarea; procesarea începe doar după ea
+        warm_up = asyncio.get_running_loop().run_in_executor(None, self.warm_up)
+        
         try:
             # Căutare videoclipuri
-            request = self.youtube.search().list(
-                part="snippet",
-                q=query,
-                maxResults=min(50, max_results),  # YouTube API limit
-                type="video",
-                publishedAfter="2025-01-01T00:00:00Z",
-                order="date"
-            )
-            
-            all_videos = []
-            videos_collected = 0
-            
-            while request and videos_collected < max_results:
-                response = request.execute()
-                
-                for item in response['items']:
-                    if videos_collected >= max_results:
-                        break
-                    
-                    video_data = (item['id']['videoId'], item['snippet'])
-                    all_videos.append(video_data)
-                    videos_collected += 1
-                
-                # Următoarea pagină
-                request = self.youtube.search().list_next(request, response)
-                
-                # Rate limiting
-                await asyncio.sleep(60 / self.config.RATE_LIMIT_CALLS_PER_MINUTE)
+            all_videos = [video async for video in search_videos(
+                self.youtube, query, max_results, self.config.RATE_LIMIT_CALLS_PER_MINUTE
+            )]
             
             logger.info(f"Found {len(all_videos)} videos to process")
             
-            # Procesează videoclipurile în paralel
-            semaphore = asyncio.Semaphore(self.config.MAX_WORKERS)
-            
-            async def process_with_semaphore(video_data):
-                async with semaphore:
+            # Ordinea de procesare: prospețime și istoricul canalului (plus ce a rămas din rularea trecută)
+            with self.persistence.reader() as conn:
+                self.scheduler.channel_history = load_channel_history(conn)
+            for video_id, snippet in all_videos:
+                self.scheduler.push(video_id, (video_id, snippet),
+                                    published_at=snippet.get('publishedAt'), channel=snippet.get('channelTitle'))
+            
+            # Procesează videoclipurile în paralel; limitele efective sunt ale etapelor
+            completed = 0
+            
+            async def runner():
+                nonlocal completed
+                while True:
+                    video_data = self.scheduler.pop()
+                    if video_data is None:
+                        return
                     await self.process_video_async(video_data)
+                    completed += 1
+                    # Progress logging
+                    if completed % 10 == 0:
+                        self.metrics.log_progress()
+                        logger.info(f"Concurrency: {self.concurrency.describe()}")
             
-            tasks = [process_with_semaphore(video) for video in all_videos]
-            
-            # Execută cu progress logging
-            for i, task in enumerate(asyncio.as_completed(tasks)):
-                await task
-                if (i + 1) % 10 == 0:
-                    self.metrics.log_progress()
+            await warm_up
+            await asyncio.gather(*(runner() for _ in range(self.concurrency.capacity())))
+            self.scheduler.end_cycle()
             
             # Log final
+            await asyncio.get_running_loop().run_in_executor(None, self.persistence.flush)
             self.metrics.log_progress()
+            await self.concurrency.stop()
+            logger.info(f"Concurrency: {self.concurrency.snapshot()}")
+            logger.info(f"Feature cache: {self.feature_cache.stats()}")
+            if self.downloader:
+                logger.info(f"Download engine: {self.downloader.transfer_stats()}")
+            logger.info(f"Scratch: {self.scratch.usage()}")
             logger.info("Crawling completed successfully")
             
         except Exception as e:
             logger.error(f"Crawling failed: {e}")
             raise
 
+def ensure_columns(cursor, table, columns):
+    """Adaugă coloanele lipsă într-o tabelă existentă"""
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            logger.info(f"Added column {table}.{name}")
+
 def init_database_advanced():
     """Inițializează baza de date cu tabele îmbunătățite"""
     with sqlite3.connect('/data/ads/ads_database.db') as conn:
@@ -518,7 +794,9 @@ def init_database_advanced():
                 dominant_colors TEXT,
                 duration INTEGER,
                 timestamp TEXT,
-                processed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                processed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                created_epoch INTEGER,
+                published_epoch INTEGER
             )
         """)
         
@@ -533,8 +811,8 @@ def init_database_advanced():
                 spectral_bandwidth REAL,
                 zero_crossing_rate REAL,
                 speech_ratio REAL,
-                mfcc_features TEXT,
-                chroma_features TEXT,
+                mfcc_features BLOB,
+                chroma_features BLOB,
                 FOREIGN KEY (ad_id) REFERENCES ads(id)
             )
         """)
@@ -548,14 +826,29 @@ def init_database_advanced():
                 color_palette TEXT,
                 has_faces BOOLEAN DEFAULT 0,
                 has_text BOOLEAN DEFAULT 0,
+                phash INTEGER,
+                dhash INTEGER,
                 FOREIGN KEY (ad_id) REFERENCES ads(id)
             )
         """)
         
+        # Coloane adăugate ulterior, pentru baze de date existente
+        ensure_columns(cursor, 'visual_features', {'phash': 'INTEGER', 'dhash': 'INTEGER'})
+        
         # Indexuri pentru performanță
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_video_id ON ads(video_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_published_at ON ads(published_at)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_engagement_rate ON ads(engagement_rate)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ads_processed_at ON ads(processed_at, id)")
+        
+        # Tabele agregate menținute incremental pentru dashboard
+        install_aggregates(conn, 'ads')
+        
+        # Index full-text (titlu, descriere, canal)
+        install_text_search(conn, 'ads')
+        
+        # Coloane epoch + indexuri pentru interogările pe ferestre de timp
+        install_epoch_columns(conn, 'ads')
 
 async def main():
     """Funcția principală"""
@@ -20,7 +20,9 @@ CREATE TABLE IF NOT EXISTS ads (
     duration INTEGER DEFAULT 0, -- în secunde
     timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
     processed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    created_epoch INTEGER, -- secunde UTC, completat de scriitori (vezi scripts/epoch_columns.py)
+    published_epoch INTEGER -- secunde UTC, derivat din published_at
 );
 
 -- Tabela pentru caracteristici audio avansate
@@ -33,8 +35,8 @@ CREATE TABLE IF NOT EXISTS audio_features (
     spectral_bandwidth REAL, -- Hz
     zero_crossing_rate REAL, -- 0-1
     speech_ratio REAL, -- 0-1 (0=muzică, 1=vorbire)
-    mfcc_features TEXT, -- JSON array cu MFCC features
-    chroma_features TEXT, -- JSON array cu chroma features
+    mfcc_features BLOB, -- vector float32 little-endian cu header (vezi scripts/vector_codec.py)
+    chroma_features BLOB, -- vector float32 little-endian cu header (vezi scripts/vector_codec.py)
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (ad_id) REFERENCES ads(id) ON DELETE CASCADE
 );
@@ -49,6 +51,8 @@ CREATE TABLE IF NOT EXISTS visual_features (
     has_text BOOLEAN DEFAULT 0,
     face_count INTEGER DEFAULT 0,
     text_regions TEXT, -- JSON array cu regiunile de text
+    phash INTEGER, -- pHash pe 64 biți (cu semn) al thumbnail-ului
+    dhash INTEGER, -- dHash pe 64 biți (cu semn) al thumbnail-ului
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (ad_id) REFERENCES ads(id) ON DELETE CASCADE
 );
@@ -93,6 +97,10 @@ CREATE INDEX IF NOT EXISTS idx_ads_engagement_rate ON ads(engagement_rate);
 CREATE INDEX IF NOT EXISTS idx_ads_views ON ads(views);
 CREATE INDEX IF NOT EXISTS idx_ads_channel ON ads(channel);
 CREATE INDEX IF NOT EXISTS idx_ads_source ON ads(source);
+CREATE INDEX IF NOT EXISTS idx_ads_processed_at ON ads(processed_at, id); -- export incremental (scripts/export_features.py)
+CREATE INDEX IF NOT EXISTS idx_ads_created_epoch ON ads(created_epoch); -- ultimele 24h, bucket-uri pe oră, reclame recente
+CREATE INDEX IF NOT EXISTS idx_ads_published_epoch ON ads(published_epoch);
+CREATE INDEX IF NOT EXISTS idx_ads_channel_cover ON ads(channel, views, engagement_rate); -- top canale fără citirea rândurilor
 
 CREATE INDEX IF NOT EXISTS idx_audio_tempo ON audio_features(tempo);
 CREATE INDEX IF NOT EXISTS idx_audio_energy ON audio_features(energy);
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Încălzirea kernel-urilor JIT (numba, prin librosa) înainte de primul video
+Prima încărcare a librosa.feature / librosa.beat compilează funcțiile numba; fără un cache
+persistent fiecare proces (ex. fiecare worker spawn din multi_gpu_crawler) plătește din nou
+zeci de secunde. configure_jit_cache() fixează NUMBA_CACHE_DIR pe volumul de date (trebuie
+apelat înainte de importul numba), iar warm_kernels() rulează fiecare kernel de analiză pe un clip
+sintetic scurt, astfel încât primul video real are latența regimului staționar.
+
+Utilizare: python3 scripts/jit_warmup.py [--cache-dir DIR] [--streaming]
+           (încălzire + latența primului clip vs. regim staționar)
+"""
+
+import os
+import sys
+import time
+import wave
+import logging
+import argparse
+import tempfile
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WARMUP_SECONDS = 3.0
+WARMUP_SAMPLE_RATE = 44100  # diferită de 22050: încălzește și resamplarea din librosa.load
+
+
+def configure_jit_cache(cache_dir: Optional[str]) -> Optional[str]:
+    """Setează NUMBA_CACHE_DIR (dacă nu e deja setat); întoarce directorul efectiv"""
+    if not cache_dir:
+        return os.environ.get('NUMBA_CACHE_DIR')
+    if 'numba' in sys.modules and os.environ.get('NUMBA_CACHE_DIR') != cache_dir:
+        logger.warning(f"numba already imported, JIT cache {cache_dir} applies only to new processes")
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ.setdefault('NUMBA_CACHE_DIR', cache_dir)
+    return os.environ['NUMBA_CACHE_DIR']
+
+
+def synthetic_clip(seconds: float = WARMUP_SECONDS, sr: int = WARMUP_SAMPLE_RATE) -> np.ndarray:
+    """Ton cu glissando, impulsuri ritmice (pentru beat tracking) și zgomot, float32 mono"""
+    t = np.arange(int(seconds * sr)) / sr
+    y = 0.3 * np.sin(2 * np.pi * (220 + 110 * t) * t)
+    beat = (t % 0.5) < 0.02
+    y = y + 0.5 * beat * np.sin(2 * np.pi * 1000 * t)
+    y = y + 0.02 * np.random.default_rng(0).standard_normal(len(t))
+    return y.astype(np.float32)
+
+
+def synthetic_thumbnail(width: int = 320, height: int = 180) -> np.ndarray:
+    """Imagine BGR cu blocuri de culoare și muchii"""
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    img[:, : width // 3] = (40, 80, 200)
+    img[:, width // 3: 2 * width // 3] = (220, 220, 220)
+    img[height // 3: 2 * height // 3, width // 2:] = (10, 10, 10)
+    return img
+
+
+def write_wav(path: str, y: np.ndarray, sr: int):
+    pcm = (np.clip(y, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes(pcm.tobytes())
+
+
+def _timed(timings: Dict[str, float], name: str, fn: Callable[[], Any]) -> Any:
+    start = time.perf_counter()
+    result = fn()
+    timings[name] = time.perf_counter() - start
+    return result
+
+
+def warm_kernels(audio_kernel: Optional[Callable] = None, streaming_kernel: Optional[Callable] = None,
+                 visual_kernel: Optional[Callable] = None, work_dir: Optional[str] = None,
+                 duration: Optional[float] = None) -> Dict[str, float]:
+    """
+    Rulează kernel-urile date pe date sintetice; întoarce secundele per etapă
+    audio_kernel(y, sr), streaming_kernel(cale) și visual_kernel(img) sunt funcțiile reale ale analizei.
+    """
+    import librosa  # încărcat aici, după configure_jit_cache
+
+    timings: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        path = os.path.join(tmp, 'warmup.wav')
+        write_wav(path, synthetic_clip(), WARMUP_SAMPLE_RATE)
+        if audio_kernel is not None:
+            y, sr = _timed(timings, 'load', lambda: librosa.load(path, duration=duration))
+            _timed(timings, 'audio', lambda: audio_kernel(y, sr))
+        if streaming_kernel is not None:
+            _timed(timings, 'streaming', lambda: streaming_kernel(path))
+    if visual_kernel is not None:
+        img = synthetic_thumbnail()
+        _timed(timings, 'visual', lambda: visual_kernel(img))
+    timings['total'] = sum(timings.values())
+    return timings
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Încălzirea JIT și latența primului clip')
+    parser.add_argument('--cache-dir', default='/data/ads/numba_cache')
+    parser.add_argument('--streaming', action='store_true', help='analiza în blocuri (AUDIO_STREAMING)')
+    args = parser.parse_args()
+
+    cache_dir = configure_jit_cache(args.cache_dir)
+    start = time.perf_counter()
+    from improved_crawler import YouTubeCrawler
+    from streaming_audio import analyze_audio_streaming
+    import librosa.beat
+    import librosa.feature
+    print(f"JIT cache: {cache_dir}")
+    print(f"import: {time.perf_counter() - start:.2f}s")
+
+    kernels = {'visual_kernel': YouTubeCrawler.compute_visual_features}
+    if args.streaming:
+        kernels['streaming_kernel'] = analyze_audio_streaming
+    else:
+        kernels['audio_kernel'] = YouTubeCrawler.compute_audio_features
+    first = warm_kernels(**kernels)
+    steady = warm_kernels(**kernels)
+    for name in first:
+        print(f"{name:<10} first {first[name]:>7.3f}s  steady {steady[name]:>7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
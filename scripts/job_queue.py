@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Coadă de joburi SQLite cu lease-uri, pentru mai multe instanțe de crawler (procese sau noduri)
+Un worker revendică atomic un job (BEGIN IMMEDIATE) înainte de descărcare, îl ține prin
+heartbeat și îl confirmă (ack) la final. Lease-urile expirate redevin disponibile (visibility
+timeout); după max_attempts încercări jobul ajunge în starea 'dead' (dead-letter).
+Din cod asincron se folosesc variantele *_async: tranzacțiile (BEGIN IMMEDIATE, synchronous=FULL,
+busy timeout de 30 s, eventual pe un volum partajat) rulează într-un thread, nu în event loop.
+
+Fișierul cozii folosește implicit journal_mode=DELETE: WAL are nevoie de memorie partajată
+și nu funcționează între noduri care montează același volum.
+
+Utilizare: python3 scripts/job_queue.py stats [cale_coadă]
+           python3 scripts/job_queue.py dead <coadă> [cale_coadă]
+           python3 scripts/job_queue.py requeue-dead <coadă> [cale_coadă]
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import logging
+import argparse
+import functools
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_DB = '/data/ads/jobs.db'
+
+# Etapele de lucru (cozile); crawler-ele care produc același rând în `ads` împart aceeași coadă
+INGEST_QUEUE = 'ingest'
+ANALYSIS_QUEUE = 'analysis'
+
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30     # backoff exponențial între încercări: 30 s, 60 s, 120 s...
+RETRY_MAX_SECONDS = 3600
+
+
+def default_owner() -> str:
+    """Identificator unic al worker-ului: host:pid:aleator"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+@dataclass
+class Job:
+    id: int
+    queue: str
+    key: str
+    payload: Any
+    priority: int
+    attempts: int
+    max_attempts: int
+    lease_owner: str
+    lease_expires: float
+
+
+class JobQueue:
+    def __init__(self, db_path: str = DEFAULT_JOBS_DB, lease_seconds: int = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS, journal_mode: str = 'DELETE',
+                 owner: Optional[str] = None):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.owner = owner or default_owner()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, isolation_level=None, timeout=30, check_same_thread=False)
+        self.conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        self.conn.execute("PRAGMA synchronous = FULL" if journal_mode.upper() != 'WAL' else "PRAGMA synchronous = NORMAL")
+        self._init_schema()
+
+    def _init_schema(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                queue TEXT NOT NULL,
+                key TEXT NOT NULL,              -- ex. video_id
+                payload TEXT,                   -- JSON
+                priority INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL DEFAULT 'ready',   -- ready | leased | done | dead
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                available_at REAL NOT NULL,     -- epoch; amânare după eșec (backoff)
+                lease_owner TEXT,
+                lease_expires REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (queue, key)
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(queue, state, priority DESC, available_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(queue, state, lease_expires);
+        """)
+
+    def _transaction(self):
+        """BEGIN IMMEDIATE: lock-ul de scriere e luat înainte de citire, deci revendicarea e atomică"""
+        return _ImmediateTransaction(self.conn, self._lock)
+
+    # --- Producător ---
+
+    def enqueue(self, queue: str, key: str, payload: Any = None, priority: int = 0) -> bool:
+        """Adaugă un job (idempotent pe (queue, key)); un job existent gata de rulare își poate crește prioritatea"""
+        return self.enqueue_many(queue, [(key, payload)], priority) == 1
+
+    def enqueue_many(self, queue: str, items: List[tuple], priority: int = 0) -> int:
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            for key, payload in items:
+                conn.execute("""
+                    INSERT INTO jobs (queue, key, payload, priority, max_attempts, available_at, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(queue, key) DO UPDATE SET priority = excluded.priority, updated_at = excluded.updated_at
+                    WHERE jobs.state = 'ready' AND excluded.priority > jobs.priority
+                """, (queue, key, json.dumps(payload) if payload is not None else None,
+                      priority, self.max_attempts, now, now, now))
+            return conn.total_changes - before
+
+    # --- Consumator ---
+
+    def claim(self, queue: str, limit: int = 1) -> List[Job]:
+        """Revendică până la `limit` joburi gata de rulare, în ordinea priorității"""
+        now = time.time()
+        with self._transaction() as conn:
+            self._expire_leases(conn, queue, now)
+            rows = conn.execute("""
+                SELECT id FROM jobs
+                WHERE queue = ? AND state = 'ready' AND available_at <= ?
+                ORDER BY priority DESC, available_at
+                LIMIT ?
+            """, (queue, now, limit)).fetchall()
+            return [self._lease(conn, row[0], now) for row in rows]
+
+    def claim_key(self, queue: str, key: str, payload: Any = None, priority: int = 0,
+                  reclaim_done_after: Optional[float] = None) -> Optional[Job]:
+        """
+        Înregistrează și revendică într-o singură tranzacție jobul pentru o cheie cunoscută
+        (crawler-ele care își găsesc singure videoclipurile). None dacă altcineva îl procesează,
+        l-a terminat sau jobul e în backoff. reclaim_done_after permite reprocesarea periodică.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("""
+                INSERT OR IGNORE INTO jobs (queue, key, payload, priority, max_attempts, available_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (queue, key, json.dumps(payload) if payload is not None else None,
+                  priority, self.max_attempts, now, now, now))
+            row = conn.execute("""
+                SELECT id, state, attempts, max_attempts, available_at, lease_expires, updated_at
+                FROM jobs WHERE queue = ? AND key = ?
+            """, (queue, key)).fetchone()
+            job_id, state, attempts, max_attempts, available_at, lease_expires, updated_at = row
+
+            if state == 'leased' and lease_expires < now:
+                # Worker-ul anterior a murit fără ack; încercarea lui se numără
+                state = 'ready' if attempts < max_attempts else 'dead'
+                if state == 'dead':
+                    self._mark_dead(conn, job_id, 'lease expired', now)
+            elif state == 'done' and reclaim_done_after is not None and updated_at < now - reclaim_done_after:
+                conn.execute("UPDATE jobs SET attempts = 0 WHERE id = ?", (job_id,))
+                state = 'ready'
+
+            if state != 'ready' or available_at > now:
+                return None
+            return self._lease(conn, job_id, now)
+
+    def heartbeat(self, job: Job) -> bool:
+        """Prelungește lease-ul; False dacă lease-ul a fost pierdut (expirat și revendicat de altcineva)"""
+        now = time.time()
+        expires = now + self.lease_seconds
+        with self._transaction() as conn:
+            changed = conn.execute("""
+                UPDATE jobs SET lease_expires = ?, updated_at = ?
+                WHERE id = ? AND state = 'leased' AND lease_owner = ?
+            """, (expires, now, job.id, job.lease_owner)).rowcount
+        if changed:
+            job.lease_expires = expires
+        return changed == 1
+
+    def ack(self, job: Job) -> bool:
+        """Marchează jobul terminat (doar dacă lease-ul e încă al acestui worker)"""
+        now = time.time()
+        with self._transaction() as conn:
+            return conn.execute("""
+                UPDATE jobs SET state = 'done', lease_owner = NULL, lease_expires = NULL,
+                                last_error = NULL, updated_at = ?
+                WHERE id = ? AND state = 'leased' AND lease_owner = ?
+            """, (now, job.id, job.lease_owner)).rowcount == 1
+
+    def nack(self, job: Job, error: str = '', retry_delay: Optional[float] = None) -> bool:
+        """Eșec: jobul revine în coadă după backoff, sau ajunge 'dead' după max_attempts"""
+        now = time.time()
+        with self._transaction() as conn:
+            if job.attempts >= job.max_attempts:
+                return self._mark_dead(conn, job.id, error, now, owner=job.lease_owner)
+            if retry_delay is None:
+                retry_delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+            return conn.execute("""
+                UPDATE jobs SET state = 'ready', lease_owner = NULL, lease_expires = NULL,
+                                available_at = ?, last_error = ?, updated_at = ?
+                WHERE id = ? AND state = 'leased' AND lease_owner = ?
+            """, (now + retry_delay, error[:1000], now, job.id, job.lease_owner)).rowcount == 1
+
+    def release(self, job: Job) -> bool:
+        """Returnează jobul fără penalizare (ex. oprire gracioasă înainte de a începe lucrul)"""
+        now = time.time()
+        with self._transaction() as conn:
+            return conn.execute("""
+                UPDATE jobs SET state = 'ready', lease_owner = NULL, lease_expires = NULL,
+                                attempts = MAX(0, attempts - 1), updated_at = ?
+                WHERE id = ? AND state = 'leased' AND lease_owner = ?
+            """, (now, job.id, job.lease_owner)).rowcount == 1
+
+    # --- Variante asincrone (tranzacția rulează în executor, event loop-ul rămâne liber) ---
+
+    async def _in_executor(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+
+    async def claim_key_async(self, queue: str, key: str, payload: Any = None, priority: int = 0,
+                              reclaim_done_after: Optional[float] = None) -> Optional[Job]:
+        return await self._in_executor(self.claim_key, queue, key, payload, priority, reclaim_done_after)
+
+    async def ack_async(self, job: Job) -> bool:
+        return await self._in_executor(self.ack, job)
+
+    async def nack_async(self, job: Job, error: str = '', retry_delay: Optional[float] = None) -> bool:
+        return await self._in_executor(self.nack, job, error, retry_delay)
+
+    async def release_async(self, job: Job) -> bool:
+        return await self._in_executor(self.release, job)
+
+    @asynccontextmanager
+    async def processing(self, job: Job, heartbeat_interval: Optional[float] = None, ack: bool = True):
+        """
+        Heartbeat în fundal cât timp rulează blocul; ack la ieșire normală, nack la excepție.
+        Cu ack=False confirmarea rămâne la apelant (ex. după salvarea în batch a rezultatelor).
+        Lease-ul pierdut e doar raportat: rezultatul e idempotent (UNIQUE(video_id)).
+        """
+        interval = heartbeat_interval or self.lease_seconds / 3
+
+        async def beat():
+            while True:
+                await asyncio.sleep(interval)
+                if not await self._in_executor(self.heartbeat, job):
+                    logger.warning(f"Lost lease on job {job.queue}/{job.key}")
+                    return
+
+        task = asyncio.create_task(beat())
+        try:
+            yield job
+        except BaseException as e:
+            task.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                await self.release_async(job)
+            else:
+                await self.nack_async(job, f"{type(e).__name__}: {e}")
+            raise
+        else:
+            task.cancel()
+            if ack:
+                await self.ack_async(job)
+
+    # --- Administrare ---
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        result: Dict[str, Dict[str, int]] = {}
+        for queue, state, count in self.conn.execute(
+                "SELECT queue, state, COUNT(*) FROM jobs GROUP BY queue, state ORDER BY queue, state"):
+            result.setdefault(queue, {})[state] = count
+        return result
+
+    def dead_letters(self, queue: str, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self.conn.execute("""
+            SELECT key, attempts, last_error, updated_at FROM jobs
+            WHERE queue = ? AND state = 'dead' ORDER BY updated_at DESC LIMIT ?
+        """, (queue, limit)).fetchall()
+        return [{'key': k, 'attempts': a, 'last_error': e, 'updated_at': u} for k, a, e, u in rows]
+
+    def requeue_dead(self, queue: str) -> int:
+        now = time.time()
+        with self._transaction() as conn:
+            return conn.execute("""
+                UPDATE jobs SET state = 'ready', attempts = 0, available_at = ?, updated_at = ?
+                WHERE queue = ? AND state = 'dead'
+            """, (now, now, queue)).rowcount
+
+    def close(self):
+        self.conn.close()
+
+    # --- Intern ---
+
+    def _lease(self, conn: sqlite3.Connection, job_id: int, now: float) -> Job:
+        expires = now + self.lease_seconds
+        conn.execute("""
+            UPDATE jobs SET state = 'leased', lease_owner = ?, lease_expires = ?,
+                            attempts = attempts + 1, updated_at = ?
+            WHERE id = ?
+        """, (self.owner, expires, now, job_id))
+        queue, key, payload, priority, attempts, max_attempts = conn.execute(
+            "SELECT queue, key, payload, priority, attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return Job(id=job_id, queue=queue, key=key, payload=json.loads(payload) if payload else None,
+                   priority=priority, attempts=attempts, max_attempts=max_attempts,
+                   lease_owner=self.owner, lease_expires=expires)
+
+    def _expire_leases(self, conn: sqlite3.Connection, queue: str, now: float):
+        """Visibility timeout: lease-urile expirate redevin 'ready' sau, fără încercări rămase, 'dead'"""
+        conn.execute("""
+            UPDATE jobs SET
+                state = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'ready' END,
+                last_error = CASE WHEN attempts >= max_attempts THEN 'lease expired' ELSE last_error END,
+                lease_owner = NULL, lease_expires = NULL, updated_at = ?
+            WHERE queue = ? AND state = 'leased' AND lease_expires < ?
+        """, (now, queue, now))
+
+    @staticmethod
+    def _mark_dead(conn: sqlite3.Connection, job_id: int, error: str, now: float,
+                   owner: Optional[str] = None) -> bool:
+        owner_clause = " AND lease_owner = ?" if owner else ""
+        params = [error[:1000], now, job_id] + ([owner] if owner else [])
+        changed = conn.execute(f"""
+            UPDATE jobs SET state = 'dead', lease_owner = NULL, lease_expires = NULL,
+                            last_error = ?, updated_at = ?
+            WHERE id = ?{owner_clause}
+        """, params).rowcount
+        if changed:
+            logger.warning(f"Job {job_id} moved to dead-letter: {error}")
+        return changed == 1
+
+
+class _ImmediateTransaction:
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+        return False
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Administrarea cozii de joburi')
+    parser.add_argument('command', choices=['stats', 'dead', 'requeue-dead'])
+    parser.add_argument('args', nargs='*')
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        jobs = JobQueue(args.args[0] if args.args else DEFAULT_JOBS_DB)
+        for queue, states in jobs.stats().items():
+            print(f"{queue}: " + ', '.join(f"{state}={count}" for state, count in states.items()))
+        return
+
+    if not args.args:
+        parser.error(f"{args.command} requires a queue name")
+    queue = args.args[0]
+    jobs = JobQueue(args.args[1] if len(args.args) > 1 else DEFAULT_JOBS_DB)
+    if args.command == 'dead':
+        for job in jobs.dead_letters(queue):
+            print(f"{job['key']}  attempts={job['attempts']}  {job['last_error']}")
+    else:
+        print(f"Requeued {jobs.requeue_dead(queue)} dead jobs in {queue}")
+
+
+if __name__ == "__main__":
+    main()
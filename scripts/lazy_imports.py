@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Importuri la prima folosire pentru bibliotecile grele (cv2, yt-dlp, googleapiclient, librosa)
+Modulele care le folosesc doar în anumite etape (thumbnail, descărcare, API YouTube, audio)
+nu mai plătesc importul la pornire: rulările doar cu metadate, comenzile de status și procesul
+părinte al crawler-ului multi-proces pornesc fără ele. preload() încarcă explicit modulele
+etapelor selectate (ex. la pornirea unui worker, înainte de primul video).
+"""
+
+import time
+import logging
+import importlib
+import importlib.util
+import threading
+from typing import Any, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Modulele fiecărei etape a pipeline-ului
+STAGE_MODULES = {
+    'youtube_api': ('googleapiclient.discovery', 'googleapiclient.errors'),
+    'download': ('yt_dlp',),
+    'thumbnail': ('cv2',),
+    'audio': ('librosa', 'librosa.feature', 'librosa.beat'),
+}
+
+# modul -> secunde de import (la prima folosire sau în preload)
+import_times: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def module_available(name: str) -> bool:
+    """True dacă modulul e instalat (fără a-l importa)"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _import(name: str):
+    with _lock:
+        if name in import_times:
+            return importlib.import_module(name)
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        import_times[name] = time.perf_counter() - start
+        logger.debug(f"Imported {name} in {import_times[name]:.2f}s")
+        return module
+
+
+class LazyModule:
+    """Proxy pentru un modul importat la primul acces la un atribut (thread-safe)"""
+
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = _import(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def preload(stages: Iterable[str]) -> Dict[str, float]:
+    """Importă modulele etapelor date; întoarce secundele de import per modul (0 dacă era deja încărcat)"""
+    loaded = {}
+    for stage in stages:
+        for name in STAGE_MODULES.get(stage, ()):
+            if name in loaded:
+                continue
+            already = name in import_times
+            try:
+                _import(name)
+            except ImportError as e:
+                logger.warning(f"Stage '{stage}': {name} unavailable ({e})")
+                continue
+            loaded[name] = 0.0 if already else import_times[name]
+    if loaded:
+        logger.info(f"Preloaded {', '.join(loaded)} in {sum(loaded.values()):.2f}s")
+    return loaded
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Stocare round-robin pentru metricile de sistem, pe mai multe rezoluții
+Fiecare arhivă are un număr fix de sloturi (slot = (timestamp // pas) % sloturi), suprascrise
+în timp constant, deci spațiul pe disc e fix și nu există DELETE-uri de retenție.
+Arhive: raw (pasul de eșantionare), 1 minut, 1 oră, 1 zi - fiecare cu min/avg/max/p95
+(p95 aproximat cu eroare relativă de ~1%, dintr-un sketch de dimensiune fixă per bucket).
+
+Utilizare: python3 scripts/metrics_store.py list [cale_baza_de_date]
+           python3 scripts/metrics_store.py query <metrică> [--hours N] [cale_baza_de_date]
+"""
+
+import math
+import time
+import sqlite3
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from persistence import apply_pragmas
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_DB = '/data/ads/metrics.db'
+
+
+@dataclass(frozen=True)
+class Archive:
+    name: str
+    step: int       # secunde per slot
+    slots: int      # numărul fix de sloturi
+
+    @property
+    def retention(self) -> int:
+        return self.step * self.slots
+
+
+def default_archives(raw_step: int = 30) -> List[Archive]:
+    """raw ~26h (acoperă ziua curentă la recuperare), 1m 7 zile, 1h 90 de zile, 1d 5 ani"""
+    return [
+        Archive('raw', raw_step, math.ceil(26 * 3600 / raw_step)),
+        Archive('1m', 60, 7 * 24 * 60),
+        Archive('1h', 3600, 90 * 24),
+        Archive('1d', 86400, 5 * 366),
+    ]
+
+
+# Sketch-ul p95: bin-uri logaritmice cu eroare relativă ~1%, număr de bin-uri limitat
+SKETCH_ACCURACY = 0.01
+SKETCH_MAX_BINS = 256
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+_MIN_MAGNITUDE = 1e-9   # sub acest modul valorile intră în bin-ul zero
+
+
+def _bin_index(magnitude: float) -> int:
+    return math.ceil(math.log(magnitude) / _LOG_GAMMA)
+
+
+def _bin_value(index: int) -> float:
+    """Valoarea reprezentativă a bin-ului (eroare relativă <= SKETCH_ACCURACY)"""
+    return 2 * _GAMMA ** index / (_GAMMA + 1)
+
+
+class _Bucket:
+    """
+    Agregatele bucket-ului curent al unei arhive, pentru o metrică: count/min/max/sum exacte,
+    p95 dintr-un sketch cu bin-uri logaritmice (tip DDSketch). Costul per eșantion nu depinde
+    de numărul de eșantioane din bucket (important pentru bucket-urile de o oră / o zi).
+    """
+
+    __slots__ = ('start', 'count', 'total', 'low', 'high', 'positive', 'negative', 'zeros')
+
+    def __init__(self, start: int):
+        self.start = start
+        self.count = 0
+        self.total = 0.0
+        self.low = math.inf
+        self.high = -math.inf
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}   # după modul
+        self.zeros = 0
+
+    def add(self, value: float, weight: int = 1):
+        self.count += weight
+        self.total += value * weight
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+        if abs(value) < _MIN_MAGNITUDE:
+            self.zeros += weight
+            return
+        bins = self.positive if value > 0 else self.negative
+        index = _bin_index(abs(value))
+        bins[index] = bins.get(index, 0) + weight
+        if len(bins) > SKETCH_MAX_BINS:
+            # Comasează cele mai mici module: precizia se pierde la capătul de jos, nu la p95
+            lowest = min(bins)
+            weight_lowest = bins.pop(lowest)
+            following = min(bins)
+            bins[following] += weight_lowest
+
+    def quantile(self, q: float) -> float:
+        """Cuantila nearest-rank, limitată la [min, max] (exactă pentru un singur eșantion)"""
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen >= rank:
+                return min(max(-_bin_value(index), self.low), self.high)
+        seen += self.zeros
+        if seen >= rank:
+            return min(max(0.0, self.low), self.high)
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen >= rank:
+                return min(max(_bin_value(index), self.low), self.high)
+        return self.high
+
+    def summary(self) -> Tuple[int, float, float, float, float]:
+        return self.count, self.low, self.total / self.count, self.high, self.quantile(95)
+
+
+class MetricsStore:
+    def __init__(self, db_path: str = DEFAULT_METRICS_DB, raw_step: int = 30,
+                 archives: Optional[List[Archive]] = None):
+        self.db_path = db_path
+        self.archives = archives or default_archives(raw_step)
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        apply_pragmas(self.conn, writer=True)
+        self._init_schema()
+        self._recover()
+
+    def _init_schema(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS metric_archives (
+                name TEXT PRIMARY KEY,
+                step INTEGER NOT NULL,
+                slots INTEGER NOT NULL
+            );
+
+            -- Un rând per (arhivă, metrică, slot); bucket = începutul intervalului (epoch)
+            CREATE TABLE IF NOT EXISTS metric_points (
+                archive TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                samples INTEGER NOT NULL,
+                min REAL,
+                avg REAL,
+                max REAL,
+                p95 REAL,
+                PRIMARY KEY (archive, metric, slot)
+            ) WITHOUT ROWID;
+
+            CREATE INDEX IF NOT EXISTS idx_metric_points_bucket ON metric_points(archive, metric, bucket);
+        """)
+
+        for archive in self.archives:
+            row = self.conn.execute("SELECT step, slots FROM metric_archives WHERE name = ?", (archive.name,)).fetchone()
+            if row and tuple(row) != (archive.step, archive.slots):
+                # Geometria s-a schimbat: sloturile vechi nu mai corespund
+                logger.warning(f"Metric archive {archive.name} changed geometry {tuple(row)}, resetting it")
+                self.conn.execute("DELETE FROM metric_points WHERE archive = ?", (archive.name,))
+            self.conn.execute("INSERT OR REPLACE INTO metric_archives (name, step, slots) VALUES (?, ?, ?)",
+                              (archive.name, archive.step, archive.slots))
+
+    def _recover(self):
+        """După repornire, reface bucket-urile în curs (minut/oră/zi) din arhiva raw"""
+        raw, rollups = self.archives[0], self.archives[1:]
+        now = int(time.time())
+        oldest = min(now - now % archive.step for archive in rollups)
+        rows = self.conn.execute("""
+            SELECT metric, bucket, samples, avg FROM metric_points
+            WHERE archive = ? AND bucket >= ?
+            ORDER BY bucket
+        """, (raw.name, oldest)).fetchall()
+        for metric, bucket, samples, avg in rows:
+            for archive in rollups:
+                start = now - now % archive.step
+                if bucket >= start:
+                    # Eșantioanele individuale nu mai există; media raw ponderată cu numărul lor
+                    self._bucket(archive, metric, start).add(avg, samples)
+
+    def _bucket(self, archive: Archive, metric: str, start: int) -> _Bucket:
+        key = (archive.name, metric)
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.start != start:
+            bucket = _Bucket(start)
+            self._buckets[key] = bucket
+        return bucket
+
+    def record(self, values: Dict[str, float], timestamp: Optional[float] = None):
+        """Adaugă un eșantion; actualizează slotul curent al fiecărei arhive (cost constant)"""
+        ts = int(timestamp if timestamp is not None else time.time())
+        rows = []
+        for metric, value in values.items():
+            if value is None:
+                continue
+            for archive in self.archives:
+                start = ts - ts % archive.step
+                bucket = self._bucket(archive, metric, start)
+                bucket.add(float(value))
+                slot = (start // archive.step) % archive.slots
+                rows.append((archive.name, metric, slot, start, *bucket.summary()))
+
+        self.conn.execute("BEGIN")
+        self.conn.executemany("""
+            INSERT INTO metric_points (archive, metric, slot, bucket, samples, min, avg, max, p95)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(archive, metric, slot) DO UPDATE SET
+                bucket = excluded.bucket,
+                samples = excluded.samples,
+                min = excluded.min,
+                avg = excluded.avg,
+                max = excluded.max,
+                p95 = excluded.p95
+        """, rows)
+        self.conn.execute("COMMIT")
+
+    def choose_archive(self, start: float, end: float, max_points: int = 1000) -> Archive:
+        """Cea mai fină arhivă care încă acoperă începutul intervalului și nu depășește max_points"""
+        now = time.time()
+        for archive in self.archives:
+            covers = now - archive.retention <= start
+            if covers and (end - start) / archive.step <= max_points:
+                return archive
+        return self.archives[-1]
+
+    def query(self, metric: str, start: float, end: Optional[float] = None,
+              max_points: int = 1000) -> Tuple[str, List[Tuple[int, int, float, float, float, float]]]:
+        """
+        Seria metricii în [start, end], la rezoluția aleasă automat.
+        Returnează (arhivă, [(bucket, samples, min, avg, max, p95)]) ordonat după timp.
+        """
+        end = end if end is not None else time.time()
+        archive = self.choose_archive(start, end, max_points)
+        # Sloturile mai vechi decât retenția pot conține date dintr-un ciclu anterior
+        floor = max(start - start % archive.step, int(time.time()) - archive.retention + archive.step)
+        rows = self.conn.execute("""
+            SELECT bucket, samples, min, avg, max, p95 FROM metric_points
+            WHERE archive = ? AND metric = ? AND bucket BETWEEN ? AND ?
+            ORDER BY bucket
+        """, (archive.name, metric, floor, int(end))).fetchall()
+        return archive.name, rows
+
+    def latest(self, metric: str) -> Optional[Tuple[int, float]]:
+        row = self.conn.execute("""
+            SELECT bucket, avg FROM metric_points
+            WHERE archive = ? AND metric = ?
+            ORDER BY bucket DESC LIMIT 1
+        """, (self.archives[0].name, metric)).fetchone()
+        return tuple(row) if row else None
+
+    def metrics(self) -> List[str]:
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT metric FROM metric_points WHERE archive = ? ORDER BY metric", (self.archives[0].name,)
+        )]
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Istoricul metricilor de sistem')
+    parser.add_argument('command', choices=['list', 'query'])
+    parser.add_argument('metric', nargs='?')
+    parser.add_argument('database', nargs='?', default=DEFAULT_METRICS_DB)
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--points', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        # list nu are argument de metrică: primul argument poziționat e baza de date
+        store = MetricsStore(args.metric or args.database)
+        for metric in store.metrics():
+            print(metric)
+        return
+
+    if not args.metric:
+        parser.error("query requires a metric name")
+    store = MetricsStore(args.database)
+    archive, rows = store.query(args.metric, time.time() - args.hours * 3600, max_points=args.points)
+    print(f"{args.metric} @ {archive} ({len(rows)} points)")
+    for bucket, samples, low, avg, high, p95 in rows:
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(bucket))
+        print(f"{stamp}  n={samples:<5} min={low:8.2f} avg={avg:8.2f} max={high:8.2f} p95={p95:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,153 +1,322 @@
 #!/usr/bin/env python3
 """
-Crawler optimizat pentru multiple GPU-uri
+Crawler multi-proces: videoclipurile găsite sunt distribuite dinamic pe N procese worker
+Fiecare worker are un singur event loop și un singur YouTubeCrawler pe toată durata rulării
+și ia următorul video din coada comună când termină (fără împărțire statică pe felii).
+Scrierile sunt trimise înapoi procesului părinte, care le aplică printr-un singur writer SQLite;
+flush() în worker așteaptă confirmarea părintelui după commit, deci jobul e confirmat doar după commit.
+Pe noduri cu GPU, workerii sunt repartizați circular pe GPU-uri (CUDA_VISIBLE_DEVICES).
+Un worker preia videoclipuri doar după încălzire (biblioteci și kernel-uri JIT, jit_warmup.py).
+
+Utilizare: python3 scripts/multi_gpu_crawler.py [--workers N] [--per-worker K] [--max-results M] [query ...]
 """
 
-import torch
-import torch.multiprocessing as mp
-from torch.nn.parallel import DistributedDataParallel
 import os
+import time
+import queue
+import itertools
+import sqlite3
 import asyncio
-from concurrent.futures import ProcessPoolExecutor
 import logging
-from improved_crawler import YouTubeCrawler, Config
+import argparse
+import threading
+import subprocess
+import multiprocessing as mp
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+from improved_crawler import (Config, YouTubeCrawler, build_concurrency_controller, build_youtube_service,
+                              init_database_advanced, load_api_keys, search_videos)
+from persistence import Statement, apply_pragmas, get_persistence
+from partitions import PartitionCatalog
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class MultiGPUCrawler:
-    def __init__(self, config: Config):
+DEFAULT_QUERIES = [
+    "reclamă 2025 OR advertisement 2025 OR ad 2025 OR commercial 2025",
+    "publicitate România 2025",
+    "marketing campaign 2025"
+]
+
+# Câte videoclipuri ia un worker în avans peste cele în lucru (mic, ca restul să rămână în coada comună)
+PREFETCH = 1
+RESULT_POLL_SECONDS = 1.0
+
+
+class ForwardingPersistence:
+    """
+    API-ul PersistenceService în procesul worker: unitățile de scriere sunt trimise prin coadă
+    writer-ului unic din procesul părinte; citirile merg direct în fișier (WAL permite cititori concurenți).
+    Future-urile scrierilor se rezolvă când părintele confirmă un flush (rezultatul sau eroarea commit-ului).
+    """
+
+    def __init__(self, db_path: str, results, acks, worker_id: int):
+        self.db_path = db_path
+        self.results = results
+        self.acks = acks
+        self.worker_id = worker_id
+        self._local = threading.local()
+        self._sequence = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def submit(self, statements: List[Statement], count_changes: bool = False) -> Future:
+        future: Future = Future()
+        with self._lock:
+            seq = next(self._sequence)
+            self._pending[seq] = future
+            self.results.put(('write', self.worker_id, seq, list(statements), count_changes))
+        return future
+
+    def execute(self, sql: str, params: Sequence[Any] = (), count_changes: bool = False) -> Future:
+        return self.submit([(sql, params)], count_changes)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Cere părintelui commit-ul tuturor scrierilor trimise și așteaptă confirmarea;
+        False dacă nu sosește în timeout (ex. procesul părinte a murit)
+        """
+        with self._flush_lock:
+            token = next(self._sequence)
+            self.results.put(('flush', self.worker_id, token))
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                try:
+                    ack_token, outcomes = self.acks.get(timeout=remaining)
+                except queue.Empty:
+                    return False
+                self._resolve(outcomes)
+                if ack_token == token:
+                    return True
+
+    def _resolve(self, outcomes: List[tuple]):
+        with self._lock:
+            futures = [(self._pending.pop(seq, None), result, error) for seq, result, error in outcomes]
+        for future, result, error in futures:
+            if future is None:
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(sqlite3.Error(error))
+
+    @contextmanager
+    def reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, cached_statements=256)
+            apply_pragmas(conn)
+            self._local.conn = conn
+        yield conn
+
+    def fetchone(self, sql: str, params: Sequence[Any] = ()):
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params: Sequence[Any] = ()):
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def close(self):
+        pass
+
+
+def _worker_main(worker_id: int, config, tasks, results, acks, concurrency: int, gpu_id: Optional[int]):
+    """Punctul de intrare al procesului worker (spawn)"""
+    if gpu_id is not None:
+        os.environ['CUDA_VISIBLE_DEVICES'] = str(gpu_id)
+    stats = {'processed': 0, 'failed': 0, 'duplicates': 0}
+    try:
+        stats = asyncio.run(_worker_loop(worker_id, config, tasks, results, acks, concurrency))
+    except Exception as e:
+        logger.error(f"Worker {worker_id} crashed: {e}")
+    finally:
+        results.put(('exit', worker_id, stats))
+
+
+async def _worker_loop(worker_id: int, config, tasks, results, acks, concurrency: int) -> Dict[str, int]:
+    persistence = ForwardingPersistence(config.DATABASE_PATH, results, acks, worker_id)
+    crawler = YouTubeCrawler(config, persistence=persistence)
+    loop = asyncio.get_running_loop()
+    # Worker-ul preia videoclipuri din coada comună doar după încălzire (biblioteci + kernel-uri JIT),
+    # deci primul video are latența regimului staționar
+    warmup = await loop.run_in_executor(None, crawler.warm_up)
+    results.put(('ready', worker_id, warmup['total']))
+    local: asyncio.Queue = asyncio.Queue(maxsize=PREFETCH)
+    logger.info(f"Worker {worker_id} (pid {os.getpid()}) ready, {concurrency} concurrent videos")
+
+    async def feeder():
+        # Coada multiprocessing e blocantă: citirea se face într-un thread, loop-ul rămâne liber
+        while True:
+            item = await loop.run_in_executor(None, tasks.get)
+            if item is None:
+                break
+            await local.put(item)
+        for _ in range(concurrency):
+            await local.put(None)
+
+    async def runner():
+        while True:
+            video_data = await local.get()
+            if video_data is None:
+                return
+            await crawler.process_video_async(video_data)
+            results.put(('done', worker_id, video_data[0]))
+
+    await asyncio.gather(feeder(), *(runner() for _ in range(concurrency)))
+    await crawler.concurrency.stop()
+    # Procesele multiprocessing ies cu os._exit, fără atexit
+    crawler.scratch.close()
+    crawler.metrics.log_progress()
+    return {
+        'processed': crawler.metrics.videos_processed,
+        'failed': crawler.metrics.videos_failed,
+        'duplicates': crawler.metrics.duplicates_skipped,
+        'concurrency': crawler.concurrency.describe(),
+        'warmup_seconds': round(warmup['total'], 2),
+    }
+
+
+class ShardedCrawler:
+    def __init__(self, config: Config, workers: Optional[int] = None, per_worker: Optional[int] = None):
         self.config = config
-        self.gpu_count = torch.cuda.device_count()
-        logger.info(f"🎮 Detectate {self.gpu_count} GPU-uri")
-        
-    def setup_gpu_worker(self, gpu_id, video_batch):
-        """Configurează un worker pentru un GPU specific"""
-        torch.cuda.set_device(gpu_id)
-        device = torch.device(f'cuda:{gpu_id}')
-        
-        logger.info(f"🚀 Worker GPU {gpu_id} procesează {len(video_batch)} videoclipuri")
-        
-        # Creează crawler pentru acest GPU
-        crawler = YouTubeCrawler(self.config)
-        
-        # Procesează batch-ul de videoclipuri
-        results = []
-        for video_data in video_batch:
+        self.workers = workers or os.cpu_count() or 1
+        # Runner-i suficienți pentru limitele maxime; concurența efectivă e ajustată în fiecare worker
+        self.per_worker = per_worker or build_concurrency_controller(config).capacity()
+        self.gpu_count = self._gpu_count()
+        self.persistence = get_persistence(config.DATABASE_PATH)
+        self.partitions = PartitionCatalog(config.DATABASE_PATH, config.PARTITION_DIR)
+        self.stats = {'queued': 0, 'done': 0, 'writes': 0, 'processed': 0, 'failed': 0, 'duplicates': 0}
+        self.warmup: Dict[int, float] = {}  # worker -> secunde de încălzire
+        logger.info(f"🧵 {self.workers} workers x {self.per_worker} concurrent videos, {self.gpu_count} GPUs")
+
+    @staticmethod
+    def _gpu_count() -> int:
+        """GPU-urile NVIDIA vizibile, fără a încărca torch/CUDA în procesul părinte"""
+        try:
+            output = subprocess.run(['nvidia-smi', '-L'], capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            return 0
+        return sum(1 for line in output.splitlines() if line.startswith('GPU '))
+
+    def _is_known(self, video_id: str) -> bool:
+        return bool(self.persistence.fetchone("SELECT 1 FROM ads WHERE video_id = ?", (video_id,))
+                    or self.partitions.find_video(video_id))
+
+    async def crawl(self, queries: List[str], max_results: Optional[int] = None):
+        """Caută pentru toate query-urile și procesează rezultatele pe procesele worker"""
+        max_results = max_results or self.config.MAX_RESULTS
+        ctx = mp.get_context('spawn')  # fără fork: procesul părinte are thread-uri (writer SQLite)
+        tasks = ctx.Queue()
+        results = ctx.Queue()
+        acks = [ctx.Queue() for _ in range(self.workers)]  # confirmările de flush, una per worker
+        processes = [
+            ctx.Process(
+                target=_worker_main,
+                args=(i, self.config, tasks, results, acks[i], self.per_worker,
+                      i % self.gpu_count if self.gpu_count else None),
+                name=f'crawler-worker-{i}',
+                daemon=True,
+            )
+            for i in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+
+        collector = threading.Thread(target=self._collect, args=(results, acks, processes), name='result-collector')
+        collector.start()
+
+        try:
+            # Videoclipurile intră în coadă pe măsură ce sosesc paginile de rezultate
+            youtube = build_youtube_service(load_api_keys())
+            seen = set()
+            for query in queries:
+                logger.info(f"🔍 Searching: {query}")
+                try:
+                    async for video_id, snippet in search_videos(
+                            youtube, query, max_results, self.config.RATE_LIMIT_CALLS_PER_MINUTE):
+                        if video_id in seen or self._is_known(video_id):
+                            continue
+                        seen.add(video_id)
+                        tasks.put((video_id, snippet))
+                        self.stats['queued'] += 1
+                except Exception as e:
+                    logger.error(f"❌ Search failed for query '{query}': {e}")
+        finally:
+            for _ in processes:
+                tasks.put(None)
+            await asyncio.get_running_loop().run_in_executor(None, collector.join)
+            for process in processes:
+                process.join()
+            self.persistence.flush()
+
+        logger.info(f"✅ Done: {self.stats}")
+        return self.stats
+
+    def _collect(self, results, acks, processes):
+        """Aplică scrierile workerilor prin writer-ul unic până când toți workerii au ieșit"""
+        exited = set()
+        pending: Dict[int, List[tuple]] = {}  # worker -> (seq, Future) neconfirmate încă
+        while len(exited) < len(processes):
             try:
-                # Aici ai putea adăuga procesarea specifică GPU
-                result = asyncio.run(crawler.process_video_async(video_data))
-                results.append(result)
-            except Exception as e:
-                logger.error(f"Eroare procesare video pe GPU {gpu_id}: {e}")
-        
-        return results
-    
-    def distribute_videos(self, videos):
-        """Distribuie videoclipurile pe GPU-uri"""
-        if self.gpu_count == 0:
-            logger.warning("Nu sunt GPU-uri disponibile, folosesc CPU")
-            return [videos]
-        
-        batch_size = len(videos) // self.gpu_count
-        batches = []
-        
-        for i in range(self.gpu_count):
-            start_idx = i * batch_size
-            if i == self.gpu_count - 1:  # Ultimul batch ia restul
-                end_idx = len(videos)
-            else:
-                end_idx = (i + 1) * batch_size
-            
-            batch = videos[start_idx:end_idx]
-            if batch:  # Doar dacă batch-ul nu e gol
-                batches.append(batch)
-        
-        return batches
-    
-    async def crawl_with_multiple_gpus(self, query, max_results=None):
-        """Crawling cu multiple GPU-uri"""
-        logger.info(f"🔍 Încep crawling cu {self.gpu_count} GPU-uri pentru: {query}")
-        
-        # Obține lista de videoclipuri
-        crawler = YouTubeCrawler(self.config)
-        
-        # Simulez obținerea videoclipurilor (în realitate ar veni din YouTube API)
-        videos = []  # Aici ar fi lista reală de videoclipuri
-        
-        if not videos:
-            logger.warning("Nu s-au găsit videoclipuri pentru procesare")
-            return
-        
-        # Distribuie videoclipurile pe GPU-uri
-        video_batches = self.distribute_videos(videos)
-        
-        if self.gpu_count > 0:
-            # Procesare paralelă pe multiple GPU-uri
-            with ProcessPoolExecutor(max_workers=self.gpu_count) as executor:
-                futures = []
-                for gpu_id, batch in enumerate(video_batches):
-                    future = executor.submit(self.setup_gpu_worker, gpu_id, batch)
-                    futures.append(future)
-                
-                # Așteaptă rezultatele
-                results = []
-                for future in futures:
-                    try:
-                        result = future.result(timeout=3600)  # 1 oră timeout
-                        results.extend(result)
-                    except Exception as e:
-                        logger.error(f"Eroare în procesarea GPU: {e}")
-        else:
-            # Fallback la CPU
-            logger.info("Folosesc CPU pentru procesare")
-            crawler = YouTubeCrawler(self.config)
-            for video_data in videos:
-                await crawler.process_video_async(video_data)
-
-def optimize_gpu_memory():
-    """Optimizează utilizarea memoriei GPU"""
-    if torch.cuda.is_available():
-        for i in range(torch.cuda.device_count()):
-            torch.cuda.set_device(i)
-            torch.cuda.empty_cache()
-            
-            # Setează memory fraction pentru a evita out-of-memory
-            torch.cuda.set_per_process_memory_fraction(0.8, device=i)
-            
-        logger.info(f"✅ Optimizat memoria pentru {torch.cuda.device_count()} GPU-uri")
-
-async def main():
-    """Funcția principală pentru crawling multi-GPU"""
-    # Optimizează memoria GPU
-    optimize_gpu_memory()
-    
-    # Configurare
+                message = results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                # Un worker omorât (OOM, SIGKILL) nu mai trimite 'exit'
+                if not any(p.is_alive() for i, p in enumerate(processes) if i not in exited):
+                    logger.error(f"Workers {sorted(set(range(len(processes))) - exited)} died without exiting")
+                    break
+                continue
+
+            kind = message[0]
+            if kind == 'write':
+                _, worker_id, seq, statements, count_changes = message
+                pending.setdefault(worker_id, []).append((seq, self.persistence.submit(statements, count_changes)))
+                self.stats['writes'] += 1
+            elif kind == 'flush':
+                # Confirmarea pleacă doar după commit: worker-ul face ack jobului abia atunci
+                _, worker_id, token = message
+                self.persistence.flush()
+                outcomes = []
+                for seq, future in pending.pop(worker_id, []):
+                    error = future.exception(timeout=0)
+                    outcomes.append((seq, None if error else future.result(), str(error) if error else None))
+                acks[worker_id].put((token, outcomes))
+            elif kind == 'ready':
+                _, worker_id, seconds = message
+                self.warmup[worker_id] = seconds
+                logger.info(f"Worker {worker_id} warmed up in {seconds:.1f}s "
+                            f"({len(self.warmup)}/{len(processes)} workers accepting videos)")
+            elif kind == 'done':
+                self.stats['done'] += 1
+                if self.stats['done'] % 50 == 0:
+                    logger.info(f"Progress: {self.stats['done']}/{self.stats['queued']} videos")
+            elif kind == 'exit':
+                _, worker_id, worker_stats = message
+                for key in ('processed', 'failed', 'duplicates'):
+                    self.stats[key] += worker_stats.get(key, 0)
+                exited.add(worker_id)
+                logger.info(f"Worker {worker_id} finished: {worker_stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawler multi-proces pentru reclame YouTube')
+    parser.add_argument('queries', nargs='*', default=DEFAULT_QUERIES)
+    parser.add_argument('--workers', type=int, default=None, help='procese worker (implicit: numărul de nuclee)')
+    parser.add_argument('--per-worker', type=int, default=None,
+                        help='videoclipuri în lucru per worker (implicit: suma limitelor maxime ale etapelor)')
+    parser.add_argument('--max-results', type=int, default=200, help='rezultate per query')
+    args = parser.parse_args()
+
     config = Config()
-    config.MAX_WORKERS = torch.cuda.device_count() * 2  # 2 workers per GPU
-    
-    # Creează crawler multi-GPU
-    multi_crawler = MultiGPUCrawler(config)
-    
-    # Queries pentru căutare
-    queries = [
-        "reclamă 2025 OR advertisement 2025 OR ad 2025 OR commercial 2025",
-        "publicitate România 2025",
-        "marketing campaign 2025"
-    ]
-    
-    # Rulează crawling-ul pentru fiecare query
-    for query in queries:
-        try:
-            await multi_crawler.crawl_with_multiple_gpus(query, max_results=200)
-            logger.info(f"✅ Completat crawling pentru query: {query}")
-        except Exception as e:
-            logger.error(f"❌ Eșuat crawling pentru query '{query}': {e}")
+    init_database_advanced()
+    crawler = ShardedCrawler(config, workers=args.workers, per_worker=args.per_worker)
+    asyncio.run(crawler.crawl(args.queries, max_results=args.max_results))
+
 
 if __name__ == "__main__":
-    # Setează variabile de mediu pentru PyTorch
-    os.environ['CUDA_LAUNCH_BLOCKING'] = '1'
-    os.environ['TORCH_USE_CUDA_DSA'] = '1'
-    
-    # Rulează crawling-ul
-    asyncio.run(main())
+    main()
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Partiții lunare pentru reclame și caracteristici
+Fișierul principal (hot) primește toate scrierile; lunile încheiate sunt mutate în fișiere
+<sursă>_AAAA_LL.db, compactate și marcate read-only. Catalogul știe ce partiții acoperă
+un interval de date, le atașează (ATTACH) și reunește interogările peste ele.
+
+Utilizare: python3 scripts/partitions.py archive [cale_baza_de_date] [--before AAAA-LL] [--vacuum]
+           python3 scripts/partitions.py list [cale_baza_de_date]
+           python3 scripts/partitions.py compact [cale_baza_de_date]
+           python3 scripts/partitions.py refresh [cale_baza_de_date]
+"""
+
+import os
+import stat
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+from persistence import apply_pragmas
+from text_search import install_text_search
+
+logger = logging.getLogger(__name__)
+
+# Tabelele partiționate: coloana de timp a scrierii (candidați, ca în aggregates.py)
+SOURCES = {
+    'ads': ['created_at', 'processed_at', 'timestamp'],
+    'real_ads': ['created_at'],
+}
+
+# SQLite permite implicit 10 baze atașate; una rămâne liberă pentru catalog/temp
+MAX_ATTACHED = 9
+
+CATALOG_FILE = 'catalog.db'
+
+
+def default_partition_dir(hot_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(hot_path)), 'partitions')
+
+
+def partition_name(source: str, month: str) -> str:
+    return f"{source}_{month.replace('-', '_')}"
+
+
+def _table_exists(conn: sqlite3.Connection, name: str, schema: str = 'main') -> bool:
+    return conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def _columns(conn: sqlite3.Connection, table: str, schema: str = 'main') -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _created_expr(conn: sqlite3.Connection, source: str) -> Optional[str]:
+    existing = set(_columns(conn, source))
+    present = [c for c in SOURCES[source] if c in existing]
+    if not present:
+        return None
+    return present[0] if len(present) == 1 else f"COALESCE({', '.join(present)})"
+
+
+def _child_tables(conn: sqlite3.Connection, source: str) -> List[str]:
+    """Tabelele cu rânduri per reclamă (coloana ad_id) - se mută odată cu reclama"""
+    if source != 'ads':
+        return []
+    children = []
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"):
+        if name.startswith(('agg_', 'sqlite_')) or name.endswith('_fts') or '_fts_' in name:
+            continue
+        if 'ad_id' in _columns(conn, name):
+            children.append(name)
+    return children
+
+
+def _set_writable(path: str, writable: bool):
+    mode = os.stat(path).st_mode
+    if writable:
+        os.chmod(path, mode | stat.S_IWUSR)
+    else:
+        os.chmod(path, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+class PartitionCatalog:
+    """Catalogul partițiilor unei baze de date hot"""
+
+    def __init__(self, hot_path: str, partition_dir: Optional[str] = None):
+        self.hot_path = hot_path
+        self.partition_dir = partition_dir or default_partition_dir(hot_path)
+        self.catalog_path = os.path.join(self.partition_dir, CATALOG_FILE)
+        os.makedirs(self.partition_dir, exist_ok=True)
+        self._init_catalog()
+
+    def _catalog(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.catalog_path)
+        apply_pragmas(conn)
+        return conn
+
+    def _init_catalog(self):
+        with self._catalog() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS partitions (
+                    name TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    month TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    row_count INTEGER DEFAULT 0,
+                    first_id INTEGER,
+                    last_id INTEGER,
+                    min_created TEXT,
+                    max_created TEXT,
+                    min_published TEXT,
+                    max_published TEXT,
+                    size_bytes INTEGER DEFAULT 0,
+                    sealed_at DATETIME
+                );
+                CREATE INDEX IF NOT EXISTS idx_partitions_source_month ON partitions(source, month);
+
+                -- Reclamele arhivate, pentru verificarea duplicatelor fără a deschide partițiile
+                CREATE TABLE IF NOT EXISTS archived_videos (
+                    video_id TEXT PRIMARY KEY,
+                    partition TEXT NOT NULL
+                );
+            """)
+
+    # --- Catalog ---
+
+    def partitions(self, source: str = 'ads', start: Optional[str] = None, end: Optional[str] = None,
+                   by: str = 'created') -> List[Dict[str, Any]]:
+        """
+        Partițiile sursei care se suprapun cu [start, end] (date ISO, capete opționale).
+        by='created' - data scrierii (cheia de partiționare); by='published' - data publicării.
+        """
+        if by not in ('created', 'published'):
+            raise ValueError(f"Unknown partition range column: {by}")
+        sql = "SELECT * FROM partitions WHERE source = ?"
+        params: List[Any] = [source]
+        if start:
+            sql += f" AND max_{by} >= ?"
+            params.append(start)
+        if end:
+            sql += f" AND min_{by} <= ?"
+            params.append(end)
+        sql += " ORDER BY month"
+
+        with self._catalog() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def find_video(self, video_id: str) -> Optional[str]:
+        """Numele partiției care conține video-ul, sau None"""
+        with self._catalog() as conn:
+            row = conn.execute("SELECT partition FROM archived_videos WHERE video_id = ?", (video_id,)).fetchone()
+        return row[0] if row else None
+
+    def register(self, path: str, source: str, month: str):
+        """(Re)calculează intrarea din catalog pe baza conținutului fișierului de partiție"""
+        name = partition_name(source, month)
+        with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as part:
+            created = _created_expr(part, source) or 'NULL'
+            published = 'published_at' if 'published_at' in _columns(part, source) else 'NULL'
+            row = part.execute(f"""
+                SELECT COUNT(*), MIN(id), MAX(id), MIN({created}), MAX({created}),
+                       MIN({published}), MAX({published})
+                FROM {source}
+            """).fetchone()
+            video_ids = [(video_id, name) for (video_id,) in part.execute(f"SELECT video_id FROM {source}")]
+
+        with self._catalog() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO partitions (name, source, month, path, row_count, first_id, last_id,
+                                                   min_created, max_created, min_published, max_published,
+                                                   size_bytes, sealed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (name, source, month, path, *row, os.path.getsize(path)))
+            conn.execute("DELETE FROM archived_videos WHERE partition = ?", (name,))
+            conn.executemany("INSERT OR REPLACE INTO archived_videos (video_id, partition) VALUES (?, ?)", video_ids)
+
+    def refresh(self):
+        """Reconstruiește catalogul din fișierele existente (ex. după o arhivare întreruptă)"""
+        for filename in sorted(os.listdir(self.partition_dir)):
+            if filename == CATALOG_FILE or not filename.endswith('.db'):
+                continue
+            stem = filename[:-3]
+            for source in SOURCES:
+                suffix = stem[len(source) + 1:]
+                if stem.startswith(source + '_') and len(suffix) == 7 and suffix[:4].isdigit():
+                    self.register(os.path.join(self.partition_dir, filename), source, suffix.replace('_', '-'))
+
+    # --- Interogări peste partiții ---
+
+    @contextmanager
+    def attach(self, partitions: Sequence[Dict[str, Any]], include_hot: bool = True):
+        """Conexiune la baza hot cu partițiile date atașate read-only; produce (conn, scheme)"""
+        if len(partitions) > MAX_ATTACHED:
+            raise ValueError(f"Cannot attach more than {MAX_ATTACHED} partitions at once")
+        conn = sqlite3.connect(f"file:{os.path.abspath(self.hot_path)}", uri=True)
+        apply_pragmas(conn)
+        try:
+            schemas = ['main'] if include_hot else []
+            for partition in partitions:
+                schema = f"p_{partition['month'].replace('-', '_')}"
+                conn.execute("ATTACH DATABASE ? AS " + schema, (f"file:{partition['path']}?mode=ro",))
+                schemas.append(schema)
+            yield conn, schemas
+        finally:
+            conn.close()
+
+    def query(self, sql: str, params: Sequence[Any] = (), source: str = 'ads',
+              start: Optional[str] = None, end: Optional[str] = None, by: str = 'created',
+              order_by: Optional[str] = None, limit: Optional[int] = None) -> List[tuple]:
+        """
+        Rulează `sql` pe baza hot și pe fiecare partiție din interval, reunite cu UNION ALL.
+        `sql` folosește {schema} pentru tabele (ex. "SELECT id, title FROM {schema}.ads WHERE ...");
+        parametrii se repetă pentru fiecare partiție. order_by/limit se aplică rezultatului reunit
+        și folosesc numele coloanelor din rezultat.
+        """
+        parts = self.partitions(source, start, end, by)
+        chunks = [parts[i:i + MAX_ATTACHED] for i in range(0, len(parts), MAX_ATTACHED)] or [[]]
+
+        tail = ""
+        if order_by:
+            tail += f" ORDER BY {order_by}"
+        if limit is not None:
+            tail += f" LIMIT {int(limit)}"
+
+        rows: List[tuple] = []
+        columns: List[str] = []
+        for i, chunk in enumerate(chunks):
+            with self.attach(chunk, include_hot=(i == 0)) as (conn, schemas):
+                union = " UNION ALL ".join(sql.format(schema=schema) for schema in schemas)
+                cursor = conn.execute(f"SELECT * FROM ({union}){tail}", list(params) * len(schemas))
+                rows.extend(cursor.fetchall())
+                columns = [d[0] for d in cursor.description]
+
+        if len(chunks) > 1 and tail:
+            rows = self._merge(columns, rows, tail)
+        return rows
+
+    @staticmethod
+    def _merge(columns: List[str], rows: List[tuple], tail: str) -> List[tuple]:
+        """Aplică ORDER BY/LIMIT peste rezultatele mai multor grupuri de partiții"""
+        with sqlite3.connect(':memory:') as conn:
+            column_list = ', '.join(f'"{c}"' for c in columns)
+            conn.execute(f"CREATE TABLE r ({column_list})")
+            conn.executemany(f"INSERT INTO r VALUES ({', '.join('?' * len(columns))})", rows)
+            return conn.execute(f"SELECT * FROM r{tail}").fetchall()
+
+    # --- Arhivare ---
+
+    def archive_month(self, source: str, month: str) -> int:
+        """
+        Mută reclamele scrise în luna dată (AAAA-LL) și rândurile lor din tabelele copil în
+        partiția lunii, apoi o sigilează. Returnează numărul de reclame mutate.
+        """
+        path = os.path.join(self.partition_dir, f"{partition_name(source, month)}.db")
+        if os.path.exists(path):
+            _set_writable(path, True)
+
+        conn = sqlite3.connect(self.hot_path, isolation_level=None)
+        apply_pragmas(conn, writer=True)
+        try:
+            created = _created_expr(conn, source)
+            if created is None:
+                logger.warning(f"Table {source} has no write timestamp column, cannot partition")
+                return 0
+
+            children = _child_tables(conn, source)
+            self._copy_schema(conn, path, [source] + children)
+            conn.execute("ATTACH DATABASE ? AS part", (path,))
+
+            conn.execute("BEGIN IMMEDIATE")
+            # Rândul cu id-ul maxim rămâne în fișierul hot: fără AUTOINCREMENT, SQLite alocă
+            # max(rowid) + 1 și id-urile nu trebuie să se repete între partiții
+            conn.execute("DROP TABLE IF EXISTS temp.archive_ids")
+            conn.execute(f"""
+                CREATE TEMP TABLE archive_ids AS
+                SELECT id FROM main.{source}
+                WHERE strftime('%Y-%m', {created}) = ?
+                  AND id < (SELECT MAX(id) FROM main.{source})
+            """, (month,))
+            moved = conn.execute("SELECT COUNT(*) FROM temp.archive_ids").fetchone()[0]
+            if moved == 0:
+                conn.execute("ROLLBACK")
+                return 0
+
+            for table in [source] + children:
+                key = 'id' if table == source else 'ad_id'
+                columns = [c for c in _columns(conn, table, 'part') if c in set(_columns(conn, table))]
+                column_list = ', '.join(columns)
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO part.{table} ({column_list})
+                    SELECT {column_list} FROM main.{table}
+                    WHERE {key} IN (SELECT id FROM temp.archive_ids)
+                """)
+
+            # Tabelele agregate (aggregates.py) rămân totaluri pe toată istoria
+            saved = self._snapshot_aggregates(conn, source)
+            for table in children + [source]:
+                key = 'id' if table == source else 'ad_id'
+                conn.execute(f"DELETE FROM main.{table} WHERE {key} IN (SELECT id FROM temp.archive_ids)")
+            self._restore_aggregates(conn, saved)
+
+            conn.execute("COMMIT")
+            conn.execute("DETACH DATABASE part")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        self.seal(path, source)
+        self.register(path, source, month)
+        logger.info(f"Archived {moved} rows from {source} into {os.path.basename(path)}")
+        return moved
+
+    def archive_before(self, month: Optional[str] = None, vacuum: bool = False) -> int:
+        """Arhivează toate lunile încheiate (implicit: toate lunile dinaintea celei curente)"""
+        month = month or datetime.now().strftime('%Y-%m')
+        total = 0
+        with sqlite3.connect(self.hot_path) as conn:
+            pending = []
+            for source in SOURCES:
+                if not _table_exists(conn, source):
+                    continue
+                created = _created_expr(conn, source)
+                if created is None:
+                    continue
+                for (m,) in conn.execute(f"""
+                    SELECT DISTINCT strftime('%Y-%m', {created}) AS m FROM {source}
+                    WHERE m IS NOT NULL AND m < ? ORDER BY m
+                """, (month,)):
+                    pending.append((source, m))
+
+        for source, m in pending:
+            total += self.archive_month(source, m)
+
+        if vacuum and total:
+            with sqlite3.connect(self.hot_path) as conn:
+                conn.execute("VACUUM")
+        return total
+
+    def seal(self, path: str, source: str):
+        """Index full-text, statistici, compactare și marcare read-only"""
+        _set_writable(path, True)
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA journal_mode = DELETE")  # fișier unic, fără -wal/-shm
+            if _table_exists(conn, source):
+                install_text_search(conn, source)
+            conn.execute("ANALYZE")
+        with sqlite3.connect(path) as conn:
+            conn.execute("VACUUM")
+        _set_writable(path, False)
+
+    def compact(self):
+        """Re-sigilează toate partițiile (după schimbări de schemă sau index)"""
+        for partition in self.all_partitions():
+            self.seal(partition['path'], partition['source'])
+            self.register(partition['path'], partition['source'], partition['month'])
+
+    def all_partitions(self) -> List[Dict[str, Any]]:
+        with self._catalog() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute("SELECT * FROM partitions ORDER BY source, month")]
+
+    @staticmethod
+    def _copy_schema(conn: sqlite3.Connection, path: str, tables: List[str]):
+        """Creează în partiție tabelele (și indexurile lor) cu aceeași schemă ca în fișierul hot"""
+        with sqlite3.connect(path) as part:
+            for table in tables:
+                if _table_exists(part, table):
+                    continue
+                for (sql,) in conn.execute("""
+                    SELECT sql FROM main.sqlite_master
+                    WHERE tbl_name = ? AND type IN ('table', 'index') AND sql IS NOT NULL
+                    ORDER BY type DESC
+                """, (table,)).fetchall():
+                    part.execute(sql)
+
+    @staticmethod
+    def _snapshot_aggregates(conn: sqlite3.Connection, source: str) -> List[str]:
+        tables = [name for (name,) in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")
+                  if name.startswith(f"agg_{source}_")]
+        for table in tables:
+            conn.execute(f"DROP TABLE IF EXISTS temp.keep_{table}")
+            conn.execute(f"CREATE TEMP TABLE keep_{table} AS SELECT * FROM main.{table}")
+        return tables
+
+    @staticmethod
+    def _restore_aggregates(conn: sqlite3.Connection, tables: List[str]):
+        for table in tables:
+            conn.execute(f"DELETE FROM main.{table}")
+            conn.execute(f"INSERT INTO main.{table} SELECT * FROM temp.keep_{table}")
+            conn.execute(f"DROP TABLE temp.keep_{table}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Partiții lunare pentru baza de date a reclamelor')
+    parser.add_argument('command', choices=['archive', 'list', 'compact', 'refresh'])
+    parser.add_argument('database', nargs='?', default='/data/ads/ads_database.db')
+    parser.add_argument('--partition-dir', default=None)
+    parser.add_argument('--before', default=None, help='arhivează lunile anterioare (AAAA-LL), implicit luna curentă')
+    parser.add_argument('--vacuum', action='store_true', help='VACUUM pe fișierul hot după arhivare')
+    args = parser.parse_args()
+
+    catalog = PartitionCatalog(args.database, args.partition_dir)
+    if args.command == 'archive':
+        moved = catalog.archive_before(args.before, args.vacuum)
+        print(f"Archived {moved} rows")
+    elif args.command == 'compact':
+        catalog.compact()
+    elif args.command == 'refresh':
+        catalog.refresh()
+
+    if args.command in ('list', 'refresh'):
+        for partition in catalog.all_partitions():
+            print(f"{partition['name']:24} {partition['row_count']:>10} rows "
+                  f"{partition['size_bytes'] / 1024 / 1024:8.1f} MB  "
+                  f"{partition['min_created']} .. {partition['max_created']}")
+
+
+if __name__ == "__main__":
+    main()
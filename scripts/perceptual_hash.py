@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Hash-uri perceptuale (pHash/dHash) pe 64 biți pentru thumbnail-uri
+și index multi-index hashing pentru căutarea near-duplicate după distanța Hamming
+"""
+
+import sqlite3
+import logging
+from collections import defaultdict
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import('cv2')
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+_SIGN_BIT = 1 << 63
+
+
+def dhash(img: np.ndarray) -> int:
+    """Difference hash: compară pixelii adiacenți pe o imagine 9x8 în tonuri de gri"""
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return _bits_to_int(bits)
+
+
+def phash(img: np.ndarray) -> int:
+    """Perceptual hash: DCT pe 32x32, coeficienții 8x8 de frecvență joasă comparați cu mediana"""
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].ravel()
+    median = np.median(low[1:])  # fără componenta DC
+    return _bits_to_int(low > median)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def to_signed(value: int) -> int:
+    """Conversie pentru stocare în coloane SQLite INTEGER (64 biți cu semn)"""
+    return value - (1 << 64) if value & _SIGN_BIT else value
+
+
+def from_signed(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class ThumbnailHashIndex:
+    """
+    Multi-index hashing: hash-ul de 64 biți e împărțit în 4 segmente de 16 biți.
+    Două hash-uri la distanță <= d au cel puțin un segment la distanță <= d // 4
+    (principiul cutiei), deci se caută doar în bucket-urile vecine ale fiecărui segment.
+    """
+
+    SEGMENTS = 4
+    SEGMENT_BITS = HASH_BITS // SEGMENTS
+
+    def __init__(self):
+        self._tables: List[Dict[int, List[int]]] = [defaultdict(list) for _ in range(self.SEGMENTS)]
+        self._hashes: List[int] = []
+        self._secondary: List[Optional[int]] = []
+        self._video_ids: List[str] = []
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _segments(self, value: int) -> List[int]:
+        mask = (1 << self.SEGMENT_BITS) - 1
+        return [(value >> (i * self.SEGMENT_BITS)) & mask for i in range(self.SEGMENTS)]
+
+    def _neighbours(self, segment: int, radius: int):
+        """Toate valorile de segment la distanță Hamming <= radius"""
+        yield segment
+        for r in range(1, radius + 1):
+            for positions in combinations(range(self.SEGMENT_BITS), r):
+                flipped = segment
+                for pos in positions:
+                    flipped ^= 1 << pos
+                yield flipped
+
+    def add(self, video_id: str, primary: int, secondary: Optional[int] = None):
+        slot = len(self._hashes)
+        self._hashes.append(primary)
+        self._secondary.append(secondary)
+        self._video_ids.append(video_id)
+        for table, segment in zip(self._tables, self._segments(primary)):
+            table[segment].append(slot)
+
+    def _query_slots(self, primary: int, max_distance: int) -> List[Tuple[int, int]]:
+        radius = max_distance // self.SEGMENTS
+        seen = set()
+        matches = []
+        for table, segment in zip(self._tables, self._segments(primary)):
+            for candidate in self._neighbours(segment, radius):
+                for slot in table.get(candidate, ()):
+                    if slot in seen:
+                        continue
+                    seen.add(slot)
+                    distance = hamming(primary, self._hashes[slot])
+                    if distance <= max_distance:
+                        matches.append((slot, distance))
+        matches.sort(key=lambda m: m[1])
+        return matches
+
+    def query(self, primary: int, max_distance: int) -> List[Tuple[str, int]]:
+        """Returnează [(video_id, distanță)] pentru toate hash-urile la distanță <= max_distance"""
+        return [(self._video_ids[slot], distance) for slot, distance in self._query_slots(primary, max_distance)]
+
+    def find_duplicate(self, video_id: str, primary: int, secondary: Optional[int],
+                       max_distance: int) -> Optional[str]:
+        """Primul near-duplicate confirmat și de hash-ul secundar (dacă există), exclusiv video-ul curent"""
+        for slot, _ in self._query_slots(primary, max_distance):
+            if self._video_ids[slot] == video_id:
+                continue
+            other = self._secondary[slot]
+            if secondary is None or other is None or hamming(secondary, other) <= max_distance:
+                return self._video_ids[slot]
+        return None
+
+    def load_from_database(self, db_path: str):
+        """Încarcă hash-urile existente din visual_features"""
+        try:
+            with sqlite3.connect(db_path) as conn:
+                rows = conn.execute("""
+                    SELECT a.video_id, vf.phash, vf.dhash
+                    FROM visual_features vf
+                    JOIN ads a ON a.id = vf.ad_id
+                    WHERE vf.phash IS NOT NULL
+                """)
+                for video_id, p, d in rows:
+                    self.add(video_id, from_signed(p), from_signed(d) if d is not None else None)
+            logger.info(f"Loaded {len(self)} thumbnail hashes into duplicate index")
+        except sqlite3.Error as e:
+            logger.warning(f"Could not load thumbnail hashes: {e}")
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Serviciu de persistență SQLite cu un singur writer per proces
+WAL + pragmas, coadă de scrieri grupate în tranzacții (flush după dimensiune sau timp); ordinea
+trimiterii se păstrează, instrucțiunile consecutive cu același SQL devin un executemany
+"""
+
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+Statement = Tuple[str, Sequence[Any]]
+
+BATCH_SIZE = 500        # numărul maxim de unități de scriere per tranzacție
+FLUSH_INTERVAL = 0.5    # secunde până la flush pentru un batch incomplet
+
+
+def apply_pragmas(conn: sqlite3.Connection, writer: bool = False):
+    """Pragmas comune pentru conexiunile la baza de date a reclamelor"""
+    conn.execute("PRAGMA busy_timeout = 5000")
+    conn.execute("PRAGMA cache_size = -65536")       # 64 MB
+    conn.execute("PRAGMA mmap_size = 268435456")     # 256 MB
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if writer:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        # INSERT OR REPLACE trebuie să declanșeze triggerele de ștergere (tabelele agregate)
+        conn.execute("PRAGMA recursive_triggers = ON")
+
+
+class _Flush:
+    """Marcaj în coadă: writer-ul face flush și semnalează evenimentul"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.aborted = False    # serviciul s-a închis înainte ca marcajul să fie procesat
+
+
+class PersistenceService:
+    def __init__(self, db_path: str, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {'units_written': 0, 'units_failed': 0, 'transactions': 0}
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._local = threading.local()
+        self._commit_listeners: List[Callable[[int], None]] = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer_loop, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    # --- API public ---
+
+    def submit(self, statements: List[Statement], count_changes: bool = False) -> Future:
+        """
+        Pune în coadă o unitate de scriere (listă de instrucțiuni aplicate împreună).
+        Future-ul se rezolvă după commit cu True (cu count_changes, cu numărul de rânduri
+        modificate de unitate, ex. 0 pentru un INSERT OR IGNORE ignorat), sau cu excepția
+        dacă unitatea a eșuat.
+        """
+        future: Future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("Persistence service is closed"))
+            return future
+        self._queue.put((list(statements), future, count_changes))
+        return future
+
+    def execute(self, sql: str, params: Sequence[Any] = (), count_changes: bool = False) -> Future:
+        return self.submit([(sql, params)], count_changes)
+
+    def add_commit_listener(self, callback: Callable[[int], None]):
+        """
+        callback(număr_unități) e apelat din thread-ul writer după fiecare commit reușit;
+        trebuie să fie rapid (ex. să semnaleze un Event), altfel întârzie scrierile
+        """
+        self._commit_listeners.append(callback)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blochează până când toate scrierile trimise anterior sunt commit-ate (sau au eșuat, caz în
+        care Future-urile lor poartă excepția). RuntimeError dacă serviciul e închis.
+        """
+        if self._closed or not self._thread.is_alive():
+            raise RuntimeError("Persistence service is closed")
+        marker = _Flush()
+        self._queue.put(marker)
+        done = marker.done.wait(timeout)
+        if marker.aborted:
+            raise RuntimeError("Persistence service closed during flush")
+        return done
+
+    @contextmanager
+    def reader(self):
+        """Conexiune de citire per thread (WAL permite citiri concurente cu writer-ul)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, cached_statements=256)
+            apply_pragmas(conn)
+            self._local.conn = conn
+        yield conn
+
+    def fetchone(self, sql: str, params: Sequence[Any] = ()):
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params: Sequence[Any] = ()):
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    # --- Writer ---
+
+    def _writer_loop(self):
+        conn = sqlite3.connect(self.db_path, cached_statements=256, isolation_level=None)
+        apply_pragmas(conn, writer=True)
+
+        batch = []
+        deadline = None
+
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # expirare timp -> flush
+
+            if item is None or item is False or isinstance(item, _Flush):
+                if batch:
+                    self._commit(conn, batch)
+                batch, deadline = [], None
+                if isinstance(item, _Flush):
+                    item.done.set()
+                if item is None:
+                    break
+                continue
+
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+
+            if len(batch) >= self.batch_size:
+                self._commit(conn, batch)
+                batch, deadline = [], None
+
+        conn.close()
+        self._drain_closed()
+
+    def _drain_closed(self):
+        """Elementele puse în coadă în paralel cu close(): Future-urile eșuează, flush-urile se deblochează"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, _Flush):
+                item.aborted = True
+                item.done.set()
+            elif item:
+                _, future, _ = item
+                if not future.done():
+                    future.set_exception(RuntimeError("Persistence service is closed"))
+
+    def _commit(self, conn: sqlite3.Connection, batch):
+        """Thread-ul writer nu trebuie să moară: orice eroare neprevăzută eșuează Future-urile rămase"""
+        try:
+            self._commit_batch(conn, batch)
+        except Exception as e:
+            logger.exception(f"Unexpected error committing {len(batch)} writes")
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    @staticmethod
+    def _runs(batch) -> List[Tuple[str, List[Sequence[Any]], Optional[int]]]:
+        """
+        Instrucțiunile batch-ului în ordinea trimiterii; doar secvențele consecutive cu același SQL
+        devin un executemany. Nu se regrupează peste alte instrucțiuni: DELETE/INSERT/DELETE sau
+        UPDATE urmat de INSERT pe aceeași cheie dau același rezultat ca unitate cu unitate.
+        Unitățile cu count_changes au secvențe proprii (indexul unității), ca rowcount să le aparțină.
+        """
+        runs: List[Tuple[str, List[Sequence[Any]], Optional[int]]] = []
+        for index, (statements, _, count_changes) in enumerate(batch):
+            owner = index if count_changes else None
+            for sql, params in statements:
+                if owner is None and runs and runs[-1][0] == sql and runs[-1][2] is None:
+                    runs[-1][1].append(params)
+                else:
+                    runs.append((sql, [params], owner))
+        return runs
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            changes: Dict[int, int] = {}
+            for sql, rows, owner in self._runs(batch):
+                cursor = conn.executemany(sql, rows)
+                if owner is not None:
+                    changes[owner] = changes.get(owner, 0) + max(cursor.rowcount, 0)
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Nu doar sqlite3.Error: ex. OverflowError la legarea unui int prea mare
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.warning(f"Batch of {len(batch)} writes failed ({e}), retrying unit by unit")
+            for item in batch:
+                self._commit_unit(conn, item)
+            return
+        self.stats['transactions'] += 1
+        self.stats['units_written'] += len(batch)
+        for index, (_, future, count_changes) in enumerate(batch):
+            future.set_result(changes.get(index, 0) if count_changes else True)
+        self._notify_commit(len(batch))
+
+    def _notify_commit(self, units: int):
+        for callback in self._commit_listeners:
+            try:
+                callback(units)
+            except Exception as e:
+                logger.warning(f"Commit listener failed: {e}")
+
+    def _commit_unit(self, conn: sqlite3.Connection, item):
+        statements, future, count_changes = item
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            changes = 0
+            for sql, params in statements:
+                changes += max(conn.execute(sql, params).rowcount, 0)
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self.stats['units_failed'] += 1
+            logger.error(f"Database write failed: {e}")
+            future.set_exception(e)
+            return
+        self.stats['transactions'] += 1
+        self.stats['units_written'] += 1
+        future.set_result(changes if count_changes else True)
+        self._notify_commit(1)
+
+
+_services: Dict[Tuple[int, str], PersistenceService] = {}
+_services_lock = threading.Lock()
+
+
+def get_persistence(db_path: str) -> PersistenceService:
+    """Serviciul de persistență al procesului pentru baza de date dată"""
+    # Cheia include PID-ul: după fork, procesul copil are nevoie de propriul writer
+    key = (os.getpid(), db_path)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = PersistenceService(db_path)
+            _services[key] = service
+        return service
+
+
+@atexit.register
+def _close_all():
+    for (pid, _), service in list(_services.items()):
+        if pid == os.getpid():
+            service.close()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Planificator cu priorități pentru etapele costisitoare (statistici, descărcare, analiză audio)
+Prioritatea combină încrederea detecției, prospețimea (publicare recentă) și istoricul canalului.
+Aging: fiecare oră de așteptare adaugă AGING_PER_HOUR, deci nimic nu așteaptă la nesfârșit.
+Fiecare ciclu are bugete opționale (CPU, octeți descărcați, număr de elemente); ce nu încape
+rămâne pentru ciclul următor, iar sub încărcare elementele cu prioritate mică sunt abandonate.
+"""
+
+import math
+import time
+import heapq
+import sqlite3
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ponderile componentelor (suma 1); fără încredere cunoscută se renormalizează restul
+WEIGHT_CONFIDENCE = 0.6
+WEIGHT_FRESHNESS = 0.25
+WEIGHT_CHANNEL = 0.15
+
+FRESHNESS_HALF_LIFE_DAYS = 7.0
+AGING_PER_HOUR = 0.1        # un element amânat ~4 ore urcă peste unul proaspăt cu încredere maximă
+CHANNEL_PRIOR = 0.5         # încrederea presupusă pentru canale fără istoric
+CHANNEL_PRIOR_WEIGHT = 2    # câte reclame "virtuale" trag scorul canalului spre prior
+CHANNEL_VOLUME_SATURATION = 50
+
+SHED_BELOW = 0.3            # sub încărcare, elementele sub acest prag sunt abandonate
+MAX_BACKLOG = 5000
+
+
+@dataclass(order=True)
+class _Entry:
+    sort_key: float
+    seq: int
+    key: str = field(compare=False)
+    item: Any = field(compare=False)
+    priority: float = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+@dataclass
+class CycleBudget:
+    """Limitele unui ciclu; None = nelimitat"""
+    cpu_seconds: Optional[float] = None
+    download_bytes: Optional[int] = None
+    items: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, cpu_seconds: float = 0, download_mb: float = 0, items: int = 0) -> 'CycleBudget':
+        """Valorile 0 din Config înseamnă nelimitat"""
+        return cls(cpu_seconds=cpu_seconds or None,
+                   download_bytes=int(download_mb * 1024 * 1024) or None,
+                   items=items or None)
+
+
+def freshness(published_at: Optional[str], now: Optional[float] = None) -> float:
+    """1.0 pentru un video publicat acum, 0.5 după FRESHNESS_HALF_LIFE_DAYS; 0.5 dacă data lipsește"""
+    if not published_at:
+        return 0.5
+    try:
+        published = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
+    except ValueError:
+        return 0.5
+    if published.tzinfo is None:
+        published = published.replace(tzinfo=timezone.utc)
+    age_days = max(0.0, ((now or time.time()) - published.timestamp()) / 86400)
+    return 0.5 ** (age_days / FRESHNESS_HALF_LIFE_DAYS)
+
+
+def load_channel_history(conn: sqlite3.Connection, source: str = 'ads') -> Dict[str, Tuple[int, float]]:
+    """canal -> (reclame salvate, suma încrederii); din tabela agregată dacă există"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    try:
+        if f"agg_{source}_channel" in tables:
+            rows = conn.execute(f"SELECT group_key, n, sum_confidence FROM agg_{source}_channel WHERE n > 0")
+        else:
+            channel = 'channel_title' if source == 'real_ads' else 'channel'
+            confidence = 'ad_confidence' if source == 'real_ads' else 'confidence_score'
+            rows = conn.execute(f"""
+                SELECT {channel}, COUNT(*), SUM(COALESCE({confidence}, 0)) FROM {source}
+                WHERE {channel} IS NOT NULL GROUP BY {channel}
+            """)
+        return {channel: (n, total or 0.0) for channel, n, total in rows}
+    except sqlite3.Error as e:
+        logger.warning(f"Channel history unavailable: {e}")
+        return {}
+
+
+class PriorityScheduler:
+    def __init__(self, budget: Optional[CycleBudget] = None, aging_per_hour: float = AGING_PER_HOUR,
+                 shed_below: float = SHED_BELOW, max_backlog: int = MAX_BACKLOG):
+        self.budget = budget or CycleBudget()
+        self.aging_per_hour = aging_per_hour
+        self.shed_below = shed_below
+        self.max_backlog = max_backlog
+        self.channel_history: Dict[str, Tuple[int, float]] = {}
+        self._heap: List[_Entry] = []
+        self._keys = set()
+        self._seq = 0
+        self.stats = {'scheduled': 0, 'deferred': 0, 'shed': 0}
+        self.start_cycle()
+
+    # --- Prioritate ---
+
+    def channel_score(self, channel: Optional[str]) -> float:
+        n, total_confidence = self.channel_history.get(channel or '', (0, 0.0))
+        confidence = (total_confidence + CHANNEL_PRIOR * CHANNEL_PRIOR_WEIGHT) / (n + CHANNEL_PRIOR_WEIGHT)
+        volume = min(1.0, math.log1p(n) / math.log1p(CHANNEL_VOLUME_SATURATION))
+        return 0.5 * confidence + 0.5 * volume
+
+    def priority(self, confidence: Optional[float], published_at: Optional[str], channel: Optional[str]) -> float:
+        parts = [(WEIGHT_FRESHNESS, freshness(published_at)), (WEIGHT_CHANNEL, self.channel_score(channel))]
+        if confidence is not None:
+            parts.append((WEIGHT_CONFIDENCE, min(max(confidence, 0.0), 1.0)))
+        return sum(w * v for w, v in parts) / sum(w for w, _ in parts)
+
+    def _effective(self, entry: _Entry, now: float) -> float:
+        return entry.priority + self.aging_per_hour * (now - entry.enqueued_at) / 3600
+
+    # --- Coadă ---
+
+    def push(self, key: str, item: Any, confidence: Optional[float] = None,
+             published_at: Optional[str] = None, channel: Optional[str] = None) -> bool:
+        """Adaugă un element (ignorat dacă cheia e deja în coadă); False la duplicat"""
+        if key in self._keys:
+            return False
+        now = time.time()
+        priority = self.priority(confidence, published_at, channel)
+        # Aging liniar egal pentru toți: ordinea după priority - rată * t_enqueue e constantă în timp
+        sort_key = -(priority - self.aging_per_hour * now / 3600)
+        self._seq += 1
+        heapq.heappush(self._heap, _Entry(sort_key, self._seq, key, item, priority, now))
+        self._keys.add(key)
+        return True
+
+    def pop(self) -> Optional[Any]:
+        """Următorul element după prioritatea efectivă; None dacă coada e goală sau bugetul e consumat"""
+        if not self._heap or self.budget_exhausted():
+            return None
+        entry = heapq.heappop(self._heap)
+        self._keys.discard(entry.key)
+        self._cycle['items'] += 1
+        self.stats['scheduled'] += 1
+        return entry.item
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    # --- Buget per ciclu ---
+
+    def start_cycle(self):
+        self._cycle = {'cpu_start': time.process_time(), 'download_bytes': 0, 'items': 0}
+
+    def charge(self, download_bytes: int = 0):
+        """Înregistrează octeții descărcați; CPU-ul procesului e măsurat automat"""
+        self._cycle['download_bytes'] += download_bytes
+
+    def budget_exhausted(self) -> Optional[str]:
+        budget = self.budget
+        if budget.items is not None and self._cycle['items'] >= budget.items:
+            return f"items {self._cycle['items']}/{budget.items}"
+        if budget.download_bytes is not None and self._cycle['download_bytes'] >= budget.download_bytes:
+            mb = 1024 * 1024
+            return f"download {self._cycle['download_bytes'] / mb:.0f}/{budget.download_bytes / mb:.0f} MB"
+        cpu_used = time.process_time() - self._cycle['cpu_start']
+        if budget.cpu_seconds is not None and cpu_used >= budget.cpu_seconds:
+            return f"cpu {cpu_used:.0f}/{budget.cpu_seconds:.0f} s"
+        return None
+
+    def end_cycle(self) -> Dict[str, int]:
+        """
+        Închide ciclul: dacă a rămas muncă (cerere peste capacitate), elementele sub prag sunt
+        abandonate, iar restul trec în ciclul următor (cu aging); coada e limitată la max_backlog.
+        """
+        reason = self.budget_exhausted()
+        shed = 0
+        if self._heap:
+            now = time.time()
+            keep = [e for e in self._heap if self._effective(e, now) >= self.shed_below]
+            shed = len(self._heap) - len(keep)
+            if len(keep) > self.max_backlog:
+                keep = heapq.nsmallest(self.max_backlog, keep)
+                shed = len(self._heap) - len(keep)
+            heapq.heapify(keep)
+            self._heap = keep
+            self._keys = {e.key for e in keep}
+        self.stats['shed'] += shed
+        self.stats['deferred'] = len(self._heap)
+        summary = {'processed': self._cycle['items'], 'deferred': len(self._heap), 'shed': shed}
+        if shed or self._heap:
+            logger.info(f"Scheduler cycle: {summary}" + (f", budget reached ({reason})" if reason else ""))
+        self.start_cycle()
+        return summary
@@ -6,7 +6,6 @@ Colectează și salvează metrici de sistem la fiecare 30 de secunde
 
 import time
 import json
-import sqlite3
 import psutil
 import subprocess
 import logging
@@ -15,6 +14,9 @@ import os
 import signal
 import sys
 
+from metrics_store import MetricsStore, DEFAULT_METRICS_DB
+from dashboard_snapshot import SnapshotWriter, SYSTEM_SNAPSHOT, DEFAULT_SNAPSHOT_DIR, build_system_payload
+
 # Configurare logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,7 +32,11 @@ class SystemMonitor:
     def __init__(self):
         self.running = False
         self.db_path = os.getenv('DATABASE_PATH', '/data/ads/ads_database.db')
+        self.metrics_db_path = os.getenv('METRICS_DATABASE_PATH', DEFAULT_METRICS_DB)
         self.metrics_file = '/tmp/system_metrics.json'
+        self.metrics_store = None
+        self.snapshots = SnapshotWriter(os.getenv('DASHBOARD_SNAPSHOT_DIR', DEFAULT_SNAPSHOT_DIR))
+        self.interval = 30
         
     def get_gpu_info(self):
         """Obține informații despre GPU-uri"""
@@ -115,52 +121,38 @@ class SystemMonitor:
             logger.error(f"Eroare salvare metrici: {e}")
     
     def save_to_database(self, metrics):
-        """Salvează metricile în baza de date pentru istoric"""
+        """Salvează metricile în arhivele round-robin pentru istoric (cost constant per eșantion)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Creează tabela dacă nu există
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS system_metrics (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        timestamp TEXT,
-                        cpu_usage REAL,
-                        memory_usage REAL,
-                        storage_usage REAL,
-                        active_processes INTEGER,
-                        gpu_data TEXT,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Inserează metricile
-                cursor.execute("""
-                    INSERT INTO system_metrics 
-                    (timestamp, cpu_usage, memory_usage, storage_usage, active_processes, gpu_data)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    metrics['timestamp'],
-                    metrics['cpu_usage'],
-                    metrics['memory_usage'],
-                    metrics['storage_usage'],
-                    metrics['active_processes'],
-                    json.dumps(metrics['gpus'])
-                ))
-                
-                # Păstrează doar ultimele 1000 de înregistrări
-                cursor.execute("""
-                    DELETE FROM system_metrics 
-                    WHERE id NOT IN (
-                        SELECT id FROM system_metrics 
-                        ORDER BY created_at DESC 
-                        LIMIT 1000
-                    )
-                """)
+            if self.metrics_store is None:
+                self.metrics_store = MetricsStore(self.metrics_db_path, raw_step=self.interval)
+            
+            values = {
+                'cpu_usage': metrics['cpu_usage'],
+                'memory_usage': metrics['memory_usage'],
+                'storage_usage': metrics['storage_usage'],
+                'active_processes': metrics['active_processes'],
+                'system_load': metrics['system_load'][0],
+            }
+            for gpu in metrics['gpus']:
+                prefix = f"gpu{gpu['index']}"
+                values[f'{prefix}.utilization'] = gpu['utilization']
+                values[f'{prefix}.temperature'] = gpu['temperature']
+                values[f'{prefix}.memory_used'] = gpu['memory_used']
+                values[f'{prefix}.power_draw'] = gpu['power_draw']
+            
+            timestamp = datetime.fromisoformat(metrics['timestamp']).timestamp()
+            self.metrics_store.record(values, timestamp)
                 
         except Exception as e:
             logger.error(f"Eroare salvare în baza de date: {e}")
     
+    def publish_snapshot(self, metrics):
+        """Publică payload-ul /api/system/real (ruta nu mai rulează top/free/df la fiecare request)"""
+        try:
+            self.snapshots.publish(SYSTEM_SNAPSHOT, build_system_payload(metrics, self.metrics_store))
+        except Exception as e:
+            logger.error(f"Eroare publicare snapshot: {e}")
+    
     def signal_handler(self, signum, frame):
         """Handler pentru oprirea gracioasă"""
         logger.info("Primind semnal de oprire...")
@@ -169,6 +161,7 @@ class SystemMonitor:
     def start_monitoring(self, interval=30):
         """Începe monitorizarea"""
         self.running = True
+        self.interval = interval
         
         # Înregistrează handler-ele pentru semnale
         signal.signal(signal.SIGINT, self.signal_handler)
@@ -191,6 +184,9 @@ class SystemMonitor:
                     # Salvează în baza de date pentru istoric
                     self.save_to_database(metrics)
                     
+                    # Snapshot pentru dashboard
+                    self.publish_snapshot(metrics)
+                    
                     logger.info(f"Metrici colectate: CPU {metrics['cpu_usage']:.1f}%, "
                               f"RAM {metrics['memory_usage']:.1f}%, "
                               f"GPU-uri {len(metrics['gpus'])}")
@@ -204,6 +200,9 @@ class SystemMonitor:
         except Exception as e:
             logger.error(f"Eroare în bucla de monitorizare: {e}")
         finally:
+            if self.metrics_store is not None:
+                self.metrics_store.close()
+            
             # Curăță PID file
             try:
                 os.remove('/tmp/monitor.pid')
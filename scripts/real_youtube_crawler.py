@@ -16,6 +16,13 @@ from googleapiclient.errors import HttpError
 import threading
 import signal
 import sys
+from persistence import get_persistence
+from aggregates import install_aggregates
+from text_search import install_text_search
+from epoch_columns import install_epoch_columns, now_epoch, to_epoch
+from partitions import PartitionCatalog
+from dashboard_snapshot import SnapshotPublisher
+from crawl_scheduler import DETAILS_UNITS, SEARCH_UNITS, CrawlScheduler
 
 # Setup logging
 logging.basicConfig(
@@ -28,6 +35,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Queries reale pentru căutarea reclamelor
+SEARCH_QUERIES = [
+    "advertisement 2025",
+    "commercial 2025", 
+    "publicitate romania 2025",
+    "reclamă nouă 2025",
+    "sponsored content",
+    "promo video 2025",
+    "marketing campaign",
+    "brand commercial",
+    "product advertisement",
+    "official commercial"
+]
+
 class RealYouTubeCrawler:
     def __init__(self):
         self.running = False
@@ -47,8 +68,17 @@ class RealYouTubeCrawler:
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
         self.init_database()
+        self.persistence = get_persistence(self.db_path)
+        self.partitions = PartitionCatalog(self.db_path)
+        
+        # Snapshot JSON pentru dashboard, republicat după fiecare batch de scrieri
+        self.snapshots = SnapshotPublisher(self.db_path)
+        self.snapshots.attach(self.persistence)
         self.init_youtube_service()
         
+        # Fiecare query e rulat după rata lui de videoclipuri noi, cu quota zilnică împărțită uniform
+        self.scheduler = CrawlScheduler(SEARCH_QUERIES, self.db_path)
+        
         # Handler pentru oprire
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
@@ -111,7 +141,9 @@ class RealYouTubeCrawler:
                         ad_confidence REAL DEFAULT 0.0,
                         ad_type TEXT,
                         detected_keywords TEXT,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        created_epoch INTEGER,
+                        published_epoch INTEGER
                     )
                 """)
                 
@@ -128,6 +160,15 @@ class RealYouTubeCrawler:
                     )
                 """)
                 
+                # Tabele agregate menținute incremental pentru dashboard
+                install_aggregates(conn, 'real_ads')
+                
+                # Index full-text (titlu, descriere, canal)
+                install_text_search(conn, 'real_ads')
+                
+                # Coloane epoch + indexuri pentru interogările pe ferestre de timp
+                install_epoch_columns(conn, 'real_ads')
+                
                 conn.commit()
                 logger.info("Real database initialized")
                 
@@ -308,132 +349,121 @@ class RealYouTubeCrawler:
         return 'other'
     
     def save_ad_to_database(self, video_data, ad_detection, video_details):
-        """Salvează reclama reală în baza de date"""
+        """
+        Pune în coadă reclama reală; Future-ul (numărul de rânduri inserate) se rezolvă la commit,
+        None dacă reclama există deja sau nu a putut fi trimisă
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Verifică dacă există deja
-                cursor.execute("SELECT id FROM real_ads WHERE video_id = ?", (video_data['video_id'],))
-                if cursor.fetchone():
-                    return False  # Există deja
-                
-                # Inserează reclama reală
-                cursor.execute("""
-                    INSERT INTO real_ads (
-                        video_id, title, channel_title, channel_id, published_at,
-                        description, thumbnail_url, view_count, like_count, comment_count,
-                        duration_seconds, ad_confidence, ad_type, detected_keywords
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    video_data['video_id'],
-                    video_data['title'],
-                    video_data['channel_title'],
-                    video_data['channel_id'],
-                    video_data['published_at'],
-                    video_data['description'][:1000],  # Limitează descrierea
-                    video_data['thumbnail_url'],
-                    video_details['view_count'] if video_details else 0,
-                    video_details['like_count'] if video_details else 0,
-                    video_details['comment_count'] if video_details else 0,
-                    video_details['duration'] if video_details else 0,
-                    ad_detection['confidence'],
-                    ad_detection['ad_type'],
-                    ','.join(ad_detection['matched_keywords'])
-                ))
-                
-                conn.commit()
-                self.stats['ads_found'] += 1
-                logger.info(f"✅ Saved real ad: {video_data['title'][:50]}... (Confidence: {ad_detection['confidence']:.2f})")
-                return True
+            # Verifică dacă există deja
+            if (self.persistence.fetchone("SELECT id FROM real_ads WHERE video_id = ?", (video_data['video_id'],))
+                    or self.partitions.find_video(video_data['video_id'])):
+                return None  # Există deja (în fișierul curent sau într-o lună arhivată)
+            
+            # Inserează reclama reală (prin writer-ul comun, în batch); rândul poate fi ignorat
+            # dacă altă scriere l-a inserat între verificare și commit, deci se numără doar inserările efective
+            return self.persistence.execute("""
+                INSERT OR IGNORE INTO real_ads (
+                    video_id, title, channel_title, channel_id, published_at,
+                    description, thumbnail_url, view_count, like_count, comment_count,
+                    duration_seconds, ad_confidence, ad_type, detected_keywords,
+                    created_epoch, published_epoch
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                video_data['video_id'],
+                video_data['title'],
+                video_data['channel_title'],
+                video_data['channel_id'],
+                video_data['published_at'],
+                video_data['description'][:1000],  # Limitează descrierea
+                video_data['thumbnail_url'],
+                video_details['view_count'] if video_details else 0,
+                video_details['like_count'] if video_details else 0,
+                video_details['comment_count'] if video_details else 0,
+                video_details['duration'] if video_details else 0,
+                ad_detection['confidence'],
+                ad_detection['ad_type'],
+                ','.join(ad_detection['matched_keywords']),
+                now_epoch(),
+                to_epoch(video_data['published_at'])
+            ), count_changes=True)
                 
         except Exception as e:
             logger.error(f"Error saving ad to database: {e}")
             self.stats['errors'] += 1
-            return False
+            return None
     
-    def crawl_cycle(self):
-        """Un ciclu complet de crawling REAL"""
-        logger.info("🚀 Starting REAL crawl cycle...")
+    def _settle_writes(self, writes):
+        """Un singur flush pentru scrierile unui query; întoarce numărul de reclame inserate efectiv"""
+        if not writes:
+            return 0
+        try:
+            self.persistence.flush()
+        except RuntimeError as e:
+            logger.error(f"Flush failed: {e}")
         
-        # Queries reale pentru căutarea reclamelor
-        search_queries = [
-            "advertisement 2025",
-            "commercial 2025", 
-            "publicitate romania 2025",
-            "reclamă nouă 2025",
-            "sponsored content",
-            "promo video 2025",
-            "marketing campaign",
-            "brand commercial",
-            "product advertisement",
-            "official commercial"
-        ]
+        new_ads = 0
+        for video_data, ad_detection, write in writes:
+            failure = write.exception() if write.done() else RuntimeError("write not committed")
+            if failure is not None:
+                logger.error(f"Error saving ad to database: {failure}")
+                self.stats['errors'] += 1
+            elif write.result():
+                new_ads += 1
+                self.stats['ads_found'] += 1
+                logger.info(f"✅ Saved real ad: {video_data['title'][:50]}... (Confidence: {ad_detection['confidence']:.2f})")
+        return new_ads
+    
+    def crawl_query(self, query):
+        """Caută un query și salvează reclamele noi; (ID-urile găsite, reclame noi, apeluri de detalii)"""
+        logger.info(f"🔍 Searching for: {query}")
         
-        cycle_start = time.time()
-        cycle_videos = 0
-        cycle_ads = 0
+        # Caută videoclipuri reale
+        videos = self.search_youtube_videos(query, max_results=20)
+        writes = []
+        detail_calls = 0
         
-        for query in search_queries:
+        for video_data in videos:
             if not self.running:
                 break
-                
-            logger.info(f"🔍 Searching for: {query}")
             
-            # Caută videoclipuri reale
-            videos = self.search_youtube_videos(query, max_results=20)
-            cycle_videos += len(videos)
+            self.stats['videos_checked'] += 1
             
-            for video_data in videos:
-                if not self.running:
-                    break
-                
-                self.stats['videos_checked'] += 1
-                
-                # Detectează dacă este reclamă
-                ad_detection = self.detect_ad_content(video_data)
-                
-                if ad_detection['is_ad']:
-                    # Obține detalii complete
-                    video_details = self.get_video_details(video_data['video_id'])
-                    
-                    # Salvează în baza de date
-                    if self.save_ad_to_database(video_data, ad_detection, video_details):
-                        cycle_ads += 1
+            # Detectează dacă este reclamă
+            ad_detection = self.detect_ad_content(video_data)
+            
+            if ad_detection['is_ad']:
+                # Obține detalii complete
+                video_details = self.get_video_details(video_data['video_id'])
+                detail_calls += 1
                 
-                # Rate limiting pentru a nu depăși quota
-                time.sleep(1)
+                # Salvează în baza de date (commit-ul se așteaptă o dată, la sfârșitul query-ului)
+                write = self.save_ad_to_database(video_data, ad_detection, video_details)
+                if write is not None:
+                    writes.append((video_data, ad_detection, write))
             
-            # Pauză între queries
-            time.sleep(2)
-        
-        cycle_time = time.time() - cycle_start
-        logger.info(f"✅ Cycle completed: {cycle_videos} videos checked, {cycle_ads} new ads found in {cycle_time:.1f}s")
+            # Rate limiting pentru a nu depăși quota
+            time.sleep(1)
         
-        # Salvează statisticile
-        self.save_stats()
+        new_ads = self._settle_writes(writes)
+        return [video['video_id'] for video in videos], new_ads, detail_calls
     
     def save_stats(self):
         """Salvează statisticile reale"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                run_duration = int(time.time() - self.stats['start_time']) if self.stats['start_time'] else 0
-                
-                cursor.execute("""
-                    INSERT INTO crawler_stats 
-                    (videos_checked, ads_found, api_calls, errors, run_duration)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    self.stats['videos_checked'],
-                    self.stats['ads_found'],
-                    self.stats['api_calls'],
-                    self.stats['errors'],
-                    run_duration
-                ))
-                
-                conn.commit()
+            run_duration = int(time.time() - self.stats['start_time']) if self.stats['start_time'] else 0
+            
+            self.persistence.execute("""
+                INSERT INTO crawler_stats 
+                (videos_checked, ads_found, api_calls, errors, run_duration)
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                self.stats['videos_checked'],
+                self.stats['ads_found'],
+                self.stats['api_calls'],
+                self.stats['errors'],
+                run_duration
+            ))
+            self.persistence.flush()
                 
         except Exception as e:
             logger.error(f"Error saving stats: {e}")
@@ -451,16 +481,40 @@ class RealYouTubeCrawler:
         with open('/tmp/real_crawler.pid', 'w') as f:
             f.write(str(os.getpid()))
         
+        self.snapshots.start()
+        self.snapshots.notify()
+        
+        # O rundă = atâtea query-uri rulate câte sunt în SEARCH_QUERIES (cât un ciclu complet vechi);
+        # crawler_stats primește un rând per rundă, nu per query
+        round_start = time.time()
+        round_queries = round_videos = round_ads = 0
+        
         try:
             while self.running:
-                self.crawl_cycle()
+                # Query-ul scadent cel mai devreme, când quota disponibilă îl acoperă
+                query, wait = self.scheduler.next_run()
+                if wait > 0:
+                    logger.info(f"⏳ Waiting {wait:.0f}s before query '{query}'...")
+                    deadline = time.time() + wait
+                    while self.running and time.time() < deadline:
+                        time.sleep(min(1.0, deadline - time.time()))
+                if not self.running:
+                    break
+                
+                video_ids, new_ads, detail_calls = self.crawl_query(query)
+                self.scheduler.record(query, video_ids, SEARCH_UNITS + detail_calls * DETAILS_UNITS)
+                if new_ads:
+                    logger.info(f"✅ {new_ads} new ads for '{query}'")
                 
-                if self.running:
-                    logger.info("⏳ Waiting 5 minutes before next cycle...")
-                    for i in range(300):  # 5 minute = 300 secunde
-                        if not self.running:
-                            break
-                        time.sleep(1)
+                round_queries += 1
+                round_videos += len(video_ids)
+                round_ads += new_ads
+                if round_queries >= len(SEARCH_QUERIES):
+                    logger.info(f"✅ Round completed: {round_videos} videos checked, {round_ads} new ads found "
+                                f"in {time.time() - round_start:.1f}s")
+                    self.save_stats()
+                    round_start = time.time()
+                    round_queries = round_videos = round_ads = 0
                         
         except Exception as e:
             logger.error(f"Critical error: {e}")
@@ -470,10 +524,17 @@ class RealYouTubeCrawler:
     def cleanup(self):
         """Curăță la oprire"""
         self.running = False
+        self.persistence.close()
         try:
             os.remove('/tmp/real_crawler.pid')
         except:
             pass
+        # Ultima publicare marchează crawler-ul ca oprit
+        self.snapshots.stop()
+        try:
+            self.snapshots.publish_once()
+        except Exception as e:
+            logger.warning(f"Final snapshot publish failed: {e}")
         logger.info("🛑 Crawler stopped")
     
     def signal_handler(self, signum, frame):
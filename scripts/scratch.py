@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Spațiu de lucru temporar per worker pentru descărcări și analiză audio
+- rădăcina e pe tmpfs (/dev/shm) când încape cota, altfel TEMP_DIR: fișierele intermediare
+  nu ajung pe disc;
+- fiecare proces are propriul director, blocat cu flock pe toată durata rulării; la pornire
+  directoarele ale căror procese au murit (lock eliberat de kernel) sunt șterse;
+- fiecare video are un subdirector cu nume determinist ({video_id}/{video_id}.mp3): fișierul
+  rezultat se găsește direct, fără listarea directorului, și nu poate fi confundat cu al altui worker;
+- cota: fiecare job rezervă o dimensiune estimată și așteaptă dacă rezervările ar depăși cota.
+
+Utilizare: python3 scripts/scratch.py [radacina]   (afișează directoarele și ocuparea lor)
+"""
+
+import os
+import sys
+import fcntl
+import atexit
+import shutil
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TMPFS_ROOT = '/dev/shm'
+SCRATCH_SUBDIR = 'ads-scratch'
+LOCK_FILE = '.lock'
+
+
+def _free_bytes(path: str) -> int:
+    stat = os.statvfs(path)
+    return stat.f_bavail * stat.f_frsize
+
+
+def choose_root(preferred: Optional[str], fallback: str, quota_bytes: int) -> str:
+    """Directorul configurat sau tmpfs dacă are loc pentru întreaga cotă; altfel fallback (TEMP_DIR)"""
+    if preferred:
+        return preferred
+    try:
+        if os.access(TMPFS_ROOT, os.W_OK) and _free_bytes(TMPFS_ROOT) >= quota_bytes:
+            return TMPFS_ROOT
+    except OSError:
+        pass
+    logger.info(f"tmpfs unavailable or smaller than the scratch quota, using {fallback}")
+    return fallback
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for entry in os.scandir(path):
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += directory_size(entry.path)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            pass
+    return total
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def sweep_stale(base: str) -> int:
+    """Șterge directoarele worker al căror proces nu mai ține lock-ul (crash, SIGKILL, OOM)"""
+    removed = 0
+    for entry in os.scandir(base):
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        # Un proces viu poate fi între crearea directorului și flock: nu-l atingem
+        pid = entry.name.rpartition('-')[2]
+        if pid.isdigit() and _pid_alive(int(pid)):
+            continue
+        try:
+            fd = os.open(os.path.join(entry.path, LOCK_FILE), os.O_RDWR | os.O_CREAT)
+        except OSError:
+            continue
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            continue  # procesul proprietar rulează
+        try:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+        finally:
+            os.close(fd)
+    if removed:
+        logger.info(f"Removed {removed} stale scratch directories from {base}")
+    return removed
+
+
+class ScratchSpace:
+    def __init__(self, root: str, quota_bytes: int = 0, job_reserve_bytes: int = 0):
+        """quota_bytes 0 = fără cotă; job_reserve_bytes = rezervarea implicită a unui job"""
+        self.base = os.path.join(root, SCRATCH_SUBDIR)
+        self.quota_bytes = quota_bytes
+        self.job_reserve_bytes = job_reserve_bytes
+        os.makedirs(self.base, exist_ok=True)
+        sweep_stale(self.base)
+
+        self.dir = os.path.join(self.base, f"worker-{os.getpid()}")
+        shutil.rmtree(self.dir, ignore_errors=True)  # PID refolosit după un crash
+        os.makedirs(self.dir)
+        self._lock_fd = os.open(os.path.join(self.dir, LOCK_FILE), os.O_RDWR | os.O_CREAT)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.reserved = 0
+        self.stats = {'jobs': 0, 'waits': 0, 'peak_reserved': 0}
+        self._cond: Optional[asyncio.Condition] = None
+        atexit.register(self.close)
+        logger.info(f"Scratch directory: {self.dir}" + (f", quota {quota_bytes / 2**20:.0f} MB" if quota_bytes else ""))
+
+    def _condition(self) -> asyncio.Condition:
+        # Creată la prima folosire, în event loop-ul care o folosește
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def job_dir(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def audio_path(self, video_id: str, ext: str = 'mp3') -> str:
+        """Calea deterministă a fișierului audio rezultat"""
+        return os.path.join(self.job_dir(video_id), f"{video_id}.{ext}")
+
+    @asynccontextmanager
+    async def job(self, name: str, reserve_bytes: Optional[int] = None):
+        """Subdirectorul jobului, cu rezervare din cotă; totul e șters la ieșire"""
+        reserve = reserve_bytes if reserve_bytes is not None else self.job_reserve_bytes
+        if self.quota_bytes:
+            reserve = min(reserve, self.quota_bytes)  # un job mai mare decât cota rulează singur
+            cond = self._condition()
+            async with cond:
+                if self.reserved + reserve > self.quota_bytes:
+                    self.stats['waits'] += 1
+                    await cond.wait_for(lambda: self.reserved + reserve <= self.quota_bytes)
+                self.reserved += reserve
+                self.stats['peak_reserved'] = max(self.stats['peak_reserved'], self.reserved)
+        path = self.job_dir(name)
+        os.makedirs(path, exist_ok=True)
+        self.stats['jobs'] += 1
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+            if self.quota_bytes:
+                cond = self._condition()
+                async with cond:
+                    self.reserved -= reserve
+                    cond.notify_all()
+
+    def usage(self) -> Dict[str, Any]:
+        return {'dir': self.dir, 'bytes': directory_size(self.dir), 'reserved': self.reserved, **self.stats}
+
+    def close(self):
+        if self._lock_fd is None:
+            return
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.close(self._lock_fd)
+        self._lock_fd = None
+        atexit.unregister(self.close)
+
+
+def main():
+    root = sys.argv[1] if len(sys.argv) > 1 else TMPFS_ROOT
+    base = os.path.join(root, SCRATCH_SUBDIR)
+    if not os.path.isdir(base):
+        print(f"No scratch directories under {root}")
+        return
+    for entry in sorted(os.scandir(base), key=lambda e: e.name):
+        if entry.is_dir(follow_symlinks=False):
+            print(f"{directory_size(entry.path) / 2**20:>10.1f} MB  {entry.path}")
+
+
+if __name__ == "__main__":
+    main()
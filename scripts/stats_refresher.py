@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Reîmprospătarea statisticilor (vizualizări, like-uri, comentarii) pentru reclamele existente
+Coadă de priorități după momentul estimat în care valorile s-au schimbat semnificativ
+(vârsta video-ului și rata de creștere observată), videos.list în loturi de 50 de ID-uri
+în limita unui buget de quota, scriere doar a contoarelor schimbate și a deltelor în performance_metrics.
+
+Utilizare: python3 scripts/stats_refresher.py [cale_baza_de_date] [--source ads|real_ads]
+                                              [--quota UNITĂȚI_PE_ZI] [--once]
+"""
+
+import json
+import time
+import heapq
+import signal
+import sqlite3
+import asyncio
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from lazy_imports import lazy_import
+from persistence import get_persistence
+
+# googleapiclient se încarcă la primul apel API, nu la importul modulului (ex. din crawl_scheduler)
+discovery = lazy_import('googleapiclient.discovery')
+errors = lazy_import('googleapiclient.errors')
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50  # maximul de ID-uri acceptat de videos.list
+
+# Coloanele contoarelor în fiecare schemă
+SOURCES = {
+    'ads': {
+        'views': 'views', 'likes': 'likes', 'comments': 'comments_count',
+        'engagement': 'engagement_rate', 'published': 'published_at',
+        'captured': ['processed_at', 'created_at', 'timestamp'],
+    },
+    'real_ads': {
+        'views': 'view_count', 'likes': 'like_count', 'comments': 'comment_count',
+        'engagement': None, 'published': 'published_at',
+        'captured': ['updated_at', 'created_at'],
+    },
+}
+
+
+@dataclass
+class RefreshConfig:
+    DATABASE_PATH: str = '/data/ads/ads_database.db'
+    SOURCE: str = 'ads'
+    QUOTA_UNITS_PER_DAY: int = 2000    # un apel videos.list (50 ID-uri) = 1 unitate
+    CHANGE_THRESHOLD: float = 0.05     # reîmprospătare când creșterea estimată atinge 5%
+    MIN_INTERVAL: int = 3600           # nu mai des de o oră per reclamă
+    MAX_INTERVAL: int = 30 * 86400     # cel puțin o dată pe lună
+    GROWTH_SMOOTHING: float = 0.5      # EWMA pentru rata de creștere observată
+    RESCAN_INTERVAL: int = 300         # secunde între căutările de reclame noi
+
+
+class QuotaBudget:
+    """Token bucket: bugetul zilnic distribuit uniform, cu rezervă de cel mult o oră"""
+
+    def __init__(self, units_per_day: int):
+        self.rate = units_per_day / 86400
+        self.capacity = max(1.0, units_per_day / 24)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, units: float = 1) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= units else (units - self.tokens) / self.rate
+
+    def consume(self, units: float = 1):
+        self._refill()
+        self.tokens -= units
+
+
+def expected_growth_rate(age_days: float, observed: Optional[float]) -> float:
+    """
+    Creșterea relativă pe zi estimată. Fără observații: un video adunat în mare parte
+    după o lege ~log(vârstă) crește cu ~1/vârstă pe zi.
+    """
+    prior = 1.0 / (max(age_days, 0.0) + 1.0)
+    if observed is None:
+        return prior
+    return max(observed, prior * 0.1)
+
+
+class StatsRefresher:
+    def __init__(self, config: RefreshConfig):
+        if config.SOURCE not in SOURCES:
+            raise ValueError(f"Unknown source table: {config.SOURCE}")
+        self.config = config
+        self.columns = SOURCES[config.SOURCE]
+        self.persistence = get_persistence(config.DATABASE_PATH)
+        self.budget = QuotaBudget(config.QUOTA_UNITS_PER_DAY)
+        self.api_keys = self._load_api_keys()
+        self.current_key_index = 0
+        self.youtube = self._get_youtube_service() if self.api_keys else None
+        self.running = False
+
+        self._heap: List[Tuple[float, int]] = []   # (next_due, ad_id)
+        self._ads: Dict[int, dict] = {}            # starea curentă per reclamă
+        self._last_seen_id = 0
+        self.stats = {'api_calls': 0, 'ads_checked': 0, 'ads_changed': 0, 'ads_missing': 0}
+
+        self._init_state_table()
+
+    # --- API YouTube ---
+
+    def _load_api_keys(self) -> List[str]:
+        try:
+            with open('api_keys.json', 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            logger.error("api_keys.json not found")
+            return []
+
+    def _get_youtube_service(self):
+        for attempt in range(len(self.api_keys)):
+            try:
+                return discovery.build('youtube', 'v3', developerKey=self.api_keys[self.current_key_index])
+            except errors.HttpError as e:
+                logger.warning(f"API key {self.current_key_index} failed: {e}")
+                self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
+        raise Exception("No valid API keys available")
+
+    def _fetch_statistics(self, video_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        """Un singur apel videos.list pentru cel mult 50 de ID-uri"""
+        for attempt in range(max(1, len(self.api_keys))):
+            try:
+                response = self.youtube.videos().list(
+                    part='statistics',
+                    id=','.join(video_ids),
+                    maxResults=BATCH_SIZE
+                ).execute()
+                self.stats['api_calls'] += 1
+                result = {}
+                for item in response.get('items', []):
+                    stats = item.get('statistics', {})
+                    result[item['id']] = {
+                        'views': int(stats.get('viewCount', 0)),
+                        'likes': int(stats.get('likeCount', 0)),
+                        'comments': int(stats.get('commentCount', 0)),
+                    }
+                return result
+            except errors.HttpError as e:
+                if e.resp.status == 403 and len(self.api_keys) > 1:
+                    logger.warning(f"Quota exceeded for API key {self.current_key_index}, rotating")
+                    self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
+                    self.youtube = self._get_youtube_service()
+                    continue
+                raise
+        raise Exception("All API keys exhausted")
+
+    # --- Starea cozii ---
+
+    def _init_state_table(self):
+        with sqlite3.connect(self.config.DATABASE_PATH) as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS stats_refresh_state (
+                    source TEXT NOT NULL,
+                    ad_id INTEGER NOT NULL,
+                    last_checked INTEGER NOT NULL,  -- epoch
+                    next_due INTEGER NOT NULL,      -- epoch
+                    growth_rate REAL,               -- creștere relativă observată pe zi
+                    checks INTEGER DEFAULT 0,
+                    PRIMARY KEY (source, ad_id)
+                );
+
+                CREATE TABLE IF NOT EXISTS performance_metrics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ad_id INTEGER,
+                    metric_name TEXT NOT NULL,
+                    metric_value REAL NOT NULL,
+                    measured_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE INDEX IF NOT EXISTS idx_performance_metrics_ad ON performance_metrics(ad_id, metric_name);
+            """)
+
+    def _captured_expr(self, existing: set) -> str:
+        present = [c for c in self.columns['captured'] if c in existing]
+        if not present:
+            return 'NULL'
+        column = present[0] if len(present) == 1 else f"COALESCE({', '.join(present)})"
+        return f"CAST(strftime('%s', {column}) AS INTEGER)"
+
+    def load_new_ads(self) -> int:
+        """Adaugă în coadă reclamele apărute de la ultima scanare"""
+        source, c = self.config.SOURCE, self.columns
+        existing = {row[1] for row in self.persistence.fetchall(f"PRAGMA table_info({source})")}
+        published = f"CAST(strftime('%s', a.{c['published']}) AS INTEGER)" if c['published'] in existing else 'NULL'
+        rows = self.persistence.fetchall(f"""
+            SELECT a.id, a.video_id, a.{c['views']}, a.{c['likes']}, a.{c['comments']},
+                   {published}, {self._captured_expr(existing)},
+                   s.last_checked, s.next_due, s.growth_rate
+            FROM {source} a
+            LEFT JOIN stats_refresh_state s ON s.source = ? AND s.ad_id = a.id
+            WHERE a.id > ?
+            ORDER BY a.id
+        """, (source, self._last_seen_id))
+
+        now = int(time.time())
+        for ad_id, video_id, views, likes, comments, published_ts, captured_ts, last_checked, next_due, growth in rows:
+            self._last_seen_id = max(self._last_seen_id, ad_id)
+            ad = {
+                'video_id': video_id, 'views': views or 0, 'likes': likes or 0, 'comments': comments or 0,
+                'published': published_ts, 'last_checked': last_checked or captured_ts or now,
+                'growth_rate': growth,
+            }
+            self._ads[ad_id] = ad
+            due = next_due if next_due is not None else self._next_due(ad, ad['last_checked'])
+            heapq.heappush(self._heap, (due, ad_id))
+        return len(rows)
+
+    def _next_due(self, ad: dict, checked_at: int) -> int:
+        """Momentul în care creșterea estimată atinge pragul de schimbare"""
+        age_days = (checked_at - ad['published']) / 86400 if ad['published'] else 30.0
+        rate = expected_growth_rate(age_days, ad['growth_rate'])
+        interval = self.config.CHANGE_THRESHOLD / rate * 86400
+        interval = min(max(interval, self.config.MIN_INTERVAL), self.config.MAX_INTERVAL)
+        return int(checked_at + interval)
+
+    def _pop_due_batch(self, now: float) -> List[int]:
+        batch = []
+        while self._heap and self._heap[0][0] <= now and len(batch) < BATCH_SIZE:
+            _, ad_id = heapq.heappop(self._heap)
+            if ad_id in self._ads:
+                batch.append(ad_id)
+        return batch
+
+    # --- Reîmprospătare ---
+
+    def refresh_batch(self, ad_ids: List[int]):
+        ads = {self._ads[ad_id]['video_id']: ad_id for ad_id in ad_ids}
+        fetched = self._fetch_statistics(list(ads))
+        self.budget.consume()
+
+        now = int(time.time())
+        source = self.config.SOURCE
+        statements = []
+        for video_id, ad_id in ads.items():
+            ad = self._ads[ad_id]
+            new = fetched.get(video_id)
+            if new is None:
+                # Video șters sau privat - verificat rar de acum înainte
+                self.stats['ads_missing'] += 1
+                ad['last_checked'] = now
+                due = now + self.config.MAX_INTERVAL
+            else:
+                deltas = {name: new[name] - ad[name] for name in ('views', 'likes', 'comments')}
+                elapsed_days = max((now - ad['last_checked']) / 86400, 1 / 24)
+                observed = max(deltas['views'], 0) / max(ad['views'], 1) / elapsed_days
+                ad['growth_rate'] = observed if ad['growth_rate'] is None else (
+                    self.config.GROWTH_SMOOTHING * observed
+                    + (1 - self.config.GROWTH_SMOOTHING) * ad['growth_rate'])
+                ad['last_checked'] = now
+                due = self._next_due(ad, now)
+
+                if any(deltas.values()):
+                    self.stats['ads_changed'] += 1
+                    statements.extend(self._counter_statements(ad_id, new, deltas))
+                    ad.update(new)
+
+            statements.append(("""
+                INSERT INTO stats_refresh_state (source, ad_id, last_checked, next_due, growth_rate, checks)
+                VALUES (?, ?, ?, ?, ?, 1)
+                ON CONFLICT(source, ad_id) DO UPDATE SET
+                    last_checked = excluded.last_checked,
+                    next_due = excluded.next_due,
+                    growth_rate = excluded.growth_rate,
+                    checks = checks + 1
+            """, (source, ad_id, now, due, ad['growth_rate'])))
+            heapq.heappush(self._heap, (due, ad_id))
+            self.stats['ads_checked'] += 1
+
+        self.persistence.submit(statements)
+
+    def _counter_statements(self, ad_id: int, new: Dict[str, int], deltas: Dict[str, int]):
+        source, c = self.config.SOURCE, self.columns
+        assignments = [f"{c['views']} = ?", f"{c['likes']} = ?", f"{c['comments']} = ?"]
+        params = [new['views'], new['likes'], new['comments']]
+        if c['engagement']:
+            assignments.append(f"{c['engagement']} = ?")
+            params.append((new['likes'] + new['comments']) / new['views'] if new['views'] else 0)
+
+        # Doar rândul reclamei; rândurile de caracteristici (audio/visual) nu sunt atinse
+        statements = [(f"""
+            UPDATE {source} SET {', '.join(assignments)}
+            WHERE id = ?
+        """, (*params, ad_id))]
+        for name, delta in deltas.items():
+            if delta:
+                statements.append(("""
+                    INSERT INTO performance_metrics (ad_id, metric_name, metric_value)
+                    VALUES (?, ?, ?)
+                """, (ad_id, f"{name}_delta", delta)))
+        return statements
+
+    async def run(self, once: bool = False):
+        """Bucla principală: loturi scadente, în limita bugetului de quota"""
+        if self.youtube is None:
+            logger.error("No YouTube API keys, statistics refresher not started")
+            return
+
+        self.running = True
+        loop = asyncio.get_running_loop()
+        last_scan = 0.0
+        logger.info(f"Statistics refresher started ({self.config.QUOTA_UNITS_PER_DAY} quota units/day)")
+
+        while self.running:
+            if time.monotonic() - last_scan >= self.config.RESCAN_INTERVAL:
+                added = await loop.run_in_executor(None, self.load_new_ads)
+                if added:
+                    logger.info(f"Queued {added} ads for statistics refresh")
+                last_scan = time.monotonic()
+
+            wait = self.budget.wait_time()
+            if wait > 0:
+                await asyncio.sleep(min(wait, 60))
+                continue
+
+            batch = self._pop_due_batch(time.time())
+            if not batch:
+                if once:
+                    break
+                next_due = self._heap[0][0] - time.time() if self._heap else self.config.RESCAN_INTERVAL
+                await asyncio.sleep(max(1.0, min(next_due, 60)))
+                continue
+
+            try:
+                await loop.run_in_executor(None, self.refresh_batch, batch)
+            except Exception as e:
+                logger.error(f"Statistics refresh failed: {e}")
+                retry = int(time.time()) + self.config.MIN_INTERVAL
+                for ad_id in batch:
+                    heapq.heappush(self._heap, (retry, ad_id))
+                await asyncio.sleep(30)
+
+        await loop.run_in_executor(None, self.persistence.flush)
+        logger.info(f"Statistics refresher stopped: {self.stats}")
+
+    def stop(self):
+        self.running = False
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Reîmprospătarea statisticilor reclamelor')
+    parser.add_argument('database', nargs='?', default=RefreshConfig.DATABASE_PATH)
+    parser.add_argument('--source', choices=list(SOURCES), default='ads')
+    parser.add_argument('--quota', type=int, default=RefreshConfig.QUOTA_UNITS_PER_DAY)
+    parser.add_argument('--once', action='store_true', help='doar reclamele scadente acum, apoi oprire')
+    args = parser.parse_args()
+
+    refresher = StatsRefresher(RefreshConfig(DATABASE_PATH=args.database, SOURCE=args.source,
+                                             QUOTA_UNITS_PER_DAY=args.quota))
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, refresher.stop)
+    await refresher.run(once=args.once)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
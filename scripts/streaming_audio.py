@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Analiză audio în blocuri (streaming) cu memorie constantă per clip
+Statisticile (medie/varianță) se acumulează incremental peste blocuri.
+Semnalul e resamplat în flux la SAMPLE_RATE (ca librosa.load în analiza neîn blocuri), deci
+MFCC/chroma/centroid au aceeași scară în ambele moduri.
+"""
+
+import logging
+from typing import Any, Dict, Iterator, Optional
+
+import librosa
+import numpy as np
+import soxr  # dependență a librosa (resamplarea implicită din librosa.load)
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 22050  # rata implicită a librosa.load
+READ_BLOCK_SAMPLES = 65536
+
+
+class RunningStats:
+    """Medie și varianță incrementală pe coloane (algoritmul Chan/Welford)"""
+
+    def __init__(self, dim: int = 1):
+        self.count = 0
+        self.mean = np.zeros(dim, dtype=np.float64)
+        self.m2 = np.zeros(dim, dtype=np.float64)
+
+    def update(self, frames: np.ndarray):
+        """Adaugă un bloc de cadre cu forma (dim, n_frames)"""
+        frames = np.atleast_2d(frames).astype(np.float64, copy=False)
+        n = frames.shape[1]
+        if n == 0:
+            return
+
+        block_mean = frames.mean(axis=1)
+        block_m2 = ((frames - block_mean[:, None]) ** 2).sum(axis=1)
+
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + block_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    @property
+    def variance(self) -> np.ndarray:
+        if self.count == 0:
+            return np.zeros_like(self.mean)
+        return self.m2 / self.count
+
+
+def iter_audio_blocks(audio_file: str, block_length: int = 1024, frame_length: int = 2048,
+                      hop_length: int = 512, duration: Optional[float] = None,
+                      sr: int = SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """
+    Citește fișierul audio în blocuri de block_length cadre, resamplate la sr.
+    Blocurile se suprapun cu frame_length - hop_length eșantioane, ca în librosa.stream,
+    deci cadrele sunt aceleași ca pentru semnalul întreg.
+    """
+    native_sr = librosa.get_samplerate(audio_file)
+    resampler = soxr.ResampleStream(native_sr, sr, 1, dtype='float32', quality='HQ') if native_sr != sr else None
+    raw = librosa.stream(
+        audio_file,
+        block_length=1,
+        frame_length=READ_BLOCK_SAMPLES,
+        hop_length=READ_BLOCK_SAMPLES,
+        duration=duration,
+        mono=True,
+        fill_value=None
+    )
+
+    block_samples = frame_length + (block_length - 1) * hop_length
+    step = block_length * hop_length
+    buffer = np.zeros(0, dtype=np.float32)
+    emitted = False
+
+    def chunks():
+        for chunk in raw:
+            yield chunk if resampler is None else resampler.resample_chunk(chunk.astype(np.float32, copy=False))
+        if resampler is not None:
+            yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+    for chunk in chunks():
+        buffer = np.concatenate([buffer, chunk])
+        while len(buffer) >= block_samples:
+            yield buffer[:block_samples]
+            buffer = buffer[step:]
+            emitted = True
+    # Restul: doar dacă are eșantioane dincolo de suprapunerea cu blocul anterior
+    if len(buffer) > (block_samples - step if emitted else 0):
+        yield buffer
+
+
+def analyze_audio_streaming(audio_file: str, duration: Optional[float] = None,
+                            block_length: int = 1024, frame_length: int = 2048,
+                            hop_length: int = 512, n_mfcc: int = 13) -> Optional[Dict[str, Any]]:
+    """Analiză audio în blocuri - același set de caracteristici (și aceeași rată) ca analyze_audio_advanced"""
+    sr = SAMPLE_RATE
+
+    centroid = RunningStats()
+    rolloff = RunningStats()
+    bandwidth = RunningStats()
+    rms = RunningStats()
+    zcr = RunningStats()
+    mfcc = RunningStats(n_mfcc)
+    chroma = RunningStats(12)
+
+    total_samples = 0
+    tempo_weighted = 0.0
+    tempo_frames = 0
+
+    overlap = frame_length - hop_length
+    for block in iter_audio_blocks(audio_file, block_length, frame_length, hop_length, duration, sr):
+        # Blocurile se suprapun: fiecare bloc după primul aduce len - overlap eșantioane noi
+        total_samples += len(block) - (overlap if total_samples else 0)
+        if len(block) < frame_length:
+            continue
+
+        # STFT o singură dată per bloc, refolosit de toate caracteristicile spectrale
+        S = np.abs(librosa.stft(block, n_fft=frame_length, hop_length=hop_length, center=False))
+        if S.shape[1] == 0:
+            continue
+        power = S ** 2
+        mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=power, sr=sr))
+
+        centroid.update(librosa.feature.spectral_centroid(S=S, sr=sr))
+        rolloff.update(librosa.feature.spectral_rolloff(S=S, sr=sr))
+        bandwidth.update(librosa.feature.spectral_bandwidth(S=S, sr=sr))
+        rms.update(librosa.feature.rms(
+            y=block, frame_length=frame_length, hop_length=hop_length, center=False
+        ))
+        zcr.update(librosa.feature.zero_crossing_rate(
+            block, frame_length=frame_length, hop_length=hop_length, center=False
+        ))
+        mfcc.update(librosa.feature.mfcc(S=mel_db, n_mfcc=n_mfcc))
+        chroma.update(librosa.feature.chroma_stft(S=power, sr=sr))
+
+        # Tempo estimat per bloc, mediat ponderat după numărul de cadre
+        onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr)
+        block_tempo = librosa.feature.tempo(onset_envelope=onset_env, sr=sr, hop_length=hop_length)
+        tempo_weighted += float(block_tempo[0]) * S.shape[1]
+        tempo_frames += S.shape[1]
+
+    if total_samples == 0 or centroid.count == 0:
+        return None
+
+    # Aceeași euristică vorbire/muzică ca _detect_speech_ratio, din statisticile cumulate
+    speech_score = (float(centroid.variance[0]) / 1000000) + (float(np.mean(mfcc.variance)) / 100)
+    speech_ratio = min(1.0, max(0.0, speech_score))
+
+    tempo = tempo_weighted / tempo_frames if tempo_frames > 0 else 0.0
+
+    return {
+        'tempo': tempo,
+        'energy': float(rms.mean[0]),
+        'spectral_centroid': float(centroid.mean[0]),
+        'spectral_rolloff': float(rolloff.mean[0]),
+        'spectral_bandwidth': float(bandwidth.mean[0]),
+        'mfcc_mean': mfcc.mean.tolist(),
+        'chroma_mean': chroma.mean.tolist(),
+        'zero_crossing_rate': float(zcr.mean[0]),
+        'speech_ratio': speech_ratio,
+        'duration': total_samples / sr,
+        'spectral_centroid_var': float(centroid.variance[0]),
+        'mfcc_var': mfcc.variance.tolist(),
+        'energy_var': float(rms.variance[0]),
+        'zero_crossing_rate_var': float(zcr.variance[0])
+    }
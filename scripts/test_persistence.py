@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Teste pentru serviciul de persistență: batch-urile păstrează ordinea trimiterii unităților
+Rulare: python3 -m pytest scripts/test_persistence.py   (sau python3 scripts/test_persistence.py)
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from persistence import PersistenceService
+
+UPSERT = "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)"
+DELETE = "DELETE FROM kv WHERE key = ?"
+UPDATE = "UPDATE kv SET value = ? WHERE key = ?"
+INSERT_IGNORE = "INSERT OR IGNORE INTO kv (key, value) VALUES (?, ?)"
+
+
+class PersistenceOrderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'test.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE kv (key INTEGER PRIMARY KEY, value TEXT)")
+        conn.commit()
+        conn.close()
+        # Interval lung: toate unitățile ajung în același batch, commit-at la flush()
+        self.service = PersistenceService(self.db_path, batch_size=100, flush_interval=60)
+
+    def tearDown(self):
+        self.service.close()
+        self.tmp.cleanup()
+
+    def value(self, key):
+        row = self.service.fetchone("SELECT value FROM kv WHERE key = ?", (key,))
+        return row[0] if row else None
+
+    def test_interleaved_units_apply_in_submit_order(self):
+        # A, B, A pe aceeași cheie: gruparea pe SQL ar rula A, A, B și ar șterge rândul
+        futures = [
+            self.service.execute(UPSERT, (1, 'first')),
+            self.service.execute(DELETE, (1,)),
+            self.service.execute(UPSERT, (1, 'last')),
+        ]
+        self.assertTrue(self.service.flush(timeout=10))
+        self.assertTrue(all(f.result(timeout=0) for f in futures))
+        self.assertEqual(self.value(1), 'last')
+        self.assertEqual(self.service.stats['transactions'], 1)
+
+    def test_update_before_insert_on_same_key(self):
+        # UPDATE (rând inexistent), INSERT, UPDATE: ultima actualizare trebuie să vadă rândul inserat
+        self.service.execute(UPDATE, ('early', 1))
+        self.service.execute(INSERT_IGNORE, (1, 'inserted'))
+        self.service.execute(UPDATE, ('final', 1))
+        self.assertTrue(self.service.flush(timeout=10))
+        self.assertEqual(self.value(1), 'final')
+
+    def test_count_changes_reports_ignored_insert(self):
+        first = self.service.execute(INSERT_IGNORE, (2, 'x'), count_changes=True)
+        second = self.service.execute(INSERT_IGNORE, (2, 'y'), count_changes=True)
+        self.assertTrue(self.service.flush(timeout=10))
+        self.assertEqual(first.result(timeout=0), 1)
+        self.assertEqual(second.result(timeout=0), 0)
+        self.assertEqual(self.value(2), 'x')
+
+    def test_non_sqlite_error_fails_only_its_unit(self):
+        # OverflowError la legare nu e sqlite3.Error: unitatea eșuează, writer-ul rămâne în viață
+        good = self.service.execute(UPSERT, (3, 'ok'))
+        bad = self.service.execute(UPSERT, (2 ** 70, 'too big'))
+        self.assertTrue(self.service.flush(timeout=10))
+        self.assertTrue(good.result(timeout=0))
+        self.assertIsInstance(bad.exception(timeout=0), OverflowError)
+        later = self.service.execute(UPSERT, (4, 'after'))
+        self.assertTrue(self.service.flush(timeout=10))
+        self.assertTrue(later.result(timeout=0))
+        self.assertEqual(self.value(3), 'ok')
+
+    def test_flush_fails_fast_after_close(self):
+        self.service.close()
+        with self.assertRaises(RuntimeError):
+            self.service.flush()
+
+
+if __name__ == "__main__":
+    unittest.main()
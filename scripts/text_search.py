@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Index full-text FTS5 peste titlul, descrierea și canalul reclamelor (ads / real_ads)
+Diacriticele românești sunt eliminate la indexare și la căutare (ș/ş -> s, ț/ţ -> t, ă/â -> a, î -> i),
+rezultatele sunt ordonate după bm25 sau după recență, cu paginare keyset (fără OFFSET).
+Ordinea după bm25 e limitată implicit la cele mai noi RANK_WINDOW potriviri (rank_window=None: toate);
+SearchPage.truncated arată că potrivirile mai vechi nu apar în paginile ordonate după relevanță.
+
+Utilizare: python3 scripts/text_search.py rebuild [cale_baza_de_date] [tabela_sursă]
+           python3 scripts/text_search.py search "text căutat" [cale_baza_de_date] [tabela_sursă]
+"""
+
+import re
+import sys
+import sqlite3
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Coloanele indexate din fiecare tabelă sursă: titlu, descriere, canal
+SOURCES = {
+    'ads': ('title', 'description', 'channel'),
+    'real_ads': ('title', 'description', 'channel_title'),
+}
+
+# Ponderi bm25 per coloană (titlul și canalul contează mai mult decât descrierea)
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+TOKENIZER = "unicode61 remove_diacritics 2"
+# Indexuri de prefix pentru căutarea în timp ce se tastează; prefixele mai lungi
+# nu au index și parcurg toți termenii potriviți (mai lent pe termeni frecvenți)
+PREFIX_LENGTHS = '2 3 4'
+
+SNIPPET_OPEN = '<mark>'
+SNIPPET_CLOSE = '</mark>'
+SNIPPET_TOKENS = 12
+
+# Numărul implicit de potriviri (cele mai noi) ordonate după bm25 într-o căutare; bm25 se calculează
+# pentru fiecare potrivire ordonată, deci fără limită termenii foarte frecvenți nu mai sunt interactivi
+RANK_WINDOW = 2000
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_table(source: str) -> str:
+    return f"{source}_fts"
+
+
+@dataclass
+class SearchResult:
+    id: int
+    video_id: str
+    title: str
+    channel: str
+    snippet: str
+    score: float
+
+
+@dataclass
+class SearchPage:
+    results: List[SearchResult] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    # True dacă ordinea după relevanță a cuprins doar cele mai noi rank_window potriviri:
+    # paginile se termină înainte de count(); order='recent' sau rank_window=None le parcurg pe toate
+    truncated: bool = False
+
+
+def build_match_query(text: str, prefix: bool = False) -> Optional[str]:
+    """
+    Textul utilizatorului -> expresie FTS5 sigură: fiecare cuvânt între ghilimele (fără operatori),
+    toate cuvintele obligatorii; cu prefix=True ultimul cuvânt e prefix (căutare în timp ce se tastează)
+    """
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    if prefix:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+    ).fetchone() is not None
+
+
+def install_text_search(conn: sqlite3.Connection, source: str):
+    """Creează tabela FTS5 (external content) și triggerele de sincronizare; indexează la prima instalare"""
+    if source not in SOURCES or not _table_exists(conn, source):
+        return
+
+    table = fts_table(source)
+    columns = SOURCES[source]
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({source})")}
+    if not set(columns) <= existing:
+        logger.warning(f"Table {source} lacks text columns {set(columns) - existing}, skipping FTS index")
+        return
+
+    needs_rebuild = not _table_exists(conn, table)
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"NEW.{c}" for c in columns)
+    old_values = ', '.join(f"OLD.{c}" for c in columns)
+    watched = ', '.join(columns)
+
+    # Index external content: textul nu e duplicat, FTS5 citește coloanele din tabela sursă.
+    # INSERT OR REPLACE declanșează triggerul de ștergere doar cu recursive_triggers (vezi persistence.py).
+    conn.executescript(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+            {column_list},
+            content='{source}',
+            content_rowid='id',
+            tokenize='{TOKENIZER}',
+            prefix='{PREFIX_LENGTHS}'
+        );
+
+        DROP TRIGGER IF EXISTS trg_{table}_ins;
+        DROP TRIGGER IF EXISTS trg_{table}_del;
+        DROP TRIGGER IF EXISTS trg_{table}_upd;
+        CREATE TRIGGER trg_{table}_ins AFTER INSERT ON {source} BEGIN
+            INSERT INTO {table} (rowid, {column_list}) VALUES (NEW.id, {new_values});
+        END;
+        CREATE TRIGGER trg_{table}_del AFTER DELETE ON {source} BEGIN
+            INSERT INTO {table} ({table}, rowid, {column_list}) VALUES ('delete', OLD.id, {old_values});
+        END;
+        CREATE TRIGGER trg_{table}_upd AFTER UPDATE OF {watched} ON {source} BEGIN
+            INSERT INTO {table} ({table}, rowid, {column_list}) VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO {table} (rowid, {column_list}) VALUES (NEW.id, {new_values});
+        END;
+    """)
+
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    conn.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('rank', 'bm25({weights})')")
+
+    if needs_rebuild:
+        rebuild_text_search(conn, source)
+
+
+def rebuild_text_search(conn: sqlite3.Connection, source: str):
+    """Reconstruiește indexul din tabela sursă și compactează segmentele"""
+    table = fts_table(source)
+    conn.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+    conn.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+    logger.info(f"Rebuilt full-text index for {source}")
+
+
+class TextSearch:
+    """API de căutare peste indexul FTS5 al unei tabele sursă"""
+
+    def __init__(self, conn: sqlite3.Connection, source: str = 'ads'):
+        if source not in SOURCES:
+            raise ValueError(f"Unknown search source: {source}")
+        self.conn = conn
+        self.source = source
+        self.table = fts_table(source)
+        self.channel_column = SOURCES[source][2]
+
+    def search(self, text: str, limit: int = 20, cursor: Optional[str] = None,
+               order: str = 'rank', prefix: bool = False,
+               rank_window: Optional[int] = RANK_WINDOW) -> SearchPage:
+        """
+        Caută reclamele care conțin toate cuvintele din text.
+        order='rank' - relevanță bm25; order='recent' - cele mai noi întâi (id descrescător).
+        cursor - next_cursor din pagina anterioară (aceiași text/order/prefix/rank_window).
+        prefix=True - ultimul cuvânt poate fi incomplet (autocomplete).
+        rank_window - cu order='rank', câte potriviri (cele mai noi) se ordonează după bm25;
+        None = toate (exact, dar costul crește cu numărul de potriviri). Dacă limita a exclus
+        potriviri, pagina are truncated=True.
+        """
+        match = build_match_query(text, prefix)
+        if match is None:
+            return SearchPage()
+
+        floor = 0
+        if order == 'rank':
+            floor, score, last_id = self._parse_rank_cursor(cursor) if cursor else (self._rank_floor(match, rank_window), None, None)
+            where, params = self._rank_where(floor, score, last_id)
+            rows = self._fetch(match, where, params, 'rank, rowid', limit)
+        elif order == 'recent':
+            where, params = ("AND rowid < ?", [int(cursor)]) if cursor else ("", [])
+            rows = self._fetch(match, where, params, 'rowid DESC', limit)
+        else:
+            raise ValueError(f"Unknown search order: {order}")
+
+        results = [SearchResult(id=row[0], video_id=row[1], title=row[2], channel=row[3],
+                                snippet=row[4], score=row[5]) for row in rows]
+
+        next_cursor = None
+        if len(results) == limit:
+            last = results[-1]
+            next_cursor = f"{floor}:{last.score!r}:{last.id}" if order == 'rank' else str(last.id)
+        return SearchPage(results=results, next_cursor=next_cursor, truncated=floor > 0)
+
+    def count(self, text: str, prefix: bool = False) -> int:
+        """Toate potrivirile; cu order='rank' și truncated=True paginile cuprind doar rank_window dintre ele"""
+        match = build_match_query(text, prefix)
+        if match is None:
+            return 0
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE {self.table} MATCH ?", (match,)
+        ).fetchone()[0]
+
+    def _rank_floor(self, match: str, rank_window: Optional[int]) -> int:
+        """
+        Cel mai mic rowid inclus în clasament; 0 dacă toate potrivirile încap în fereastră
+        (parcurgerea după rowid e ieftină, bm25 nu se calculează aici)
+        """
+        if rank_window is None:
+            return 0
+        rows = self.conn.execute(f"""
+            SELECT rowid FROM {self.table} WHERE {self.table} MATCH ?
+            ORDER BY rowid DESC LIMIT 2 OFFSET ?
+        """, (match, max(rank_window, 1) - 1)).fetchall()
+        return rows[0][0] if len(rows) == 2 else 0
+
+    @staticmethod
+    def _rank_where(floor: int, score: Optional[float], last_id: Optional[int]) -> Tuple[str, list]:
+        where, params = "AND rowid >= ?", [floor]
+        if score is not None:
+            where += " AND (rank > ? OR (rank = ? AND rowid > ?))"
+            params += [score, score, last_id]
+        return where, params
+
+    def _fetch(self, match: str, where: str, params: list, order: str, limit: int):
+        rows = self.conn.execute(f"""
+            SELECT s.id, s.video_id, s.title, s.{self.channel_column}, f.score
+            FROM (
+                SELECT rowid, rank AS score
+                FROM {self.table}
+                WHERE {self.table} MATCH ? {where}
+                ORDER BY {order}
+                LIMIT ?
+            ) f
+            JOIN {self.source} s ON s.id = f.rowid
+            ORDER BY {order.replace('rank', 'f.score').replace('rowid', 's.id')}
+        """, [match] + params + [limit]).fetchall()
+        if not rows:
+            return []
+
+        # snippet() într-o a doua interogare, doar pentru rândurile paginii (nu pentru toate potrivirile)
+        ids = [row[0] for row in rows]
+        snippet = f"snippet({self.table}, -1, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', {SNIPPET_TOKENS})"
+        snippets = dict(self.conn.execute(f"""
+            SELECT rowid, {snippet} FROM {self.table}
+            WHERE {self.table} MATCH ? AND rowid IN ({', '.join('?' * len(ids))})
+        """, [match] + ids))
+        return [(ad_id, video_id, title, channel, snippets.get(ad_id, ''), score)
+                for ad_id, video_id, title, channel, score in rows]
+
+    @staticmethod
+    def _parse_rank_cursor(cursor: str) -> Tuple[int, float, int]:
+        try:
+            floor, score, last_id = cursor.split(':')
+            return int(floor), float(score), int(last_id)
+        except ValueError:
+            raise ValueError(f"Invalid search cursor: {cursor}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] not in ('rebuild', 'search'):
+        print("Usage: text_search.py rebuild [database_path] [source_table]")
+        print("       text_search.py search \"query\" [database_path] [source_table]")
+        sys.exit(1)
+
+    if sys.argv[1] == 'rebuild':
+        db_path = sys.argv[2] if len(sys.argv) > 2 else '/data/ads/ads_database.db'
+        sources: List[str] = [sys.argv[3]] if len(sys.argv) > 3 else list(SOURCES)
+        with sqlite3.connect(db_path) as conn:
+            for source in sources:
+                if _table_exists(conn, source):
+                    install_text_search(conn, source)
+                    rebuild_text_search(conn, source)
+        return
+
+    if len(sys.argv) < 3:
+        print("Usage: text_search.py search \"query\" [database_path] [source_table]")
+        sys.exit(1)
+    db_path = sys.argv[3] if len(sys.argv) > 3 else '/data/ads/ads_database.db'
+    source = sys.argv[4] if len(sys.argv) > 4 else 'ads'
+    with sqlite3.connect(db_path) as conn:
+        page = TextSearch(conn, source).search(sys.argv[2])
+        for result in page.results:
+            print(f"{result.score:8.3f}  {result.video_id}  {result.channel}  {result.snippet}")
+        if page.truncated:
+            print(f"(ranked among the newest {RANK_WINDOW} matches only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Descărcare concurentă a thumbnail-urilor cu pool de conexiuni keep-alive
+Imaginile se decodează direct din memorie, fără fișiere temporare
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import('cv2')
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_URL_TEMPLATE = "https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
+
+
+class ThumbnailFetcher:
+    def __init__(self, max_concurrency: int = 8, timeout: int = 10):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix='thumb'
+        )
+        # O sesiune per thread - requests.Session nu e garantat thread-safe,
+        # dar fiecare sesiune își păstrează conexiunile keep-alive
+        self._local = threading.local()
+        self._pool_size = max_concurrency
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._local.session = session
+        return session
+
+    def fetch(self, video_id: str) -> Optional[np.ndarray]:
+        """Descarcă și decodează thumbnail-ul (blocant)"""
+        url = THUMBNAIL_URL_TEMPLATE.format(video_id=video_id)
+        try:
+            response = self._session().get(url, timeout=self.timeout)
+            if response.status_code != 200:
+                logger.debug(f"Thumbnail not available for {video_id}: HTTP {response.status_code}")
+                return None
+
+            buffer = np.frombuffer(response.content, dtype=np.uint8)
+            return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        except Exception as e:
+            logger.warning(f"Thumbnail fetch failed for {video_id}: {e}")
+            return None
+
+    async def fetch_async(self, video_id: str) -> Optional[np.ndarray]:
+        """Descarcă thumbnail-ul în afara event loop-ului, cu concurență limitată"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.fetch, video_id)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Codificare binară pentru vectorii MFCC/chroma: BLOB float32 little-endian cu header de versiune
+Decodare fără copiere (numpy.frombuffer), încărcare în masă ca matrice și migrarea rândurilor JSON vechi
+
+Utilizare: python3 scripts/vector_codec.py migrate [cale_baza_de_date]
+"""
+
+import sys
+import json
+import struct
+import sqlite3
+import logging
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Header: magic 'FV', versiune format, rezervat, număr de elemente
+HEADER = struct.Struct('<2sBBH')
+MAGIC = b'FV'
+FORMAT_VERSION = 1
+DTYPE = np.dtype('<f4')
+
+VECTOR_COLUMNS = {
+    'mfcc_features': 13,
+    'chroma_features': 12
+}
+
+
+def encode_vector(values: Iterable[float]) -> bytes:
+    """Vector -> BLOB (header + float32 little-endian)"""
+    array = np.asarray(values, dtype=DTYPE)
+    return HEADER.pack(MAGIC, FORMAT_VERSION, 0, array.size) + array.tobytes()
+
+
+def is_encoded(value) -> bool:
+    return isinstance(value, (bytes, memoryview)) and bytes(value[:2]) == MAGIC
+
+
+def decode_vector(value: Union[bytes, memoryview, str, None]) -> Optional[np.ndarray]:
+    """BLOB -> vector numpy read-only, fără copiere; acceptă și formatul JSON vechi"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return np.asarray(json.loads(value), dtype=DTYPE)
+
+    magic, version, _, count = HEADER.unpack_from(value)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported vector encoding (magic={magic!r}, version={version})")
+    return np.frombuffer(value, dtype=DTYPE, count=count, offset=HEADER.size)
+
+
+def load_feature_matrix(conn: sqlite3.Connection, column: str = 'mfcc_features') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Încarcă vectorii tuturor reclamelor într-o singură interogare.
+    Returnează (ad_ids, matrice (N, dim)) - ex. (N, 13) pentru MFCC, (N, 12) pentru chroma.
+    """
+    if column not in VECTOR_COLUMNS:
+        raise ValueError(f"Unknown vector column: {column}")
+    dim = VECTOR_COLUMNS[column]
+    expected = HEADER.size + dim * DTYPE.itemsize
+
+    ad_ids: List[int] = []
+    payloads: List[bytes] = []
+    rows = conn.execute(f"""
+        SELECT ad_id, {column} FROM audio_features
+        WHERE {column} IS NOT NULL
+        ORDER BY ad_id
+    """)
+    for ad_id, value in rows:
+        if isinstance(value, bytes) and len(value) == expected and value[:2] == MAGIC:
+            ad_ids.append(ad_id)
+            payloads.append(value[HEADER.size:])
+        elif isinstance(value, str):
+            # Rând nemigrat - convertit pe loc
+            vector = decode_vector(value)
+            if vector.size == dim:
+                ad_ids.append(ad_id)
+                payloads.append(vector.tobytes())
+
+    if not payloads:
+        return np.empty(0, dtype=np.int64), np.empty((0, dim), dtype=DTYPE)
+
+    matrix = np.frombuffer(b''.join(payloads), dtype=DTYPE).reshape(-1, dim)
+    return np.asarray(ad_ids, dtype=np.int64), matrix
+
+
+def migrate_vectors(db_path: str, batch_size: int = 1000) -> int:
+    """Convertește coloanele MFCC/chroma din JSON text în BLOB-uri binare"""
+    converted = 0
+    with sqlite3.connect(db_path) as conn:
+        for column in VECTOR_COLUMNS:
+            while True:
+                rows = conn.execute(f"""
+                    SELECT ad_id, {column} FROM audio_features
+                    WHERE typeof({column}) = 'text'
+                    LIMIT ?
+                """, (batch_size,)).fetchall()
+                if not rows:
+                    break
+
+                updates = []
+                for ad_id, value in rows:
+                    try:
+                        updates.append((encode_vector(json.loads(value)), ad_id))
+                    except (ValueError, TypeError):
+                        updates.append((None, ad_id))  # valoare invalidă - nu mai poate fi citită
+                conn.executemany(f"UPDATE audio_features SET {column} = ? WHERE ad_id = ?", updates)
+                conn.commit()
+                converted += len(updates)
+
+    logger.info(f"Migrated {converted} vector values to binary encoding")
+    return converted
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print("Usage: vector_codec.py migrate [database_path]")
+        sys.exit(1)
+
+    db_path = sys.argv[2] if len(sys.argv) > 2 else '/data/ads/ads_database.db'
+    migrate_vectors(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("VACUUM")
+
+
+if __name__ == "__main__":
+    main()
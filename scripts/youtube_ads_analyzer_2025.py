@@ -3,25 +3,28 @@ import sqlite3
 import subprocess
 import logging
 import json
-import librosa
-import numpy as np
-import torch
-import torchaudio
-from scipy.signal import correlate
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 import time
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from contextlib import contextmanager
 import psutil
 from datetime import datetime, timedelta
-import cv2
-from PIL import Image
-import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import re
+from lazy_imports import lazy_import
+from persistence import get_persistence
+from perceptual_hash import to_signed
+from download_engine import DownloadEngine
+from thumbnail_fetcher import ThumbnailFetcher
+from scratch import ScratchSpace, choose_root
+from epoch_columns import now_epoch, to_epoch
+from job_queue import ANALYSIS_QUEUE, JobQueue
+from priority_scheduler import CycleBudget, PriorityScheduler, load_channel_history
+
+discovery = lazy_import('googleapiclient.discovery')
+errors = lazy_import('googleapiclient.errors')
+librosa = lazy_import('librosa')
 
 # Configurare logging îmbunătățită
 logging.basicConfig(
@@ -46,6 +49,13 @@ class AnalysisConfig:
     RATE_LIMIT_CALLS_PER_MINUTE: int = 90
     ANALYSIS_START_DATE: str = '2025-01-01T00:00:00Z'
     ANALYSIS_END_DATE: str = '2025-12-31T23:59:59Z'
+    JOBS_DATABASE_PATH: str = '/data/ads/jobs.db'  # coadă comună cu celelalte instanțe (scripts/job_queue.py)
+    JOB_LEASE_SECONDS: int = 900  # acoperă analiza și salvarea batch-ului de 50
+    REANALYSIS_AFTER_SECONDS: int = 86400  # un video analizat poate fi re-analizat după o zi
+    # Bugetele unei rulări (0 = nelimitat); reclamele cele mai probabile și mai noi sunt analizate primele
+    ANALYSIS_CPU_BUDGET_SECONDS: float = 0
+    ANALYSIS_MAX_VIDEOS: int = 0
+    THUMBNAIL_CONCURRENCY: int = 8
 
 class YouTube2025Analyzer:
     def __init__(self, config: AnalysisConfig):
@@ -54,6 +64,20 @@ class YouTube2025Analyzer:
         self.current_key_index = 0
         self.youtube = self._get_youtube_service()
         self.processed_videos = set()
+        self.persistence = get_persistence(config.DATABASE_PATH)
+        self.jobs = JobQueue(config.JOBS_DATABASE_PATH, lease_seconds=config.JOB_LEASE_SECONDS)
+        self.claimed_jobs = {}  # video_id -> Job, confirmate după salvarea batch-ului
+        # Descărcarea și kernel-urile de analiză sunt cele din improved_crawler
+        self.thumbnail_fetcher = ThumbnailFetcher(max_concurrency=config.THUMBNAIL_CONCURRENCY)
+        self.downloader = None
+        if DownloadEngine.available():
+            self.downloader = DownloadEngine(workers=config.MAX_WORKERS, retries=config.MAX_RETRIES)
+        else:
+            logger.warning("yt_dlp is not installed, audio analysis disabled")
+        self.scratch = ScratchSpace(choose_root(None, config.TEMP_DIR, 0))
+        self.scheduler = PriorityScheduler(CycleBudget.from_config(
+            cpu_seconds=config.ANALYSIS_CPU_BUDGET_SECONDS, items=config.ANALYSIS_MAX_VIDEOS
+        ))
         self.analysis_stats = {
             'total_videos_found': 0,
             'total_ads_detected': 0,
@@ -78,10 +102,10 @@ class YouTube2025Analyzer:
         for attempt in range(len(self.api_keys)):
             try:
                 key = self.api_keys[self.current_key_index]
-                service = build('youtube', 'v3', developerKey=key)
+                service = discovery.build('youtube', 'v3', developerKey=key)
                 logger.info(f"Using API key index {self.current_key_index}")
                 return service
-            except HttpError as e:
+            except errors.HttpError as e:
                 logger.warning(f"API key {self.current_key_index} failed: {e}")
                 self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
                 continue
@@ -199,7 +223,7 @@ class YouTube2025Analyzer:
                 
                 logger.info(f"Found {len(videos)} videos for this query. Total so far: {len(all_videos)}")
                 
-            except HttpError as e:
+            except errors.HttpError as e:
                 if e.resp.status == 403:  # Quota exceeded
                     logger.warning("API quota exceeded, rotating key")
                     self._rotate_api_key()
@@ -330,19 +354,29 @@ class YouTube2025Analyzer:
                 logger.debug(f"Video {video_id} not detected as ad, skipping detailed analysis")
                 return None
             
-            # Obține statistici video
-            stats = await self._get_video_statistics(video_id)
-            
-            # Analiză audio (dacă este detectată ca reclamă)
-            audio_features = None
-            if ad_detection['confidence'] > 0.7:
-                try:
-                    audio_features = await self._analyze_audio_features(video_id)
-                except Exception as e:
-                    logger.warning(f"Audio analysis failed for {video_id}: {e}")
+            # Revendicare atomică înainte de statistici și descărcarea audio
+            job = await self.jobs.claim_key_async(ANALYSIS_QUEUE, video_id,
+                                                  reclaim_done_after=self.config.REANALYSIS_AFTER_SECONDS)
+            if job is None:
+                logger.debug(f"Video {video_id} claimed by another analyzer, skipping")
+                return None
             
-            # Analiză thumbnail
-            thumbnail_features = self._analyze_thumbnail(video_id)
+            async with self.jobs.processing(job, ack=False):
+                # Obține statistici video
+                stats = await self._get_video_statistics(video_id)
+                
+                # Analiză audio (dacă este detectată ca reclamă)
+                audio_features = None
+                if (self.downloader and ad_detection['confidence'] > 0.7
+                        and not self.scheduler.budget_exhausted()):
+                    try:
+                        audio_features = await self._analyze_audio_features(video_id)
+                    except Exception as e:
+                        logger.warning(f"Audio analysis failed for {video_id}: {e}")
+                
+                # Analiză thumbnail
+                thumbnail_features = await self._analyze_thumbnail(video_id)
+            self.claimed_jobs[video_id] = job
             
             # Clasificare categorii
             category = self._classify_ad_category(snippet)
@@ -369,6 +403,37 @@ class YouTube2025Analyzer:
             self.analysis_stats['total_errors'] += 1
             return None
     
+    async def _analyze_audio_features(self, video_id: str) -> Dict[str, Any]:
+        """Descarcă audio-ul în scratch și rulează kernel-urile audio din improved_crawler"""
+        async with self.scratch.job(video_id) as job_dir:
+            audio_file = await self.downloader.download_audio(
+                video_id, job_dir, timeout=self.config.DOWNLOAD_TIMEOUT
+            )
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._audio_features_from_file, audio_file
+            )
+    
+    def _audio_features_from_file(self, audio_file: str) -> Dict[str, Any]:
+        from improved_crawler import YouTubeCrawler  # după configurarea logging-ului acestui modul
+        y, sr = librosa.load(audio_file, duration=self.config.AUDIO_DURATION)
+        if len(y) == 0:
+            raise RuntimeError(f"Empty audio in {audio_file}")
+        return YouTubeCrawler.compute_audio_features(y, sr)
+    
+    async def _analyze_thumbnail(self, video_id: str) -> Dict[str, Any]:
+        """Caracteristicile vizuale ale thumbnail-ului; None dacă nu poate fi descărcat sau analizat"""
+        from improved_crawler import YouTubeCrawler
+        try:
+            img = await self.thumbnail_fetcher.fetch_async(video_id)
+            if img is None:
+                return None
+            return await asyncio.get_running_loop().run_in_executor(
+                None, YouTubeCrawler.compute_visual_features, img
+            )
+        except Exception as e:
+            logger.warning(f"Thumbnail analysis failed for {video_id}: {e}")
+            return None
+    
     async def _get_video_statistics(self, video_id: str) -> Dict[str, Any]:
         """Obține statisticile unui video"""
         try:
@@ -431,63 +496,104 @@ class YouTube2025Analyzer:
         
         return 'other'
     
-    async def save_analysis_results(self, results: List[Dict[str, Any]]):
-        """Salvează rezultatele analizei în baza de date"""
+    async def save_analysis_results(self, results: List[Dict[str, Any]]) -> Dict[str, Future]:
+        """Salvează rezultatele analizei în baza de date; întoarce video_id -> Future-ul scrierii"""
+        writes: Dict[str, Future] = {}
         try:
-            with sqlite3.connect(self.config.DATABASE_PATH) as conn:
-                cursor = conn.cursor()
+            saved = 0
+            for result in results:
+                if not result:
+                    continue
                 
-                for result in results:
-                    if not result:
-                        continue
-                    
-                    # Inserează în tabela ads
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO ads (
-                            video_id, url, source, type, title, published_at, channel,
-                            description, views, likes, comments_count, engagement_rate,
-                            confidence_score, ad_type, duration, timestamp
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                # Inserează în tabela ads; la re-analiză actualizează rândul existent
+                # (id-ul rămâne același, deci audio_features/visual_features rămân legate)
+                statements = [("""
+                    INSERT INTO ads (
+                        video_id, url, source, type, title, published_at, channel,
+                        description, views, likes, comments_count, engagement_rate,
+                        confidence_score, ad_type, duration, timestamp, created_epoch, published_epoch
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?)
+                    ON CONFLICT(video_id) DO UPDATE SET
+                        title = excluded.title,
+                        description = excluded.description,
+                        views = excluded.views,
+                        likes = excluded.likes,
+                        comments_count = excluded.comments_count,
+                        engagement_rate = excluded.engagement_rate,
+                        confidence_score = excluded.confidence_score,
+                        ad_type = excluded.ad_type,
+                        duration = excluded.duration
+                """, (
+                    result['video_id'],
+                    f"https://youtube.com/watch?v={result['video_id']}",
+                    "YouTube",
+                    "advertisement",
+                    result['title'],
+                    result['published_at'],
+                    result['channel'],
+                    result['description'],
+                    result['statistics']['views'],
+                    result['statistics']['likes'],
+                    result['statistics']['comments'],
+                    result['statistics']['engagement_rate'],
+                    result['ad_detection']['confidence'],
+                    result['category'],
+                    result['statistics']['duration'],
+                    now_epoch(),
+                    to_epoch(result['published_at']),
+                ))]
+                
+                # Inserează audio features dacă există
+                if result['audio_features']:
+                    statements.append(("""
+                        INSERT INTO audio_features (
+                            ad_id, tempo, energy, spectral_centroid,
+                            speech_ratio, analysis_data
+                        ) VALUES ((SELECT id FROM ads WHERE video_id = ?), ?, ?, ?, ?, ?)
+                        ON CONFLICT(ad_id) DO UPDATE SET
+                            tempo = excluded.tempo,
+                            energy = excluded.energy,
+                            spectral_centroid = excluded.spectral_centroid,
+                            speech_ratio = excluded.speech_ratio,
+                            analysis_data = excluded.analysis_data
                     """, (
                         result['video_id'],
-                        f"https://youtube.com/watch?v={result['video_id']}",
-                        "YouTube",
-                        "advertisement",
-                        result['title'],
-                        result['published_at'],
-                        result['channel'],
-                        result['description'],
-                        result['statistics']['views'],
-                        result['statistics']['likes'],
-                        result['statistics']['comments'],
-                        result['statistics']['engagement_rate'],
-                        result['ad_detection']['confidence'],
-                        result['category'],
-                        result['statistics']['duration'],
-                    ))
-                    
-                    ad_id = cursor.lastrowid
-                    
-                    # Inserează audio features dacă există
-                    if result['audio_features']:
-                        cursor.execute("""
-                            INSERT OR REPLACE INTO audio_features (
-                                ad_id, tempo, energy, spectral_centroid,
-                                speech_ratio, analysis_data
-                            ) VALUES (?, ?, ?, ?, ?, ?)
-                        """, (
-                            ad_id,
-                            result['audio_features'].get('tempo', 0),
-                            result['audio_features'].get('energy', 0),
-                            result['audio_features'].get('spectral_centroid', 0),
-                            result['audio_features'].get('speech_ratio', 0),
-                            json.dumps(result['audio_features'])
-                        ))
+                        result['audio_features'].get('tempo', 0),
+                        result['audio_features'].get('energy', 0),
+                        result['audio_features'].get('spectral_centroid', 0),
+                        result['audio_features'].get('speech_ratio', 0),
+                        json.dumps(result['audio_features'])
+                    )))
                 
-                logger.info(f"Saved {len(results)} analysis results to database")
+                # Inserează caracteristicile vizuale dacă există
+                if result['thumbnail_features']:
+                    statements.append(("""
+                        INSERT INTO visual_features (
+                            ad_id, text_density, brightness, color_palette, phash, dhash
+                        ) VALUES ((SELECT id FROM ads WHERE video_id = ?), ?, ?, ?, ?, ?)
+                        ON CONFLICT(ad_id) DO UPDATE SET
+                            text_density = excluded.text_density,
+                            brightness = excluded.brightness,
+                            color_palette = excluded.color_palette,
+                            phash = excluded.phash,
+                            dhash = excluded.dhash
+                    """, (
+                        result['video_id'],
+                        result['thumbnail_features']['text_density'],
+                        result['thumbnail_features']['brightness'],
+                        json.dumps(result['thumbnail_features']['dominant_colors']),
+                        to_signed(result['thumbnail_features']['phash']),
+                        to_signed(result['thumbnail_features']['dhash'])
+                    )))
+                
+                writes[result['video_id']] = self.persistence.submit(statements)
+                saved += 1
+            
+            logger.info(f"Queued {saved} analysis results for database")
                 
         except Exception as e:
             logger.error(f"Error saving results to database: {e}")
+        return writes
     
     async def run_comprehensive_analysis(self):
         """Rulează analiza comprehensivă pentru toate reclamele din 2025"""
@@ -499,14 +605,34 @@ class YouTube2025Analyzer:
             logger.info("Phase 1: Comprehensive video search")
             all_videos = await self.search_videos_comprehensive()
             
-            # Analiză în batch-uri
+            # Doar reclamele detectate intră în analiza costisitoare, în ordinea priorității
             logger.info("Phase 2: Detailed video analysis")
+            with self.persistence.reader() as conn:
+                self.scheduler.channel_history = load_channel_history(conn)
+            for video in all_videos:
+                ad_detection = self.detect_ad_content(video)
+                if not ad_detection['is_ad']:
+                    continue
+                snippet = video.get('snippet', {})
+                video_id = video['id']['videoId'] if 'id' in video else video.get('videoId')
+                self.scheduler.push(video_id, video, ad_detection['confidence'],
+                                    snippet.get('publishedAt'), snippet.get('channelTitle'))
+            
             batch_size = 50
             all_results = []
+            batch_number = 0
             
-            for i in range(0, len(all_videos), batch_size):
-                batch = all_videos[i:i + batch_size]
-                logger.info(f"Processing batch {i//batch_size + 1}/{(len(all_videos) + batch_size - 1)//batch_size}")
+            while True:
+                batch = []
+                while len(batch) < batch_size:
+                    video = self.scheduler.pop()
+                    if video is None:
+                        break
+                    batch.append(video)
+                if not batch:
+                    break
+                batch_number += 1
+                logger.info(f"Processing batch {batch_number} ({len(batch)} videos, {len(self.scheduler)} queued)")
                 
                 # Procesează batch-ul în paralel
                 tasks = [self.analyze_video_comprehensive(video) for video in batch]
@@ -516,13 +642,22 @@ class YouTube2025Analyzer:
                 valid_results = [r for r in batch_results if r and not isinstance(r, Exception)]
                 all_results.extend(valid_results)
                 
-                # Salvează rezultatele batch-ului
+                # Salvează rezultatele batch-ului; ack doar pentru scrierile commit-ate, altfel nack (reîncercare)
+                writes = {}
                 if valid_results:
-                    await self.save_analysis_results(valid_results)
+                    writes = await self.save_analysis_results(valid_results)
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self.persistence.flush, self.config.JOB_LEASE_SECONDS)
+                for result in valid_results:
+                    job = self.claimed_jobs.pop(result['video_id'], None)
+                    if job:
+                        await self._settle_job(job, writes.get(result['video_id']))
                 
                 # Rate limiting între batch-uri
                 await asyncio.sleep(2)
             
+            self.scheduler.end_cycle()
+            
             # Statistici finale
             end_time = datetime.now()
             self.analysis_stats['processing_time'] = (end_time - start_time).total_seconds()
@@ -541,28 +676,41 @@ class YouTube2025Analyzer:
             logger.error(f"Critical error in comprehensive analysis: {e}")
             raise
     
+    async def _settle_job(self, job, write: Optional[Future]):
+        """Ack dacă scrierea jobului a fost commit-ată, nack cu eroarea altfel"""
+        if write is None:
+            error = "analysis result was not queued for saving"
+        elif not write.done():
+            error = "write not committed within the job lease"
+        else:
+            failure = write.exception()
+            if failure is None:
+                await self.jobs.ack_async(job)
+                return
+            error = f"{type(failure).__name__}: {failure}"
+        logger.warning(f"Save failed for {job.key}, job will be retried: {error}")
+        await self.jobs.nack_async(job, error)
+    
     async def _save_analysis_statistics(self):
         """Salvează statisticile analizei"""
         try:
-            with sqlite3.connect(self.config.DATABASE_PATH) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    INSERT INTO analysis_runs (
-                        start_date, end_date, total_videos_found, total_ads_detected,
-                        total_errors, api_calls_made, processing_time, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                """, (
-                    self.config.ANALYSIS_START_DATE,
-                    self.config.ANALYSIS_END_DATE,
-                    self.analysis_stats['total_videos_found'],
-                    self.analysis_stats['total_ads_detected'],
-                    self.analysis_stats['total_errors'],
-                    self.analysis_stats['api_calls_made'],
-                    self.analysis_stats['processing_time']
-                ))
-                
-                logger.info("Analysis statistics saved to database")
+            self.persistence.execute("""
+                INSERT INTO analysis_runs (
+                    start_date, end_date, total_videos_found, total_ads_detected,
+                    total_errors, api_calls_made, processing_time, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (
+                self.config.ANALYSIS_START_DATE,
+                self.config.ANALYSIS_END_DATE,
+                self.analysis_stats['total_videos_found'],
+                self.analysis_stats['total_ads_detected'],
+                self.analysis_stats['total_errors'],
+                self.analysis_stats['api_calls_made'],
+                self.analysis_stats['processing_time']
+            ))
+            await asyncio.get_running_loop().run_in_executor(None, self.persistence.flush)
+            
+            logger.info("Analysis statistics saved to database")
                 
         except Exception as e:
             logger.error(f"Error saving analysis statistics: {e}")
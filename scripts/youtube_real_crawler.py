@@ -16,6 +16,13 @@ import requests
 import threading
 from dataclasses import dataclass
 from typing import List, Dict, Any
+from persistence import get_persistence
+from aggregates import install_aggregates
+from text_search import install_text_search
+from epoch_columns import install_epoch_columns, now_epoch, to_epoch
+from job_queue import INGEST_QUEUE, JobQueue
+from priority_scheduler import CycleBudget, PriorityScheduler, load_channel_history
+from crawl_scheduler import DETAILS_UNITS, SEARCH_UNITS, CrawlScheduler
 
 # Configurare logging
 logging.basicConfig(
@@ -28,13 +35,32 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Queries pentru căutare
+SEARCH_QUERIES = [
+    "advertisement 2025",
+    "commercial 2025",
+    "publicitate 2025",
+    "reclamă 2025",
+    "promo 2025",
+    "sponsored content",
+    "marketing campaign",
+    "brand advertisement",
+    "product launch 2025",
+    "new product commercial"
+]
+
 @dataclass
 class CrawlerConfig:
     DATABASE_PATH: str = '/data/ads/ads_database.db'
     API_KEYS_FILE: str = 'api_keys.json'
-    CRAWL_INTERVAL: int = 300  # 5 minute
+    CRAWL_INTERVAL: int = 300  # 5 minute - cel mai scurt interval între două rulări ale unui query
+    MAX_CRAWL_INTERVAL: int = 6 * 3600  # query-urile fără rezultate noi
+    QUOTA_UNITS_PER_DAY: int = 10000  # quota YouTube Data API (search = 100, videos.list = 1)
     MAX_RESULTS_PER_SEARCH: int = 50
     RATE_LIMIT_DELAY: int = 2  # secunde între requests
+    JOBS_DATABASE_PATH: str = '/data/ads/jobs.db'  # coadă comună cu celelalte instanțe de crawler
+    MAX_ADS_PER_CYCLE: int = 0  # bugetul de cereri de statistici per ciclu (0 = nelimitat)
+    CYCLE_CPU_BUDGET_SECONDS: float = 0
 
 class RealYouTubeCrawler:
     def __init__(self, config: CrawlerConfig):
@@ -47,11 +73,23 @@ class RealYouTubeCrawler:
             'total_videos_checked': 0,
             'total_ads_found': 0,
             'api_calls_made': 0,
+            'detail_calls': 0,      # apeluri videos.list emise (pentru costul de quota al query-ului)
             'errors': 0,
             'last_run': None
         }
         self._init_youtube_service()
         self._init_database()
+        self.persistence = get_persistence(self.config.DATABASE_PATH)
+        self.jobs = JobQueue(self.config.JOBS_DATABASE_PATH)
+        # Fiecare query e rulat după rata lui de videoclipuri noi, în limita quota-ului zilnic
+        self.crawl_scheduler = CrawlScheduler(
+            SEARCH_QUERIES, self.config.DATABASE_PATH, units_per_day=self.config.QUOTA_UNITS_PER_DAY,
+            min_interval=self.config.CRAWL_INTERVAL, max_interval=self.config.MAX_CRAWL_INTERVAL
+        )
+        # Reclamele amânate rămân în coadă pentru ciclul următor (cu aging)
+        self.scheduler = PriorityScheduler(CycleBudget.from_config(
+            cpu_seconds=self.config.CYCLE_CPU_BUDGET_SECONDS, items=self.config.MAX_ADS_PER_CYCLE
+        ))
     
     def _load_api_keys(self) -> List[str]:
         """Încarcă cheile API YouTube"""
@@ -110,10 +148,20 @@ class RealYouTubeCrawler:
                         duration INTEGER DEFAULT 0,
                         thumbnail_url TEXT,
                         created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        created_epoch INTEGER,
+                        published_epoch INTEGER
                     )
                 """)
                 
+                # Schema din init_database.sql nu are coloanele acestui crawler
+                existing = {row[1] for row in cursor.execute("PRAGMA table_info(ads)")}
+                for name, definition in (('confidence_score', 'REAL DEFAULT 0.0'), ('ad_type', 'TEXT'),
+                                         ('thumbnail_url', 'TEXT')):
+                    if name not in existing:
+                        cursor.execute(f"ALTER TABLE ads ADD COLUMN {name} {definition}")
+                        logger.info(f"Added column ads.{name}")
+                
                 # Creează tabela pentru statistici crawler
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS crawler_stats (
@@ -131,6 +179,15 @@ class RealYouTubeCrawler:
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON ads(created_at)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_ad_type ON ads(ad_type)")
                 
+                # Tabele agregate menținute incremental pentru dashboard
+                install_aggregates(conn, 'ads')
+                
+                # Index full-text (titlu, descriere, canal)
+                install_text_search(conn, 'ads')
+                
+                # Coloane epoch + indexuri pentru interogările pe ferestre de timp
+                install_epoch_columns(conn, 'ads')
+                
                 logger.info("Database initialized successfully")
                 
         except Exception as e:
@@ -217,6 +274,7 @@ class RealYouTubeCrawler:
                 part="statistics,contentDetails",
                 id=video_id
             )
+            self.stats['detail_calls'] += 1  # numărat și dacă apelul eșuează: quota e consumată
             response = request.execute()
             self.stats['api_calls_made'] += 1
             
@@ -317,127 +375,154 @@ class RealYouTubeCrawler:
             self._init_youtube_service()
             logger.info(f"Rotated to API key {self.current_key_index}")
     
-    async def _save_ad_to_database(self, video_data: Dict, ad_detection: Dict, statistics: Dict):
-        """Salvează reclama în baza de date"""
+    async def _save_ad_to_database(self, video_data: Dict, ad_detection: Dict, statistics: Dict) -> bool:
+        """
+        Salvează reclama în baza de date și așteaptă commit-ul; True dacă rândul a fost inserat.
+        O scriere eșuată ridică excepția, deci jobul primește nack și e reîncercat.
+        """
         try:
-            with sqlite3.connect(self.config.DATABASE_PATH) as conn:
-                cursor = conn.cursor()
-                
-                snippet = video_data['snippet']
-                video_id = video_data['video_id']
-                
-                # Verifică dacă există deja
-                cursor.execute("SELECT id FROM ads WHERE video_id = ?", (video_id,))
-                if cursor.fetchone():
-                    logger.debug(f"Video {video_id} already exists in database")
-                    return
-                
-                # Inserează noua reclamă
-                cursor.execute("""
-                    INSERT INTO ads (
-                        video_id, url, title, published_at, channel, description,
-                        views, likes, comments_count, engagement_rate, confidence_score,
-                        ad_type, duration, thumbnail_url
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    video_id,
-                    f"https://youtube.com/watch?v={video_id}",
-                    snippet['title'],
-                    snippet.get('publishedAt', ''),
-                    snippet['channelTitle'],
-                    snippet.get('description', '')[:500],  # Limitează descrierea
-                    statistics['views'],
-                    statistics['likes'],
-                    statistics['comments'],
-                    statistics['engagement_rate'],
-                    ad_detection['confidence'],
-                    self._classify_ad_type(snippet),
-                    statistics['duration'],
-                    snippet.get('thumbnails', {}).get('medium', {}).get('url', '')
-                ))
-                
-                self.stats['total_ads_found'] += 1
-                logger.info(f"Saved new ad: {snippet['title'][:50]}...")
+            snippet = video_data['snippet']
+            video_id = video_data['video_id']
+            
+            # Verifică dacă există deja
+            if self.persistence.fetchone("SELECT id FROM ads WHERE video_id = ?", (video_id,)):
+                logger.debug(f"Video {video_id} already exists in database")
+                return False
+            
+            # Inserează noua reclamă (prin writer-ul comun); INSERT OR IGNORE poate să nu insereze nimic
+            write = self.persistence.execute("""
+                INSERT OR IGNORE INTO ads (
+                    video_id, url, title, published_at, channel, description,
+                    views, likes, comments_count, engagement_rate, confidence_score,
+                    ad_type, duration, thumbnail_url, created_epoch, published_epoch
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                video_id,
+                f"https://youtube.com/watch?v={video_id}",
+                snippet['title'],
+                snippet.get('publishedAt', ''),
+                snippet['channelTitle'],
+                snippet.get('description', '')[:500],  # Limitează descrierea
+                statistics['views'],
+                statistics['likes'],
+                statistics['comments'],
+                statistics['engagement_rate'],
+                ad_detection['confidence'],
+                self._classify_ad_type(snippet),
+                statistics['duration'],
+                snippet.get('thumbnails', {}).get('medium', {}).get('url', ''),
+                now_epoch(),
+                to_epoch(snippet.get('publishedAt'))
+            ), count_changes=True)
+            await asyncio.get_running_loop().run_in_executor(None, self.persistence.flush)
+            if not await asyncio.wrap_future(write):
+                logger.debug(f"Video {video_id} was inserted by another writer")
+                return False
+            
+            self.stats['total_ads_found'] += 1
+            logger.info(f"Saved new ad: {snippet['title'][:50]}...")
+            return True
                 
         except Exception as e:
             logger.error(f"Error saving ad to database: {e}")
             self.stats['errors'] += 1
+            raise
     
-    async def _crawl_cycle(self):
-        """Un ciclu complet de crawling"""
+    async def _crawl_cycle(self, search_queries: List[str] = None) -> Dict[str, List[str]]:
+        """Un ciclu de crawling pentru query-urile date (implicit toate); ID-urile găsite per query"""
         logger.info("Starting crawl cycle...")
-        
-        # Queries pentru căutare
-        search_queries = [
-            "advertisement 2025",
-            "commercial 2025",
-            "publicitate 2025",
-            "reclamă 2025",
-            "promo 2025",
-            "sponsored content",
-            "marketing campaign",
-            "brand advertisement",
-            "product launch 2025",
-            "new product commercial"
-        ]
+        search_queries = search_queries or SEARCH_QUERIES
+        found = {}
         
         cycle_start = time.time()
         videos_in_cycle = 0
         ads_in_cycle = 0
+        with self.persistence.reader() as conn:
+            self.scheduler.channel_history = load_channel_history(conn)
         
         for query in search_queries:
             try:
                 # Caută videoclipuri
                 videos = await self._search_videos(query)
                 videos_in_cycle += len(videos)
+                found[query] = [video_data['video_id'] for video_data in videos]
                 
                 for video_data in videos:
                     self.stats['total_videos_checked'] += 1
                     
-                    # Detectează dacă este reclamă
+                    # Detectează dacă este reclamă (ieftin, fără API); reclamele intră în coada cu priorități
                     ad_detection = self._detect_ad_content(video_data)
                     
                     if ad_detection['is_ad']:
-                        # Obține statistici detaliate
-                        statistics = await self._get_video_statistics(video_data['video_id'])
-                        
-                        # Salvează în baza de date
-                        await self._save_ad_to_database(video_data, ad_detection, statistics)
-                        ads_in_cycle += 1
-                    
-                    # Rate limiting
-                    await asyncio.sleep(self.config.RATE_LIMIT_DELAY)
+                        snippet = video_data['snippet']
+                        self.scheduler.push(video_data['video_id'], (video_data, ad_detection),
+                                            ad_detection['confidence'], snippet.get('publishedAt'),
+                                            snippet.get('channelTitle'))
                 
                 # Pauză între queries
-                await asyncio.sleep(5)
+                if len(search_queries) > 1:
+                    await asyncio.sleep(5)
                 
             except Exception as e:
                 logger.error(f"Error processing query '{query}': {e}")
                 self.stats['errors'] += 1
         
+        # Statisticile (un apel API per reclamă) în ordinea priorității, în limita bugetului ciclului
+        while True:
+            entry = self.scheduler.pop()
+            if entry is None:
+                break
+            video_data, ad_detection = entry
+            video_id = video_data['video_id']
+            try:
+                if self.persistence.fetchone("SELECT 1 FROM ads WHERE video_id = ?", (video_id,)):
+                    continue
+                
+                # Revendicare atomică: alte instanțe nu mai cer statisticile aceluiași video
+                job = await self.jobs.claim_key_async(INGEST_QUEUE, video_id)
+                if job is None:
+                    logger.debug(f"Video {video_id} claimed by another crawler")
+                    continue
+                
+                async with self.jobs.processing(job):
+                    # Obține statistici detaliate
+                    statistics = await self._get_video_statistics(video_id)
+                    
+                    # Salvează în baza de date (o eroare de scriere -> nack)
+                    inserted = await self._save_ad_to_database(video_data, ad_detection, statistics)
+                if inserted:
+                    ads_in_cycle += 1
+            except Exception as e:
+                logger.error(f"Error processing video {video_id}: {e}")
+                self.stats['errors'] += 1
+            
+            # Rate limiting
+            await asyncio.sleep(self.config.RATE_LIMIT_DELAY)
+        
+        self.scheduler.end_cycle()
+        
         cycle_time = time.time() - cycle_start
         logger.info(f"Crawl cycle completed: {videos_in_cycle} videos checked, "
                    f"{ads_in_cycle} ads found in {cycle_time:.1f}s")
         
         # Salvează statisticile
         self._save_crawler_stats()
+        return found
     
     def _save_crawler_stats(self):
         """Salvează statisticile crawler-ului"""
         try:
-            with sqlite3.connect(self.config.DATABASE_PATH) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO crawler_stats 
-                    (total_videos_checked, total_ads_found, api_calls_made, errors)
-                    VALUES (?, ?, ?, ?)
-                """, (
-                    self.stats['total_videos_checked'],
-                    self.stats['total_ads_found'],
-                    self.stats['api_calls_made'],
-                    self.stats['errors']
-                ))
-                self.stats['last_run'] = datetime.now().isoformat()
+            self.persistence.execute("""
+                INSERT INTO crawler_stats 
+                (total_videos_checked, total_ads_found, api_calls_made, errors)
+                VALUES (?, ?, ?, ?)
+            """, (
+                self.stats['total_videos_checked'],
+                self.stats['total_ads_found'],
+                self.stats['api_calls_made'],
+                self.stats['errors']
+            ))
+            self.stats['last_run'] = datetime.now().isoformat()
         except Exception as e:
             logger.error(f"Error saving crawler stats: {e}")
     
@@ -462,11 +547,19 @@ class RealYouTubeCrawler:
         
         try:
             while self.running:
-                await self._crawl_cycle()
+                # Query-ul scadent cel mai devreme, când quota disponibilă îl acoperă
+                query, wait = self.crawl_scheduler.next_run()
+                if wait > 0:
+                    logger.info(f"Waiting {wait:.0f} seconds before query '{query}'...")
+                    await asyncio.sleep(wait)
+                if not self.running:  # Verifică din nou după așteptare
+                    break
                 
-                if self.running:  # Verifică din nou după ciclu
-                    logger.info(f"Waiting {self.config.CRAWL_INTERVAL} seconds before next cycle...")
-                    await asyncio.sleep(self.config.CRAWL_INTERVAL)
+                calls_before = self.stats['detail_calls']
+                found = await self._crawl_cycle([query])
+                detail_calls = self.stats['detail_calls'] - calls_before
+                self.crawl_scheduler.record(query, found.get(query, []),
+                                            SEARCH_UNITS + detail_calls * DETAILS_UNITS)
                     
         except KeyboardInterrupt:
             logger.info("Received interrupt signal")